@@ -0,0 +1,151 @@
+"""
+策略行为的列式归档 (Parquet)
+
+目录布局: data/analytics/event=<signal|rejection|fill|exit>/date=YYYY-MM-DD/part-*.parquet
+可直接用 pyarrow.dataset / pandas.read_parquet / DuckDB 按分区读取，例如:
+    pd.read_parquet("data/analytics", filters=[("event", "=", "exit")])
+事件先在内存中缓冲，攒够 batch_size 行或最早一行超过 max_age 秒时写出一个分片
+(成交/平仓很稀疏，逐条写出会产生大量小文件)；停止时与内存超出软上限时强制写出。
+分片先写入数据集目录之外的同级暂存目录 (data/.analytics.staging)，写完再原子移动到分区中，
+读取方扫描目录时不会遇到写了一半的文件。
+时间列均为 UTC；signal_time 为信号K线开盘时间 (状态文件中不带时区的 signal_time 是北京时间，写入时换算)。
+未安装 pyarrow 时归档关闭，不影响交易。
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖
+    pa = None
+    pq = None
+
+EVENT_TYPES = ("signal", "rejection", "fill", "exit")
+
+# 所有事件共用一套列，不适用的列为空
+COLUMNS = [
+    ("ts", "timestamp"),
+    ("symbol", "string"),
+    ("signal_time", "timestamp"),
+    ("signal_close", "float64"),
+    ("buy_surge_ratio", "float64"),
+    ("drop_pct", "float64"),
+    ("target_price", "float64"),
+    ("price", "float64"),
+    ("quantity", "float64"),
+    ("pnl_pct", "float64"),
+    ("hold_hours", "float64"),
+    ("reason", "string"),
+    ("trace_id", "string"),
+]
+
+
+def _schema():
+    types = {
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+        "string": pa.string(),
+        "float64": pa.float64(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+
+
+def _to_datetime(value: Any, naive_offset_hours: int = 0) -> Optional[datetime]:
+    """ISO 字符串 / epoch 秒 / datetime 统一为 UTC datetime (不带时区的值减去 naive_offset_hours)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, UTC)
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC) - timedelta(hours=naive_offset_hours)
+    return value.astimezone(UTC)
+
+
+class AnalyticsExporter:
+    """按事件类型缓冲，攒够一批、缓冲超时或显式 flush 时写出一个 Parquet 分片"""
+
+    def __init__(self, base_dir: Path, batch_size: int = 500, max_age: float = 900.0):
+        self.base_dir = Path(base_dir)
+        # 与数据集同一文件系统 (replace 为原子操作)，但不在数据集目录内
+        self.staging_dir = self.base_dir.parent / f".{self.base_dir.name}.staging"
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self._oldest: Dict[str, float] = {}  # 各事件缓冲区第一行的写入时间 (monotonic)
+        self.enabled = pa is not None
+        self._buffers: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._part = 0
+        if not self.enabled:
+            logging.warning("未安装 pyarrow，列式归档已关闭 (pip install pyarrow)")
+
+    def record(self, event: str, symbol: str, ts: Any = None, **fields):
+        """记录一条事件 (字段名见 COLUMNS，未知字段忽略)"""
+        if not self.enabled:
+            return
+        if event not in EVENT_TYPES:
+            raise ValueError(f"未知事件类型: {event}")
+        row = {"symbol": symbol, "ts": _to_datetime(ts) or datetime.now(UTC)}
+        for name, kind in COLUMNS[2:]:
+            value = fields.get(name)
+            if kind == "timestamp":
+                value = _to_datetime(value, naive_offset_hours=8 if name == "signal_time" else 0)
+            row[name] = value
+        with self._lock:
+            buffer = self._buffers[event]
+            buffer.append(row)
+            oldest = self._oldest.setdefault(event, time.monotonic())
+            due = len(buffer) >= self.batch_size or time.monotonic() - oldest >= self.max_age
+        if due:
+            self.flush(event)
+
+    def flush_due(self):
+        """写出缓冲超过 max_age 的事件 (主循环每轮调用)"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            due = [event for event, oldest in self._oldest.items() if now - oldest >= self.max_age]
+        for event in due:
+            self.flush(event)
+
+    def flush(self, event: Optional[str] = None):
+        """写出缓冲区 (event 为空时写出全部)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            events = [event] if event else list(self._buffers)
+            batches = {e: self._buffers.pop(e) for e in events if self._buffers.get(e)}
+            for e in events:
+                self._oldest.pop(e, None)
+        for name, rows in batches.items():
+            try:
+                self._write(name, rows)
+            except Exception as e:
+                logging.error(f"写入列式归档失败 ({name}, {len(rows)} 行): {e}")
+
+    def _write(self, event: str, rows: List[Dict[str, Any]]):
+        by_date: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            by_date[row["ts"].strftime("%Y-%m-%d")].append(row)
+        schema = _schema()
+        for date, date_rows in by_date.items():
+            part_dir = self.base_dir / f"event={event}" / f"date={date}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            self.staging_dir.mkdir(parents=True, exist_ok=True)
+            self._part += 1
+            name = f"part-{int(time.time() * 1000)}-{os.getpid()}-{self._part:04d}.parquet"
+            table = pa.Table.from_pylist(date_rows, schema=schema)
+            temp_file = self.staging_dir / name
+            try:
+                pq.write_table(table, temp_file, compression="zstd")
+                temp_file.replace(part_dir / name)
+            finally:
+                temp_file.unlink(missing_ok=True)
@@ -1,10 +1,19 @@
 import os
 import logging
 import re
+import time
+import random
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any, Dict, Callable, Iterable, Tuple
 import math
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 from binance_sdk_derivatives_trading_usds_futures.derivatives_trading_usds_futures import (
@@ -21,6 +30,16 @@ from binance_sdk_derivatives_trading_usds_futures.rest_api.models.enums import (
     NewOrderSideEnum,
     ChangeMarginTypeMarginTypeEnum
 )
+from rate_limit import WeightGovernor, PRIORITY_HIGH
+from clock import Clock
+from weight_ledger import open_ledger
+from binance_common.errors import (
+    BadRequestError,
+    NetworkError,
+    ServerError,
+    TooManyRequestsError,
+    RateLimitBanError,
+)
 
 # 🔧 加载 .env 文件 (从项目根目录)
 # 假设当前文件在 src/binance_api.py
@@ -38,6 +57,28 @@ else:
 # Configure logging (will be overridden by main app usually)
 logging.basicConfig(level=logging.INFO)
 
+# 同机共享的权重账本 (可用 API_WEIGHT_LEDGER 覆盖，"off" 关闭)
+DEFAULT_WEIGHT_LEDGER = Path(tempfile.gettempdir()) / "corniche_api_weight.ledger"
+
+RATIO_CACHE_MAX_ENTRIES = 2048  # 多空比缓存上限 (超出时淘汰最久未使用的)
+
+# 多空比统计周期 (秒)，缓存在周期边界过期
+RATIO_PERIOD_SECONDS = {
+    "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "2h": 7200,
+    "4h": 14400, "6h": 21600, "12h": 43200, "1d": 86400,
+}
+
+# K线接口的请求权重随 limit 变化 (交易所规则: limit 不超过 -> 权重)，未传 limit 时交易所按 500 处理
+KLINE_WEIGHTS = ((99, 1), (499, 2), (1000, 5), (1500, 10))
+
+def kline_weight(limit: Optional[int]) -> int:
+    """按 limit 计算K线请求的权重"""
+    limit = 500 if limit is None else limit
+    for upper, weight in KLINE_WEIGHTS:
+        if limit <= upper:
+            return weight
+    return KLINE_WEIGHTS[-1][1]
+
 def snake_to_camel(snake_str: str) -> str:
     """将snake_case转换为camelCase"""
     components = snake_str.split('_')
@@ -52,6 +93,83 @@ def convert_dict_keys(data: Any, convert_func=snake_to_camel) -> Any:
     else:
         return data
 
+def to_plain(data: Any) -> Any:
+    """将 SDK 返回的模型对象递归转换为原生 dict/list"""
+    if hasattr(data, 'actual_instance'):
+        return to_plain(data.actual_instance)
+    if hasattr(data, 'model_dump'):
+        return to_plain(data.model_dump())
+    if isinstance(data, dict):
+        return {k: to_plain(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [to_plain(item) for item in data]
+    return data
+
+
+class LatencyHistogram:
+    """固定分桶的请求延迟直方图 (毫秒)"""
+
+    BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float, ok: bool = True):
+        """记录一次请求耗时"""
+        index = len(self.BUCKETS_MS)
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, q: float) -> float:
+        """按分桶上界估算分位数 (超出最大桶时返回观测到的最大值)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c > 0:
+                return float(self.BUCKETS_MS[i]) if i < len(self.BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出可序列化的统计摘要"""
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": dict(zip([str(b) for b in self.BUCKETS_MS] + ["inf"], self.counts)),
+        }
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """带连接池的 HTTP 适配器，统一使用 (连接超时, 读取超时)"""
+
+    def __init__(self, connect_timeout: float, read_timeout: float, **kwargs):
+        self.timeout = (connect_timeout, read_timeout)
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
 class BinanceAPI:
     """币安API客户端封装类"""
     
@@ -59,10 +177,22 @@ class BinanceAPI:
         self,
         api_key: Optional[str] = None,
         api_secret: Optional[str] = None,
-        base_path: Optional[str] = None
+        base_path: Optional[str] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        pool_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        weight_ledger: Optional[str] = None,
+        clock: Optional[Clock] = None,
     ):
         """
         初始化币安API客户端
+
+        传输参数 (秒) 未显式传入时读取环境变量:
+        HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT / HTTP_POOL_SIZE / HTTP_MAX_RETRIES
+        weight_ledger: 同机共享的权重账本路径，未传入时读取 API_WEIGHT_LEDGER
+        (默认系统临时目录下的 corniche_api_weight.ledger，"off" 关闭)
+        clock: 权重窗口与熔断计时使用的时钟 (模拟/回放时传入虚拟时钟)
         """
         self.api_key = api_key or os.getenv("BINANCE_API_KEY")
         self.api_secret = api_secret or os.getenv("BINANCE_API_SECRET")
@@ -73,69 +203,197 @@ class BinanceAPI:
         if not self.api_secret:
             raise ValueError("BINANCE_API_SECRET 未设置。请在 .env 文件中配置。")
         
-        # 创建配置和客户端
+        # 传输参数
+        self.connect_timeout = connect_timeout or float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+        self.read_timeout = read_timeout or float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+        self.pool_size = pool_size or int(os.getenv("HTTP_POOL_SIZE", "10"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("HTTP_MAX_RETRIES", "3"))
+        self.backoff_base = 0.5
+        self.backoff_max = 8.0
+        
+        # 创建配置和客户端 (SDK 自带重试关闭，统一由 _request 处理)
         configuration_rest_api = ConfigurationRestAPI(
             api_key=self.api_key,
             api_secret=self.api_secret,
-            base_path=self.base_path
+            base_path=self.base_path,
+            timeout=int(self.read_timeout * 1000),
+            keep_alive=True,
+            retries=0,
         )
         self.client = DerivativesTradingUsdsFutures(config_rest_api=configuration_rest_api)
-        self._exchange_info_cache = None
+        self._mount_http_adapter()
+        # 交易对表: symbol -> (status, tick_size, step_size)
+        self._symbol_table: Dict[str, tuple] = {}
+        self._symbol_table_fetched_at = 0.0
+        
+        # 多空比缓存: (symbol, period) -> (ratio, 过期时间戳)
+        self._ratio_cache: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+        self._ratio_lock = threading.Lock()  # 预取时多个线程同时读写
+        
+        # 每个接口的延迟直方图
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self._stats_lock = threading.Lock()
         
-        # 权重控制
-        self.used_weight = 0
-        self.max_weight = 1200
-        self.last_weight_reset = pd.Timestamp.now()
+        # 请求录制 (API_TAPE_RECORD=磁带路径)，用于离线回放
+        self.tape = None
+        tape_path = os.getenv("API_TAPE_RECORD")
+        if tape_path:
+            from tape import TapeRecorder
+            self.tape = TapeRecorder(Path(tape_path))
+            logging.info(f"📼 API 请求录制已开启: {tape_path}")
+        
+        # 权重控制 (按优先级预留容量，429/418 熔断)；同一 IP 的额度通过共享账本在同机所有进程间分配
+        if weight_ledger is None:
+            weight_ledger = os.getenv("API_WEIGHT_LEDGER", str(DEFAULT_WEIGHT_LEDGER))
+        self.governor = WeightGovernor(max_weight=1200, ledger=open_ledger(weight_ledger), clock=clock)
+
+    @property
+    def used_weight(self) -> int:
+        return self.governor.total_used()
+
+    def _mount_http_adapter(self):
+        """为 SDK 的 requests.Session 挂载 keep-alive 连接池与超时设置"""
+        session = getattr(self.client.rest_api, "_session", None)
+        if not isinstance(session, requests.Session):
+            logging.warning("未找到 SDK 会话对象，使用默认 HTTP 传输配置")
+            return
+        adapter = _TimeoutHTTPAdapter(
+            self.connect_timeout,
+            self.read_timeout,
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=0,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    def _observe_latency(self, endpoint: str, started: float, ok: bool):
+        """记录接口耗时"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            hist = self.latency.get(endpoint)
+            if hist is None:
+                hist = self.latency[endpoint] = LatencyHistogram()
+            hist.observe(elapsed_ms, ok)
+        if ok:
+            self.governor.observe_latency(elapsed_ms)
+
+    def cache_objects(self) -> Dict[str, Any]:
+        """本地缓存 (内存统计用)"""
+        return {"symbol_table": self._symbol_table, "ratio_cache": self._ratio_cache, "latency": self.latency}
+
+    def prune_caches(self) -> int:
+        """清空多空比缓存 (内存超出软上限时调用)，返回清除的条目数"""
+        with self._ratio_lock:
+            count = len(self._ratio_cache)
+            self._ratio_cache.clear()
+        return count
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各接口延迟统计"""
+        with self._stats_lock:
+            return {endpoint: hist.snapshot() for endpoint, hist in self.latency.items()}
+
+    def _is_retryable(self, error: Exception, idempotent: bool) -> bool:
+        """判断请求是否可以安全重试"""
+        if not idempotent or isinstance(error, RateLimitBanError):
+            return False
+        return isinstance(error, (NetworkError, ServerError, TooManyRequestsError))
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """指数退避 + 全抖动；429 时至少等待 Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            delay = max(delay, float(retry_after))
+        return delay
+
+    def _request(
+        self,
+        endpoint: str,
+        weight: int = 1,
+        idempotent: bool = True,
+        parse: Optional[Callable[[Any], Any]] = to_plain,
+        **params
+    ) -> Any:
+        """统一的 REST 调用入口：权重控制、超时、幂等重试与延迟统计"""
+        func = getattr(self.client.rest_api, endpoint)
+        attempt = 0
+        while True:
+            self._check_weight(weight)
+            started_at = time.time()
+            started = time.perf_counter()
+            try:
+                response = func(**params)
+                self.governor.observe_headers(getattr(response, "headers", None))
+                data = response.data()
+            except Exception as e:
+                self._observe_latency(endpoint, started, ok=False)
+                if isinstance(e, (TooManyRequestsError, RateLimitBanError)):
+                    # 429 等到下一分钟窗口，418 封禁默认 2 分钟 (以 Retry-After 为准)
+                    default = 60 - time.time() % 60 if isinstance(e, TooManyRequestsError) else 120
+                    self.governor.trip(float(e.retry_after or default), f"{endpoint} {type(e).__name__}")
+                if self.tape:
+                    self.tape.record(endpoint, params, started_at, (time.perf_counter() - started) * 1000, error=e)
+                if attempt >= self.max_retries or not self._is_retryable(e, idempotent):
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                attempt += 1
+                logging.warning(f"⚠️ {endpoint} 请求失败 ({e}), {delay:.2f}s 后重试 ({attempt}/{self.max_retries})")
+                time.sleep(delay)
+                continue
+            self._observe_latency(endpoint, started, ok=True)
+            if self.tape:
+                self.tape.record(endpoint, params, started_at, (time.perf_counter() - started) * 1000, data=data)
+            return parse(data) if parse else data
 
     def _check_weight(self, weight: int = 1):
-        """简单的权重检查与限速"""
-        now = pd.Timestamp.now()
-        # 每分钟重置权重
-        if (now - self.last_weight_reset).total_seconds() > 60:
-            self.used_weight = 0
-            self.last_weight_reset = now
-            
-        if self.used_weight + weight > self.max_weight * 0.9: # 预留10%缓冲
-            sleep_time = 60 - (now - self.last_weight_reset).total_seconds()
-            if sleep_time > 0:
-                logging.warning(f"⚠️ API权重接近临界值 ({self.used_weight}), 暂停 {sleep_time:.1f}s")
-                import time
-                time.sleep(sleep_time)
-                self.used_weight = 0
-                self.last_weight_reset = pd.Timestamp.now()
-        
-        self.used_weight += weight
+        """按当前线程的请求优先级占用权重 (并发请求共享同一预算)"""
+        self.governor.acquire(weight)
+
+    def _build_symbol_table(self, exchange_info: dict) -> Dict[str, tuple]:
+        """从交易所信息提取交易对状态与精度过滤器"""
+        table = {}
+        for s in exchange_info.get('symbols') or []:
+            tick_size = None
+            step_size = None
+            for f in s.get('filters') or []:
+                if f.get('filter_type') == 'PRICE_FILTER':
+                    tick_size = float(f['tick_size'])
+                elif f.get('filter_type') == 'LOT_SIZE':
+                    step_size = float(f['step_size'])
+            table[s['symbol']] = (s.get('status'), tick_size, step_size)
+        return table
+
+    def refresh_symbol_table(self) -> Dict[str, tuple]:
+        """重新获取交易所信息并刷新交易对表"""
+        data = self._request("exchange_information", weight=1)
+        self._symbol_table = self._build_symbol_table(data)
+        self._symbol_table_fetched_at = time.time()
+        return self._symbol_table
 
-    def get_exchange_info(self) -> dict:
-        """获取交易所信息（带简单缓存）"""
-        if self._exchange_info_cache:
-            return self._exchange_info_cache
+    def get_symbol_table(self, max_age: Optional[float] = None) -> Dict[str, tuple]:
+        """获取交易对表 (带缓存)，max_age 秒内的缓存直接复用，None 表示不过期"""
+        age = time.time() - self._symbol_table_fetched_at
+        if self._symbol_table and (max_age is None or age <= max_age):
+            return self._symbol_table
         try:
-            self._check_weight(1)
-            response = self.client.rest_api.exchange_information()
-            self._exchange_info_cache = response.data()
-            return self._exchange_info_cache
+            return self.refresh_symbol_table()
         except Exception as e:
             logging.error(f"获取交易所信息失败: {e}")
-            return {}
+            return self._symbol_table
+
+    def load_symbol_table(self, table: Dict[str, tuple], fetched_at: float):
+        """载入本地缓存的交易对表 (热启动)"""
+        self._symbol_table = dict(table)
+        self._symbol_table_fetched_at = fetched_at
 
     def get_symbol_filters(self, symbol: str) -> tuple:
         """获取交易对的精度过滤器"""
-        exchange_info = self.get_exchange_info()
-        if not exchange_info or not hasattr(exchange_info, 'symbols'):
+        entry = self.get_symbol_table().get(symbol)
+        if not entry:
             return None, None
-            
-        for s in exchange_info.symbols:
-            if s.symbol == symbol:
-                tick_size = None
-                step_size = None
-                for f in s.filters:
-                    if f.filter_type == 'PRICE_FILTER':
-                        tick_size = float(f.tick_size)
-                    elif f.filter_type == 'LOT_SIZE':
-                        step_size = float(f.step_size)
-                return tick_size, step_size
-        return None, None
+        return entry[1], entry[2]
 
     def adjust_precision(self, value: float, step_size: float) -> float:
         """调整精度"""
@@ -156,8 +414,7 @@ class BinanceAPI:
     def change_leverage(self, symbol: str, leverage: int):
         """调整杠杆倍数"""
         try:
-            self._check_weight(1)
-            self.client.rest_api.change_initial_leverage(symbol=symbol, leverage=leverage)
+            self._request("change_initial_leverage", weight=1, parse=None, symbol=symbol, leverage=leverage)
             logging.info(f"已设置 {symbol} 杠杆为 {leverage}x")
         except Exception as e:
             logging.error(f"设置杠杆失败: {e}")
@@ -167,8 +424,7 @@ class BinanceAPI:
         try:
             # 使用 Enum 转换参数
             margin_type_enum = ChangeMarginTypeMarginTypeEnum(margin_type.upper())
-            self._check_weight(1)
-            self.client.rest_api.change_margin_type(symbol=symbol, margin_type=margin_type_enum)
+            self._request("change_margin_type", weight=1, parse=None, symbol=symbol, margin_type=margin_type_enum)
             logging.info(f"已设置 {symbol} 保证金模式为 {margin_type}")
         except ValueError:
              logging.error(f"无效的保证金模式: {margin_type}")
@@ -180,16 +436,19 @@ class BinanceAPI:
     def in_exchange_trading_symbols(
         self,
         symbol_pattern: str = r"usdt$",
-        status: str = "TRADING"
+        status: str = "TRADING",
+        max_age: Optional[float] = 0
     ) -> List[str]:
-        """获取币安交易所所有合约交易对"""
+        """获取币安交易所所有合约交易对 (max_age 秒内可复用缓存的交易所信息)"""
         try:
-            self._check_weight(1)
-            response = self.client.rest_api.exchange_information()
-            data = response.data()
+            age = time.time() - self._symbol_table_fetched_at
+            if not self._symbol_table or (max_age is not None and age > max_age):
+                table = self.refresh_symbol_table()
+            else:
+                table = self._symbol_table
             usdt_symbols = [
-                t.symbol for t in data.symbols
-                if re.search(symbol_pattern, t.symbol, flags=re.IGNORECASE) and t.status == status
+                symbol for symbol, (symbol_status, _, _) in table.items()
+                if re.search(symbol_pattern, symbol, flags=re.IGNORECASE) and symbol_status == status
             ]
             return usdt_symbols
         except Exception as e:
@@ -206,20 +465,50 @@ class BinanceAPI:
     ):
         """获取K线数据"""
         try:
-            self._check_weight(1)
-            response = self.client.rest_api.kline_candlestick_data(
+            return self._request(
+                "kline_candlestick_data",
+                weight=kline_weight(limit),
                 symbol=symbol,
                 interval=interval,
                 start_time=starttime,
                 end_time=endtime,
                 limit=limit,
             )
-            data = response.data()
-            return data
         except Exception as e:
             logging.error(f"kline_candlestick_data() error: {e}")
             return None
     
+    def get_symbol_price(self, symbol: str) -> float:
+        """获取最新价格 (失败时抛出异常)"""
+        data = self._request("symbol_price_ticker", weight=1, symbol=symbol)
+        # SDK 可能返回列表或单个对象
+        ticker = data[0] if isinstance(data, list) and data else data
+        if isinstance(ticker, dict) and ticker.get('price') is not None:
+            return float(ticker['price'])
+        raise ValueError(f"价格数据结构异常: {data}")
+
+    def get_all_prices(self) -> Dict[str, float]:
+        """一次请求获取全部交易对最新价格"""
+        data = self._request("symbol_price_ticker", weight=2)
+        if isinstance(data, dict):
+            data = [data]
+        return {t['symbol']: float(t['price']) for t in data if t.get('price') is not None}
+
+    def get_24h_tickers(self) -> Dict[str, Dict[str, float]]:
+        """一次请求获取全部交易对 24h 统计 (权重 40)"""
+        data = self._request("ticker24hr_price_change_statistics", weight=40)
+        if isinstance(data, dict):
+            data = [data]
+        return {
+            t['symbol']: {
+                "quote_volume": float(t.get('quote_volume') or 0),
+                "volume": float(t.get('volume') or 0),
+                "count": int(t.get('count') or 0),
+                "last_price": float(t.get('last_price') or 0),
+            }
+            for t in data if t.get('symbol')
+        }
+
     def post_order(
         self,
         symbol: str,
@@ -234,6 +523,24 @@ class BinanceAPI:
         **kwargs
     ) -> Dict[str, Any]:
         """发送订单 (重构版 - 参照 binance-order)"""
+        with self.governor.priority(PRIORITY_HIGH):
+            return self._post_order(
+                symbol, side, ord_type, quantity, price, stop_price, time_in_force, reduce_only, close_position, **kwargs
+            )
+
+    def _post_order(
+        self,
+        symbol: str,
+        side: str,
+        ord_type: str,
+        quantity: float,
+        price: Optional[float],
+        stop_price: Optional[float],
+        time_in_force: str,
+        reduce_only: bool,
+        close_position: bool,
+        **kwargs
+    ) -> Dict[str, Any]:
         try:
             # 1. 平仓逻辑增强
             if close_position:
@@ -300,17 +607,23 @@ class BinanceAPI:
             for k, v in kwargs.items():
                 params[k] = v
 
+            # 客户端订单号保证重试幂等：重复提交会被交易所拒绝，而不会重复成交
+            client_order_id = params.get("new_client_order_id") or f"cnb-{uuid.uuid4().hex[:24]}"
+            params["new_client_order_id"] = client_order_id
+
             # 5. 执行下单
-            self._check_weight(1)
-            response = self.client.rest_api.new_order(**params)
+            try:
+                data = self._request("new_order", weight=1, idempotent=True, **params)
+            except BadRequestError as e:
+                # 超时后的重试可能命中已成功的首单，按客户端订单号取回原订单
+                if "duplicate" not in str(e).lower():
+                    raise
+                logging.warning(f"⚠️ 订单号 {client_order_id} 已存在，查询原订单结果")
+                data = self._request(
+                    "query_order", weight=1, symbol=symbol, orig_client_order_id=client_order_id
+                )
             
             # 6. 处理响应并转换格式
-            data = response.data()
-            if hasattr(data, 'model_dump'):
-                data = data.model_dump()
-            elif hasattr(data, 'dict'):
-                data = data.dict()
-            
             logging.info(f"✅ 下单成功: {symbol} {side} {ord_type} {quantity}")
             return convert_dict_keys(data)
             
@@ -321,12 +634,10 @@ class BinanceAPI:
     def get_account_balance(self) -> float:
         """获取 USDT 可用余额"""
         try:
-            self._check_weight(5)
-            response = self.client.rest_api.futures_account_balance_v2()
-            data = response.data()
+            data = self._request("futures_account_balance_v2", weight=5)
             for asset in data:
-                if asset.asset == "USDT":
-                    return float(asset.available_balance)
+                if asset.get('asset') == "USDT":
+                    return float(asset['available_balance'])
             return 0.0
         except Exception as e:
             logging.error(f"获取余额失败: {e}")
@@ -335,44 +646,73 @@ class BinanceAPI:
     def get_position_risk(self, symbol: Optional[str] = None) -> List[dict]:
         """获取持仓风险信息"""
         try:
-            self._check_weight(5)
             if symbol:
-                response = self.client.rest_api.position_information_v2(symbol=symbol)
+                data = self._request("position_information_v2", weight=5, symbol=symbol)
             else:
-                response = self.client.rest_api.position_information_v2()
+                data = self._request("position_information_v2", weight=5)
             
-            data = response.data()
-            # 转换为字典列表并统一键名格式
-            result = []
-            for pos in data:
-                pos_dict = pos.model_dump() if hasattr(pos, 'model_dump') else pos.to_dict() if hasattr(pos, 'to_dict') else pos
-                result.append(convert_dict_keys(pos_dict))
-            return result
+            # 统一键名格式
+            return [convert_dict_keys(pos) for pos in data]
         except Exception as e:
             logging.error(f"获取持仓失败: {e}")
             return []
 
-    def get_top_long_short_ratio(self, symbol: str, period: str = "5m", limit: int = 1) -> float:
-        """获取顶级交易者账户多空比"""
+    def get_top_long_short_ratio(self, symbol: str, period: str = "5m", limit: int = 1, use_cache: bool = True) -> float:
+        """获取顶级交易者账户多空比 (同一周期内复用缓存)"""
+        key = (symbol, period)
+        if use_cache:
+            with self._ratio_lock:
+                cached = self._ratio_cache.get(key)
+                if cached and time.time() < cached[1]:
+                    self._ratio_cache.move_to_end(key)
+                    return cached[0]
         try:
-            self._check_weight(1)
-            response = self.client.rest_api.top_trader_long_short_ratio_accounts(
+            data = self._request(
+                "top_trader_long_short_ratio_accounts",
+                weight=1,
                 symbol=symbol,
                 period=period,
                 limit=limit
             )
-            data = response.data()
             if data and len(data) > 0:
                 item = data[-1]
-                if isinstance(item, dict):
-                    return float(item.get('longShortRatio', -1.0))
-                else:
-                    return float(getattr(item, 'long_short_ratio', -1.0))
+                ratio = float(item.get('long_short_ratio', item.get('longShortRatio', -1.0)))
+                period_seconds = RATIO_PERIOD_SECONDS.get(period)
+                if period_seconds:
+                    now = time.time()
+                    with self._ratio_lock:
+                        self._ratio_cache[key] = (ratio, (now // period_seconds + 1) * period_seconds)
+                        self._ratio_cache.move_to_end(key)
+                        while len(self._ratio_cache) > RATIO_CACHE_MAX_ENTRIES:
+                            self._ratio_cache.popitem(last=False)
+                return ratio
             return -1.0
         except Exception as e:
             logging.error(f"获取多空比失败: {symbol} - {e}")
             return -1.0
 
+    def prefetch_top_long_short_ratios(
+        self,
+        symbols: Iterable[str],
+        period: str = "1h",
+        max_workers: int = 8
+    ) -> Dict[str, float]:
+        """并发预取多个交易对的多空比，返回 symbol -> ratio (失败为 -1)"""
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        workers = max(1, min(max_workers, self.pool_size, len(symbols)))
+        priority = self.governor.current_priority()
+        
+        def fetch(symbol: str) -> float:
+            # 工作线程沿用调用方的请求优先级
+            with self.governor.priority(priority):
+                return self.get_top_long_short_ratio(symbol, period=period)
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ratio") as executor:
+            ratios = executor.map(fetch, symbols)
+            return dict(zip(symbols, ratios))
+
 def kline2df(data) -> pd.DataFrame:
     """K线数据转换为DataFrame"""
     df = pd.DataFrame(data, columns=[
@@ -386,6 +726,9 @@ def kline2df(data) -> pd.DataFrame:
                     "active_buy_volume", "active_buy_quote_volume"]
     for col in numeric_cols:
         df[col] = pd.to_numeric(df[col])
+    # 本地缓存的窗口以 float64 保存，时间与计数列统一回整数
+    for col in ["open_time", "close_time", "trade_count"]:
+        df[col] = pd.to_numeric(df[col]).astype("int64")
     
     # 时间戳转换
     df["trade_date"] = pd.to_datetime(df["open_time"] // 1000, unit="s")
@@ -0,0 +1,165 @@
+"""
+买量暴涨策略插件 (原 RealTimeBuySurgeStrategyV3 中的信号逻辑)
+
+上一根收盘 1h K线的主动买量 / 此前 24 根均值在 [buy_surge_threshold, buy_surge_max] 内即为候选，
+经特征过滤与 (可选) 多空比过滤后，按买量倍数设定回调目标价等待建仓。
+"""
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from features import FeatureFilter
+from records import BJ_TZ, PendingSignal
+from strategy_plugin import Candidate, StrategyPlugin
+from tracing import mark, new_trace
+
+
+class BuySurgePlugin(StrategyPlugin):
+    name = "buy_surge"
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        self.buy_surge_threshold = 2.2
+        self.buy_surge_max = 3.0
+
+        # 风控参数
+        self.min_account_ratio = 0.70    # 最小多空比
+        self.enable_trader_filter = False
+
+        self.wait_timeout_hours = 37     # 信号等待超时
+
+        # 等待回调配置 (倍数, 回调比例)
+        self.wait_drop_pct_config = [
+            (3, -0.07),     # 2-3倍：等待7%回调
+            (5, -0.04),     # 3-5倍：等待4%回调
+            (10, -0.03),    # 5-10倍：等待3%回调
+            (9999, -0.01),  # 10倍以上：等待1%回调
+        ]
+
+        self.feature_filters: List[FeatureFilter] = []  # 额外过滤器，不增加 API 请求
+        self._scan_progress: List[Dict] = []
+
+    def get_wait_drop_pct(self, buy_surge_ratio: float) -> float:
+        """根据买量倍数获取等待回调比例"""
+        for max_ratio, drop_pct in self.wait_drop_pct_config:
+            if buy_surge_ratio < max_ratio:
+                return drop_pct
+        return self.wait_drop_pct_config[-1][1]
+
+    def on_scan_start(self):
+        self._scan_progress = []
+
+    def on_candle_close(self, symbol: str, window: pd.DataFrame) -> Optional[Candidate]:
+        engine = self.engine
+        if window.empty or len(window) < 25:
+            return None
+
+        last_closed_candle = window.iloc[-2]
+        current_buy_volume = last_closed_candle['active_buy_volume']
+        signal_close = float(last_closed_candle['close'])
+        signal_time = (last_closed_candle['trade_date'] + pd.Timedelta(hours=8)).tz_localize(BJ_TZ)
+
+        prev_24h_df = window.iloc[-26:-2]
+        if prev_24h_df.empty:
+            return None
+
+        avg_buy_volume = prev_24h_df['active_buy_volume'].mean()
+        if avg_buy_volume == 0:
+            return None
+
+        buy_surge_ratio = current_buy_volume / avg_buy_volume
+
+        # 记录高买量币种
+        if buy_surge_ratio > 1.5:
+            self._scan_progress.append({
+                "Symbol": symbol,
+                "Price": signal_close,
+                "Surge": f"{buy_surge_ratio:.2f}x",
+                "AvgVol": f"{avg_buy_volume:.1f}",
+                "CurrVol": f"{current_buy_volume:.1f}"
+            })
+            if len(self._scan_progress) >= 5:
+                if not engine.watchdog.shed("scan_progress_log"):
+                    logging.info(f"📊 扫描中发现的高买量币种: {[s['Symbol'] for s in self._scan_progress]}")
+                self._scan_progress = []
+            if buy_surge_ratio < self.buy_surge_threshold or buy_surge_ratio > self.buy_surge_max:
+                engine.analytics.record(
+                    "rejection", symbol,
+                    signal_time=signal_time, signal_close=signal_close, buy_surge_ratio=buy_surge_ratio,
+                    drop_pct=self.get_wait_drop_pct(buy_surge_ratio),
+                    reason="below_threshold" if buy_surge_ratio < self.buy_surge_threshold else "above_max",
+                    ts=engine.clock.now(),
+                )
+
+        # 检查信号触发 (多空比过滤在扫描结束后批量进行)
+        if not self.buy_surge_threshold <= buy_surge_ratio <= self.buy_surge_max:
+            return None
+        logging.info(f"💡 发现潜在信号: {symbol} 买量倍数={buy_surge_ratio:.2f} 价格={signal_close}")
+
+        features = engine.features.get(symbol)
+        if features and not all(f(symbol, features) for f in self.feature_filters):
+            logging.info(f"   ❌ 特征过滤: {symbol}")
+            engine.analytics.record(
+                "rejection", symbol,
+                signal_time=signal_time, signal_close=signal_close, buy_surge_ratio=buy_surge_ratio,
+                drop_pct=self.get_wait_drop_pct(buy_surge_ratio), reason="feature_filter", ts=engine.clock.now(),
+            )
+            return None
+
+        # 延迟追踪从信号K线收盘时刻开始 (K线时间为交易所时间；模拟/回放时是虚拟时间，
+        # 与其余打点使用的进程时钟不可比，不记录该点)
+        trace = new_trace()
+        if not engine.clock.simulated:
+            mark(trace, "candle_close", (int(last_closed_candle['close_time']) + 1) / 1000)
+        mark(trace, "scan_detected")
+        return Candidate(self.name, symbol, signal_time, signal_close, buy_surge_ratio, trace)
+
+    def on_scan_end(self, candidates: List[Candidate]) -> List[PendingSignal]:
+        engine = self.engine
+
+        # 通过买量筛选的候选，并发预取多空比 (带周期缓存)
+        ratios = {}
+        if self.enable_trader_filter and candidates:
+            ratios = engine.api.prefetch_top_long_short_ratios([c.symbol for c in candidates], period="1h")
+
+        signals = []
+        for c in candidates:
+            symbol, signal_time, signal_close, buy_surge_ratio, trace = c.symbol, c.signal_time, c.signal_close, c.score, c.trace
+            if self.enable_trader_filter:
+                ratio = ratios.get(symbol, -1.0)
+                if ratio > 0 and ratio < self.min_account_ratio:
+                    logging.info(f"   ❌ 多空比过滤: {symbol} {ratio} < {self.min_account_ratio}")
+                    engine.analytics.record(
+                        "rejection", symbol,
+                        signal_time=signal_time, signal_close=signal_close, buy_surge_ratio=buy_surge_ratio,
+                        drop_pct=self.get_wait_drop_pct(buy_surge_ratio), reason="long_short_ratio", trace_id=trace['id'],
+                        ts=engine.clock.now(),
+                    )
+                    continue
+
+            drop_pct = self.get_wait_drop_pct(buy_surge_ratio)
+            target_price = signal_close * (1 + drop_pct)
+            timeout_time = engine.clock.now() + timedelta(hours=self.wait_timeout_hours)
+
+            signal_info = PendingSignal(
+                symbol=symbol,
+                signal_time=signal_time.isoformat(),
+                signal_close=signal_close,
+                buy_surge_ratio=buy_surge_ratio,
+                target_entry_price=target_price,
+                drop_pct=drop_pct,
+                timeout_time=timeout_time.isoformat(),
+                created_at=engine.clock.now().isoformat(),
+                trace=trace,
+                strategy=self.name,
+            )
+            mark(trace, "signal_recorded")
+            engine.analytics.record(
+                "signal", symbol, ts=signal_info.created_at,
+                signal_time=signal_time, signal_close=signal_close, buy_surge_ratio=buy_surge_ratio,
+                drop_pct=drop_pct, target_price=target_price, trace_id=trace['id'],
+            )
+            signals.append(signal_info)
+        return signals
@@ -0,0 +1,53 @@
+import threading
+import time
+from datetime import datetime, UTC
+from typing import Optional
+
+
+class Clock:
+    """策略使用的时钟 (实盘为系统时间)，模拟时替换为 SimulatedClock"""
+
+    simulated = False  # 虚拟时间与进程时钟 (tracing 打点) 不在同一时间轴
+
+    def now(self) -> datetime:
+        return datetime.now(UTC)
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float, stop_event: Optional[threading.Event] = None) -> bool:
+        """等待指定秒数，返回是否收到停止信号"""
+        if stop_event is not None:
+            return stop_event.wait(seconds)
+        time.sleep(seconds)
+        return False
+
+
+class SimulatedClock(Clock):
+    """虚拟时钟：sleep 只推进时间不阻塞，天级别的逻辑可在数秒内跑完"""
+
+    simulated = True
+
+    def __init__(self, start: datetime):
+        self._ts = start.timestamp()
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.time(), UTC)
+
+    def time(self) -> float:
+        with self._lock:
+            return self._ts
+
+    def advance(self, seconds: float):
+        with self._lock:
+            self._ts += max(0.0, seconds)
+
+    def advance_to(self, ts: float):
+        """推进到指定时间 (不回拨)"""
+        with self._lock:
+            self._ts = max(self._ts, ts)
+
+    def sleep(self, seconds: float, stop_event: Optional[threading.Event] = None) -> bool:
+        self.advance(seconds)
+        return stop_event.is_set() if stop_event is not None else False
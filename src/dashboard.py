@@ -5,7 +5,11 @@ from pathlib import Path
 import time
 import os
 from datetime import datetime, timedelta, UTC
-from collections import deque
+
+from tracing import SPANS, spans
+from state_snapshot import SnapshotReader
+from performance import PerformanceStats, HOLD_BUCKETS
+from market_context import BASE_TAKE_PROFIT, dynamic_take_profit
 
 # 设置页面配置
 st.set_page_config(
@@ -18,7 +22,11 @@ st.set_page_config(
 # 路径设置
 BASE_DIR = Path(__file__).parent.parent
 LOG_FILE = BASE_DIR / "logs" / "trading.log"
+JSONL_FILE = BASE_DIR / "logs" / "trading.jsonl"
 STATE_FILE = BASE_DIR / "data" / "trading_state.json"
+SNAPSHOT_FILE = BASE_DIR / "data" / "state.shm"
+# 各区块轮询快照头部的间隔：只读几十字节，版本号未变化的区块直接复用缓存
+POLL_SECONDS = 2
 
 def load_state():
     """加载状态文件"""
@@ -30,6 +38,75 @@ def load_state():
             return {}
     return {}
 
+@st.cache_data(max_entries=1)
+def _load_state_cached(mtime_ns):
+    """状态文件未变化时复用上次的解析结果"""
+    return load_state()
+
+@st.cache_resource
+def snapshot_reader():
+    return SnapshotReader(SNAPSHOT_FILE)
+
+def _mtime_ns(path):
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+@st.cache_data(max_entries=1)
+def _file_header(mtime_ns):
+    """没有共享内存快照时由状态文件生成与快照头部相同的字段"""
+    state = _load_state_cached(mtime_ns)
+    return {
+        "updated_at": state.get("updated_at", "Unknown"),
+        "last_heartbeat": state.get("last_heartbeat", "Unknown"),
+        "balance": state.get("balance", 0.0),
+        "is_dry_run": state.get("is_dry_run", True),
+        "positions_count": len(state.get("positions", {})),
+        "signals_count": len(state.get("pending_signals", [])),
+        "versions": {"positions": mtime_ns, "signals": mtime_ns, "history": mtime_ns},
+    }
+
+def live_header():
+    """
+    每次轮询读取的全部内容：快照头部 (心跳/余额/数量/各区块版本号) + 状态文件修改时间
+    持仓/信号/历史的版本号只在内容变化时变；file 为状态文件修改时间 (循环/内存等只在文件中的字段以此为键)
+    """
+    mtime_ns = _mtime_ns(STATE_FILE)
+    try:
+        header = snapshot_reader().header()
+    except Exception:
+        header = None
+    header = dict(header or _file_header(mtime_ns))
+    header["file"] = mtime_ns
+    return header
+
+def load_live_state():
+    """余额/心跳/持仓/信号读取共享内存快照 (一致且无需解析 JSON)，其余字段来自状态文件"""
+    mtime_ns = _mtime_ns(STATE_FILE)
+    state = dict(_load_state_cached(mtime_ns))
+    try:
+        snap = snapshot_reader().read()
+    except Exception:
+        snap = None
+    if not snap:
+        return state
+    # 快照不含追踪等扩展字段，按交易对与状态文件中的记录合并
+    file_positions = state.get("positions", {})
+    market = dict(state.get("market") or {})
+    market_positions = snap.pop("market_positions")
+    # 超出快照容量的区块以状态文件为准 (快照只保存了前面一部分)
+    if snap.pop("positions_truncated"):
+        del snap["positions"]
+    else:
+        snap["positions"] = {s: {**file_positions.get(s, {}), **p} for s, p in snap["positions"].items()}
+        market["positions"] = market_positions
+    if snap.pop("signals_truncated"):
+        del snap["pending_signals"]
+    state.update(snap)
+    state["market"] = market
+    return state
+
 def save_command(cmd):
     """保存指令到状态文件"""
     try:
@@ -43,24 +120,62 @@ def save_command(cmd):
         st.error(f"发送指令失败: {e}")
         return False
 
-def load_logs(lines=100):
-    """加载最近的日志"""
-    if LOG_FILE.exists():
-        try:
-            # 读取最后 N 行
-            # 使用简单的读取方式，如果文件很大可能需要优化
-            with open(LOG_FILE, 'r') as f:
-                return "".join(deque(f, lines))
-        except Exception as e:
-            return f"Error reading logs: {e}"
-    return "No log file found."
+def tail_lines(path, lines, block_size=64 * 1024):
+    """从文件末尾向前按块读取最后 N 行 (日志可达数十 MB，不遍历整个文件)"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= lines:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            data = f.read(size) + data
+    return [line.decode('utf-8', errors='replace') for line in data.splitlines(keepends=True)[-lines:]]
+
+def _file_version(path):
+    """文件大小与修改时间 (不存在时为 None)，作为读取结果的缓存键"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+@st.cache_data(max_entries=1)
+def load_logs(lines=100, version=None):
+    """加载最近的日志，version 为文件大小与修改时间，未变化时不重新读取"""
+    if version is None:
+        return "No log file found."
+    try:
+        return "".join(tail_lines(LOG_FILE, lines))
+    except Exception as e:
+        return f"Error reading logs: {e}"
+
+@st.cache_data(max_entries=1)
+def load_structured_logs(lines=500, version=None):
+    """加载最近的结构化日志 (LOG_JSONL=true 时由引擎输出)，version 为文件大小与修改时间，未变化时不重新读取"""
+    records = []
+    try:
+        for line in tail_lines(JSONL_FILE, lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    except Exception as e:
+        st.error(f"Error reading structured logs: {e}")
+    return pd.DataFrame(records)
+
+@st.cache_data(max_entries=1)
+def file_status(file_version):
+    """只在状态文件中的运行指标 (文件变化时才解析)"""
+    state = _load_state_cached(file_version)
+    return state.get("loop") or {}, state.get("memory") or {}
 
-@st.fragment(run_every=50)
 def sidebar_status():
-    state = load_state()
-    last_heartbeat = state.get("last_heartbeat", "Unknown")
-    is_dry_run = state.get("is_dry_run", True)
-    
+    header = live_header()
+    last_heartbeat, is_dry_run = header["last_heartbeat"] or "Unknown", header["is_dry_run"]
+    loop, memory = file_status(header["file"])
+
     st.subheader("🤖 运行状态")
     mode_str = "🟢 模拟模式 (Dry Run)" if is_dry_run else "🔴 实盘模式 (LIVE)"
     st.info(f"当前模式: {mode_str}")
@@ -75,16 +190,41 @@ def sidebar_status():
                 st.error(f"引擎离线?\n最后心跳: {diff:.0f}s ago")
         except:
             st.warning("心跳异常")
+    
+    if loop.get("lagging"):
+        st.warning(f"主循环落后: 漂移 {loop.get('drift_seconds', 0):.0f}s, 本轮已运行 {loop.get('tick_elapsed_seconds', 0):.0f}s")
+
+    if memory:
+        rss, limit = memory.get("rss_mb", 0), memory.get("soft_limit_mb", 0)
+        text = f"内存: {rss:.0f}MB / 软上限 {limit:.0f}MB (峰值 {memory.get('peak_rss_mb', 0):.0f}MB)"
+        if limit and rss > limit:
+            st.warning(text)
+        else:
+            st.caption(text)
+        with st.expander("🧠 内存明细"):
+            sizes = memory.get("sizes_kb") or {}
+            if sizes:
+                st.dataframe(
+                    pd.DataFrame(sorted(sizes.items(), key=lambda x: -x[1]), columns=["Subsystem", "KB"]),
+                    width='stretch', hide_index=True,
+                )
+            if memory.get("tracing"):
+                st.info("tracemalloc 追踪中…")
+            elif memory.get("profile"):
+                st.caption(f"tracemalloc 增长 ({memory.get('profiled_at', '')[:19].replace('T', ' ')})")
+                st.dataframe(pd.DataFrame(memory["profile"]), width='stretch', hide_index=True)
+            if st.button("开始内存分析 (tracemalloc)", key="memory_profile"):
+                if save_command({"action": "MEMORY_PROFILE", "timestamp": datetime.now(UTC).isoformat()}):
+                    st.toast("已发送内存分析指令")
 
 # === 侧边栏：长期稳定项 ===
 st.sidebar.title("Corniche Bot")
-auto_refresh = st.sidebar.checkbox("Auto Refresh (50s)", value=True)
+auto_refresh = st.sidebar.checkbox("Auto Refresh (live)", value=True)
+# 各区块独立的片段：按 POLL_SECONDS 检查版本号，只有数据变化的区块重建表格
+live = st.fragment(run_every=POLL_SECONDS if auto_refresh else None)
 
 with st.sidebar:
-    if auto_refresh:
-        sidebar_status()
-    else:
-        sidebar_status()
+    live(sidebar_status)()
 
 # 侧边栏：手动下单 (放在外面保证输入不被打断)
 st.sidebar.markdown("---")
@@ -138,21 +278,42 @@ with st.sidebar.form("manual_order_form"):
 # === 主界面 ===
 st.title("📈 实盘交易监控看板")
 
-@st.fragment(run_every=50)
-def main_content():
-    # 加载数据
-    state = load_state()
-    positions = state.get("positions", {})
-    pending = state.get("pending_signals", [])
-    history = state.get("history", [])
-    balance = state.get("balance", 0.0)
-    updated_at = state.get("updated_at", "Unknown")
+def latency_summary(traces):
+    """各执行阶段耗时分位数 (ms)"""
+    samples = {name: [] for name in SPANS}
+    for trace in traces:
+        for name, value in spans(trace).items():
+            samples[name].append(value)
+    rows = []
+    for name, values in samples.items():
+        if not values:
+            continue
+        s = pd.Series(values)
+        rows.append({
+            "Stage": name,
+            "Count": len(values),
+            "P50 (ms)": round(s.quantile(0.50), 1),
+            "P95 (ms)": round(s.quantile(0.95), 1),
+            "P99 (ms)": round(s.quantile(0.99), 1),
+            "Max (ms)": round(s.max(), 1),
+        })
+    return pd.DataFrame(rows)
+
+def current_state():
+    """完整状态 (只在按区块版本号缓存的构建函数内部调用，版本未变化时不会执行)"""
+    return load_live_state()
+
+def summary_section():
+    # 只用快照头部，不解析状态文件
+    header = live_header()
+    balance, n_positions, n_pending = header["balance"], header["positions_count"], header["signals_count"]
+    updated_at = header["updated_at"] or "Unknown"
 
     # 顶部指标
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("资金余额", f"{balance:.2f} USDT")
-    col2.metric("持仓数量", len(positions))
-    col3.metric("待建仓信号", len(pending))
+    col2.metric("持仓数量", n_positions)
+    col3.metric("待建仓信号", n_pending)
 
     # 处理更新时间显示
     if updated_at and updated_at != "Unknown":
@@ -172,120 +333,236 @@ def main_content():
         except:
             col4.metric("最后更新", updated_at)
 
-    # 1. 持仓管理
-    st.subheader("🛡 当前持仓 (Positions)")
-    if positions:
-        pos_data = []
-        for symbol, p in positions.items():
-            entry_time = p.get('entry_time', '')
-            hold_time_str = "N/A"
-            hours = 0
-            if entry_time:
-                try:
-                    et = datetime.fromisoformat(entry_time).replace(tzinfo=UTC)
-                    duration = datetime.now(UTC) - et
-                    hours = duration.total_seconds() / 3600
-                    hold_time_str = f"{hours:.1f}h"
-                except: pass
-            
-            # TP 逻辑
-            current_tp = 0.33
-            max_up_12h = p.get('max_up_12h', 0)
-            max_up_24h = p.get('max_up_24h', 0)
-            if hours >= 12 and max_up_12h < 0.025: current_tp = 0.20
-            if hours >= 24 and max_up_24h < 0.05: current_tp = 0.11
-            
-            virtual_entry = p.get('virtual_entry_price', p.get('entry_price', 0))
+@st.cache_data(max_entries=1)
+def positions_table(version, minute):
+    """持仓表 (持仓时长按分钟刷新)"""
+    state = current_state()
+    positions = state.get("positions", {})
+    # 引擎本轮决策时使用的数值 (旧版状态文件没有该字段时回退到本地计算)
+    market = state.get("market") or {}
+    market_positions = market.get("positions", {})
+
+    pos_data = []
+    for symbol, p in positions.items():
+        entry_time = p.get('entry_time', '')
+        hold_time_str = "N/A"
+        hours = 0
+        if entry_time:
+            try:
+                et = datetime.fromisoformat(entry_time).replace(tzinfo=UTC)
+                duration = datetime.now(UTC) - et
+                hours = duration.total_seconds() / 3600
+                hold_time_str = f"{hours:.1f}h"
+            except: pass
+
+        virtual_entry = p.get('virtual_entry_price', p.get('entry_price', 0))
+        view = market_positions.get(symbol)
+        if view:
+            current_price = view['price']
+            target_exit_price = view['target_exit_price']
+            dist_to_exit = view['dist_to_exit']
+            current_pnl = view['pnl_pct']
+        else:
+            # TP 逻辑 (与引擎同一张档位表)
+            current_tp = dynamic_take_profit(hours, p.get('max_up_12h', 0), p.get('max_up_24h', 0), BASE_TAKE_PROFIT)
+
             target_exit_price = virtual_entry * (1 + current_tp)
             current_price = p.get('current_price', 0)
             dist_to_exit = (target_exit_price - current_price) / current_price if current_price > 0 else 0
             current_pnl = (current_price - virtual_entry) / virtual_entry if virtual_entry > 0 and current_price > 0 else 0
 
-            pos_data.append({
-                "Symbol": symbol,
-                "Current Price": f"{current_price:.4f}" if current_price else "N/A",
-                "PnL %": f"{current_pnl*100:.2f}%",
-                "Target Exit": f"{target_exit_price:.4f}",
-                "Dist to Exit": f"{dist_to_exit*100:.1f}%",
-                "Hold Time": hold_time_str,
-                "Entry Time": entry_time.replace('T', ' ').split('.')[0],
-                "Signal Time": p.get('signal_time', 'N/A').replace('T', ' ').split('.')[0],
-                "Virtual Entry": f"{virtual_entry:.4f}",
-                "Added?": "✅" if p.get('is_virtual_added') else "❌"
-            })
-        st.dataframe(pd.DataFrame(pos_data), width='stretch')
+        pos_data.append({
+            "Symbol": symbol,
+            "Current Price": f"{current_price:.4f}" if current_price else "N/A",
+            "PnL %": f"{current_pnl*100:.2f}%",
+            "Target Exit": f"{target_exit_price:.4f}",
+            "Dist to Exit": f"{dist_to_exit*100:.1f}%",
+            "Hold Time": hold_time_str,
+            "Entry Time": entry_time.replace('T', ' ').split('.')[0],
+            "Signal Time": p.get('signal_time', 'N/A').replace('T', ' ').split('.')[0],
+            "Virtual Entry": f"{virtual_entry:.4f}",
+            "Added?": "✅" if p.get('is_virtual_added') else "❌"
+        })
+    return pd.DataFrame(pos_data)
+
+def positions_section():
+    # 1. 持仓管理
+    st.subheader("🛡 当前持仓 (Positions)")
+    pos_df = positions_table(live_header()["versions"]["positions"], int(time.time() // 60))
+    if not pos_df.empty:
+        st.dataframe(pos_df, width='stretch')
 
         # 紧急操作
         st.markdown("---")
         st.caption("🚨 紧急操作 (Emergency Controls)")
-        cols = st.columns(max(len(positions), 1))
-        for i, symbol in enumerate(positions.keys()):
+        symbols = pos_df["Symbol"].tolist()
+        cols = st.columns(max(len(symbols), 1))
+        for i, symbol in enumerate(symbols):
             if cols[i].button(f"平仓 {symbol}", key=f"close_{symbol}"):
                 cmd = {"action": "CLOSE", "symbol": symbol, "timestamp": datetime.now(UTC).isoformat()}
                 if save_command(cmd): st.toast(f"已发送 {symbol} 平仓指令")
     else:
         st.info("当前无持仓")
 
+@st.cache_data(max_entries=1)
+def pending_table(version, minute):
+    """待建仓信号表 (剩余时间按分钟刷新)"""
+    pend_data = []
+    for p in current_state().get("pending_signals", []):
+        timeout = p.get('timeout_time', '')
+        expire_in = "N/A"
+        if timeout:
+            try:
+                to = datetime.fromisoformat(timeout).replace(tzinfo=UTC)
+                diff = to - datetime.now(UTC)
+                expire_in = f"{diff.total_seconds()/3600:.1f}h" if diff.total_seconds() > 0 else "Expired"
+            except: pass
+        pend_data.append({
+            "Symbol": p.get('symbol'),
+            "Signal Close": p.get('signal_close'),
+            "Surge Ratio": f"{p.get('buy_surge_ratio', 0):.2f}x",
+            "Target Price": p.get('target_entry_price'),
+            "Drop Required": f"{p.get('drop_pct', 0)*100:.1f}%",
+            "Current Price": p.get('current_price'),
+            "Distance": f"{p.get('distance_pct', 0)*100:.1f}%",
+            "Signal Time": p.get('signal_time', '').replace('T', ' '),
+            "Timeout Time": p.get('timeout_time', '').split('.')[0].replace('T', ' '),
+            "Expire In": expire_in,
+            "Created At": p.get('created_at', '').split('.')[0].replace('T', ' ')
+        })
+    return pd.DataFrame(pend_data)
+
+def pending_section():
     # 2. 待建仓信号
     st.subheader("📋 待建仓信号 (Pending Signals)")
-    if pending:
-        pend_data = []
-        for p in pending:
-            timeout = p.get('timeout_time', '')
-            expire_in = "N/A"
-            if timeout:
-                try:
-                    to = datetime.fromisoformat(timeout).replace(tzinfo=UTC)
-                    diff = to - datetime.now(UTC)
-                    expire_in = f"{diff.total_seconds()/3600:.1f}h" if diff.total_seconds() > 0 else "Expired"
-                except: pass
-            pend_data.append({
-                "Symbol": p.get('symbol'),
-                "Signal Close": p.get('signal_close'),
-                "Surge Ratio": f"{p.get('buy_surge_ratio', 0):.2f}x",
-                "Target Price": p.get('target_entry_price'),
-                "Drop Required": f"{p.get('drop_pct', 0)*100:.1f}%",
-                "Current Price": p.get('current_price'),
-                "Distance": f"{p.get('distance_pct', 0)*100:.1f}%",
-                "Signal Time": p.get('signal_time', '').replace('T', ' '),
-                "Timeout Time": p.get('timeout_time', '').split('.')[0].replace('T', ' '),
-                "Expire In": expire_in,
-                "Created At": p.get('created_at', '').split('.')[0].replace('T', ' ')
-            })
-        st.dataframe(pd.DataFrame(pend_data), width='stretch')
+    pend_df = pending_table(live_header()["versions"]["signals"], int(time.time() // 60))
+    if not pend_df.empty:
+        st.dataframe(pend_df, width='stretch')
     else: st.info("当前无等待信号")
 
+@st.cache_data(max_entries=1)
+def history_table(history_version):
+    """历史成交表 (只在有新的平仓时重建)"""
+    hist_data = []
+    for h in current_state().get("history", []):
+        pnl = h.get('pnl_pct', 0)
+        hist_data.append({
+            "Symbol": h.get('symbol'),
+            "Reason": h.get('reason'),
+            "Entry Price": f"{h.get('entry_price', 0):.4f}",
+            "Exit Price": f"{h.get('exit_price', 0):.4f}",
+            "PnL %": f"{pnl*100:.2f}%",
+            "Entry Time": h.get('entry_time', '').replace('T', ' ').split('.')[0],
+            "Exit Time": h.get('exit_time', '').replace('T', ' ').split('.')[0]
+        })
+    return pd.DataFrame(hist_data)
+
+def history_section():
     # 3. 历史成交
     st.subheader("📊 历史成交 (Trade History)")
-    if history:
-        hist_data = []
-        for h in history:
-            pnl = h.get('pnl_pct', 0)
-            hist_data.append({
-                "Symbol": h.get('symbol'),
-                "Reason": h.get('reason'),
-                "Entry Price": f"{h.get('entry_price', 0):.4f}",
-                "Exit Price": f"{h.get('exit_price', 0):.4f}",
-                "PnL %": f"{pnl*100:.2f}%",
-                "Entry Time": h.get('entry_time', '').replace('T', ' ').split('.')[0],
-                "Exit Time": h.get('exit_time', '').replace('T', ' ').split('.')[0]
-            })
-        st.dataframe(pd.DataFrame(hist_data), width='stretch')
+    hist_df = history_table(live_header()["versions"]["history"])
+    if not hist_df.empty:
+        st.dataframe(hist_df, width='stretch')
     else: st.info("暂无历史成交记录")
 
+@st.cache_data(max_entries=1)
+def latency_table(history_version, positions_count):
+    """
+    执行延迟分位数 (含持仓中的追踪)
+    追踪只在开仓/平仓时变化：平仓改变历史版本，开仓改变持仓数量，价格变化不触发重建
+    """
+    state = current_state()
+    traces = [h['trace'] for h in state.get("history", []) if h.get('trace')]
+    traces += [p['trace'] for p in state.get("positions", {}).values() if p.get('trace')]
+    return latency_summary(traces) if traces else pd.DataFrame()
+
+def latency_section():
+    # 执行延迟 (信号 -> 触发 -> 下单 -> 成交)
+    header = live_header()
+    latency_df = latency_table(header["versions"]["history"], header["positions_count"])
+    if not latency_df.empty:
+        st.subheader("⏱ 执行延迟 (Signal-to-Fill Latency)")
+        st.dataframe(latency_df, width='stretch')
+
+@st.cache_data(max_entries=1)
+def performance_data(history_version):
+    """引擎增量维护的绩效统计 (只读取汇总值，不遍历历史成交)"""
+    data = current_state().get("performance")
+    if not data:
+        return None
+    stats = PerformanceStats.from_dict(data)
+
+    def bucket_rows(buckets, label, order=None):
+        keys = [k for k in order if k in buckets] if order else sorted(buckets)
+        return pd.DataFrame([{
+            label: k,
+            "Trades": buckets[k].trades,
+            "Win Rate": f"{buckets[k].win_rate*100:.1f}%",
+            "Avg PnL %": f"{buckets[k].avg_pnl*100:.2f}%",
+            "Total PnL %": f"{buckets[k].pnl_sum*100:.2f}%",
+        } for k in keys])
+
+    equity = pd.DataFrame(stats.equity, columns=["Exit Time", "Cum PnL %"])
+    equity["Exit Time"] = pd.to_datetime(equity["Exit Time"], utc=True, format="ISO8601")
+    equity["Cum PnL %"] = equity["Cum PnL %"] * 100
+    return (
+        stats,
+        bucket_rows(stats.by_reason, "Reason"),
+        bucket_rows(stats.by_hold, "Hold Time", [label for _, label in HOLD_BUCKETS]),
+        equity.set_index("Exit Time"),
+    )
+
+def performance_section():
+    # 绩效统计 (每次平仓时由引擎更新)
+    data = performance_data(live_header()["versions"]["history"])
+    if not data or not data[0].total.trades:
+        return
+    stats, by_reason, by_hold, equity = data
+    st.subheader("🏆 绩效统计 (Performance)")
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("成交笔数", stats.total.trades)
+    col2.metric("胜率", f"{stats.total.win_rate*100:.1f}%")
+    col3.metric("累计盈亏", f"{stats.cum_pnl*100:.2f}%")
+    col4.metric("最大回撤", f"{stats.max_drawdown*100:.2f}%")
+    col5.metric("当前回撤", f"{stats.drawdown*100:.2f}%")
+    st.line_chart(equity)
+    t_col1, t_col2 = st.columns(2)
+    t_col1.caption("按平仓原因")
+    t_col1.dataframe(by_reason, width='stretch', hide_index=True)
+    t_col2.caption("按持仓时长")
+    t_col2.dataframe(by_hold, width='stretch', hide_index=True)
+
+def logs_section():
     # 4. 实时日志
-    st.subheader("📝 运行日志 (Latest 100 lines)")
-    logs = load_logs(100)
-    st.code(logs, language="text")
+    if JSONL_FILE.exists():
+        st.subheader("📝 运行日志 (Structured, latest 500)")
+        stat = JSONL_FILE.stat()
+        log_df = load_structured_logs(500, version=(stat.st_size, stat.st_mtime_ns))
+        if not log_df.empty:
+            f_col1, f_col2 = st.columns([1, 2])
+            levels = f_col1.multiselect("级别", ["DEBUG", "INFO", "WARNING", "ERROR"], default=["INFO", "WARNING", "ERROR"])
+            keyword = f_col2.text_input("关键字 (如 BTCUSDT)")
+            log_df = log_df[log_df["level"].isin(levels)]
+            if keyword:
+                log_df = log_df[log_df["msg"].str.contains(keyword, case=False, regex=False)]
+            st.dataframe(log_df[["time", "level", "msg"]].iloc[::-1], width='stretch')
+    else:
+        st.subheader("📝 运行日志 (Latest 100 lines)")
+        logs = load_logs(100, version=_file_version(LOG_FILE))
+        st.code(logs, language="text")
 
+def footer_section():
     # 底部说明
     st.markdown("---")
     utc_now = datetime.now(UTC)
     bj_now = utc_now + timedelta(hours=8)
     st.caption(f"Server Time: {utc_now.strftime('%Y-%m-%d %H:%M:%S')} (UTC) / {bj_now.strftime('%Y-%m-%d %H:%M:%S')} (BJ)")
 
-if auto_refresh:
-    main_content()
-else:
-    main_content()
-
+live(summary_section)()
+live(positions_section)()
+live(pending_section)()
+live(history_section)()
+live(latency_section)()
+live(performance_section)()
+live(logs_section)()
+live(footer_section)()
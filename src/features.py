@@ -0,0 +1,197 @@
+import logging
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Collection, Deque, List, Optional, Tuple
+
+import numpy as np
+
+HOUR_MS = 3600 * 1000
+
+# 本地窗口列索引 (与 market_cache / kline2df 的字段顺序一致)
+COL_OPEN_TIME, COL_OPEN, COL_HIGH, COL_LOW, COL_CLOSE, COL_VOLUME = 0, 1, 2, 3, 4, 5
+COL_QUOTE_VOLUME, COL_BUY_VOLUME = 7, 9
+
+TIMEFRAME_MS = {"4h": 4 * HOUR_MS, "1d": 24 * HOUR_MS}
+
+
+@dataclass(slots=True)
+class Bar:
+    """由 1h K线合成的高周期K线"""
+    open_time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    quote_volume: float
+    buy_volume: float
+
+
+class _Resampler:
+    """将收盘的 1h K线按 UTC 边界合成高周期K线 (只输出由完整的连续 1h K线合成的K线)"""
+
+    def __init__(self, period_ms: int, max_bars: int):
+        self.period_ms = period_ms
+        self.bars: Deque[Bar] = deque(maxlen=max_bars)
+        self.current: Optional[Bar] = None
+        self._complete = False  # 当前K线从周期起点开始且中间没有缺K线 (窗口开头的残缺K线不输出)
+        self._next_open = 0
+
+    def add(self, row: np.ndarray):
+        open_time = int(row[COL_OPEN_TIME])
+        bucket = open_time - open_time % self.period_ms
+        bar = self.current
+        if bar is not None and bar.open_time != bucket:
+            # 上一根缺少最后几根 1h K线，不完整，丢弃
+            bar = self.current = None
+        if bar is None:
+            self._complete = open_time == bucket
+            bar = self.current = Bar(
+                bucket, row[COL_OPEN], row[COL_HIGH], row[COL_LOW], row[COL_CLOSE],
+                row[COL_VOLUME], row[COL_QUOTE_VOLUME], row[COL_BUY_VOLUME],
+            )
+        else:
+            self._complete = self._complete and open_time == self._next_open
+            bar.high = max(bar.high, row[COL_HIGH])
+            bar.low = min(bar.low, row[COL_LOW])
+            bar.close = row[COL_CLOSE]
+            bar.volume += row[COL_VOLUME]
+            bar.quote_volume += row[COL_QUOTE_VOLUME]
+            bar.buy_volume += row[COL_BUY_VOLUME]
+        self._next_open = open_time + HOUR_MS
+        if self._next_open >= bucket + self.period_ms:
+            if self._complete:
+                self.bars.append(bar)
+            self.current = None
+
+
+class SymbolFeatures:
+    """单个交易对的滚动特征，每根 1h K线收盘时 O(1) 更新"""
+
+    def __init__(self, window_hours: int = 24, max_bars: int = 30):
+        self.window_hours = window_hours
+        self.last_open_time = -1
+        self._buy_volumes: Deque[float] = deque()
+        self._volumes: Deque[float] = deque()
+        self._quote_volumes: Deque[float] = deque()
+        self._open_times: Deque[int] = deque()
+        # 单调递减队列维护窗口最高价
+        self._highs: Deque[Tuple[int, float]] = deque()
+        self._buy_volume_sum = 0.0
+        self._volume_sum = 0.0
+        self._quote_volume_sum = 0.0
+        self.resamplers = {tf: _Resampler(ms, max_bars) for tf, ms in TIMEFRAME_MS.items()}
+
+    def on_candle_close(self, row: np.ndarray):
+        """合入一根已收盘的 1h K线"""
+        open_time = int(row[COL_OPEN_TIME])
+        if open_time <= self.last_open_time:
+            return
+        self.last_open_time = open_time
+
+        self._open_times.append(open_time)
+        self._buy_volumes.append(row[COL_BUY_VOLUME])
+        self._volumes.append(row[COL_VOLUME])
+        self._quote_volumes.append(row[COL_QUOTE_VOLUME])
+        self._buy_volume_sum += row[COL_BUY_VOLUME]
+        self._volume_sum += row[COL_VOLUME]
+        self._quote_volume_sum += row[COL_QUOTE_VOLUME]
+        while self._highs and self._highs[-1][1] <= row[COL_HIGH]:
+            self._highs.pop()
+        self._highs.append((open_time, row[COL_HIGH]))
+
+        # 移出窗口外的K线 (按时间而非根数，缺K线时窗口依然是 24h)
+        window_start = open_time - (self.window_hours - 1) * HOUR_MS
+        while self._open_times and self._open_times[0] < window_start:
+            self._open_times.popleft()
+            self._buy_volume_sum -= self._buy_volumes.popleft()
+            self._volume_sum -= self._volumes.popleft()
+            self._quote_volume_sum -= self._quote_volumes.popleft()
+        while self._highs and self._highs[0][0] < window_start:
+            self._highs.popleft()
+
+        for resampler in self.resamplers.values():
+            resampler.add(row)
+
+    @property
+    def candle_count(self) -> int:
+        return len(self._open_times)
+
+    def buy_volume_mean(self) -> float:
+        """窗口内主动买量均值"""
+        return self._buy_volume_sum / len(self._buy_volumes) if self._buy_volumes else 0.0
+
+    def max_high(self) -> float:
+        """窗口内最高价"""
+        return self._highs[0][1] if self._highs else 0.0
+
+    def vwap(self) -> float:
+        """窗口内成交量加权均价 (成交额 / 成交量)"""
+        return self._quote_volume_sum / self._volume_sum if self._volume_sum > 0 else 0.0
+
+    def bars(self, timeframe: str) -> List[Bar]:
+        """已完成的高周期K线 (如 "4h", "1d")"""
+        return list(self.resamplers[timeframe].bars)
+
+
+# 额外的扫描过滤器: (symbol, features) -> 是否保留
+FeatureFilter = Callable[[str, SymbolFeatures], bool]
+
+
+class FeatureStore:
+    """
+    所有交易对的本地特征，基于 KlineWindowCache 中的 1h 窗口增量维护
+
+    max_symbols 为条目上限：超出时淘汰最久未更新/读取的交易对 (下次扫描由K线窗口重新累积)
+    """
+
+    def __init__(self, window_hours: int = 24, max_bars: int = 30, max_symbols: Optional[int] = None):
+        self.window_hours = window_hours
+        self.max_bars = max_bars
+        self.max_symbols = max_symbols
+        self._features: "OrderedDict[str, SymbolFeatures]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def get(self, symbol: str) -> Optional[SymbolFeatures]:
+        features = self._features.get(symbol)
+        if features is not None:
+            self._features.move_to_end(symbol)
+        return features
+
+    def update_from_window(self, symbol: str, window: np.ndarray) -> SymbolFeatures:
+        """合入窗口中新收盘的K线 (最后一根尚未收盘，跳过)"""
+        features = self._features.get(symbol)
+        if features is None:
+            features = self._features[symbol] = SymbolFeatures(self.window_hours, self.max_bars)
+            self._enforce_limit()
+        else:
+            self._features.move_to_end(symbol)
+        closed = window[:-1]
+        if len(closed):
+            start = int(np.searchsorted(closed[:, COL_OPEN_TIME], features.last_open_time, side="right"))
+            for row in closed[start:]:
+                features.on_candle_close(row)
+        return features
+
+    def _enforce_limit(self):
+        if self.max_symbols is not None and len(self._features) > self.max_symbols:
+            # 多淘汰 10%，避免每个新交易对都触发
+            keep = int(self.max_symbols * 0.9)
+            count = len(self._features) - keep
+            for _ in range(count):
+                self._features.popitem(last=False)
+            self.evictions += count
+            logging.info(f"🧠 特征缓存超出上限 {self.max_symbols} 个交易对，淘汰 {count} 个")
+
+    def retain(self, symbols: Collection[str]) -> int:
+        """只保留仍在交易的交易对 (下架的交易对不再更新)，返回清除的条目数"""
+        stale = [symbol for symbol in self._features if symbol not in symbols]
+        for symbol in stale:
+            del self._features[symbol]
+        return len(stale)
+
+    def discard(self, symbol: str):
+        self._features.pop(symbol, None)
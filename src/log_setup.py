@@ -0,0 +1,148 @@
+import abc
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+from datetime import datetime, UTC
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener: Optional[QueueListener] = None
+
+
+class DeferredMessage(abc.ABC):
+    """延迟格式化的日志参数：在日志线程中才生成文本，结果缓存供多个 handler 复用"""
+
+    def __init__(self):
+        self._text: Optional[str] = None
+
+    @abc.abstractmethod
+    def render(self) -> str:
+        """生成日志文本 (在日志线程中调用)"""
+
+    def __str__(self) -> str:
+        if self._text is None:
+            try:
+                self._text = self.render()
+            except Exception as e:
+                self._text = f"<render failed: {e}>"
+        return self._text
+
+
+class LazyTable(DeferredMessage):
+    """状态表：调用方只传入行数据快照，DataFrame 构建与 markdown 渲染交给日志线程"""
+
+    def __init__(self, title: str, rows: List[Dict[str, Any]]):
+        super().__init__()
+        self.title = title
+        self.rows = rows
+
+    def render(self) -> str:
+        import pandas as pd
+        df = pd.DataFrame(self.rows)
+        try:
+            table_str = df.to_markdown(index=False)
+        except Exception:
+            table_str = df.to_string(index=False)
+        return f"\n=== {self.title} ===\n{table_str}"
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """含 DeferredMessage 参数的记录不在调用线程格式化"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args and not record.exc_info and any(isinstance(a, DeferredMessage) for a in record.args):
+            return copy.copy(record)
+        return super().prepare(record)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """结构化日志：每行一个 JSON 对象，extra={"event": {...}} 的字段会被展开"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        event = getattr(record, "event", None)
+        if isinstance(event, dict):
+            data.update(event)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _file_handler(path: Path) -> logging.Handler:
+    """按环境变量选择按时间或按大小滚动"""
+    when = os.getenv("LOG_ROTATE_WHEN")
+    backups = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    if when:
+        return TimedRotatingFileHandler(path, when=when, backupCount=backups, encoding="utf-8", utc=True)
+    max_bytes = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+    return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+
+
+def setup_logging(log_dir: Path, level: int = logging.INFO, name: str = "trading") -> QueueListener:
+    """
+    配置异步日志：业务线程只把记录放入队列，由后台线程写文件/终端
+
+    环境变量:
+    LOG_MAX_BYTES / LOG_BACKUP_COUNT: 按大小滚动 (默认 20MB x 5)
+    LOG_ROTATE_WHEN: 设置后改为按时间滚动 (如 "midnight", "H")
+    LOG_JSONL: 为 true 时额外输出 logs/trading.jsonl 结构化日志
+    name: 日志文件名 (多进程运行时每个进程使用独立的文件，避免同时滚动同一文件)
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_dir.mkdir(parents=True, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = _file_handler(log_dir / f"{name}.log")
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    handlers = [file_handler, stream_handler]
+
+    if os.getenv("LOG_JSONL", "false").lower() == "true":
+        jsonl_handler = _file_handler(log_dir / f"{name}.jsonl")
+        jsonl_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(jsonl_handler)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(_DeferredQueueHandler(log_queue))
+    root_logger.setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """刷新队列中剩余的日志并停止后台线程"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def pending_records() -> List[logging.LogRecord]:
+    """队列中尚未写出的日志记录 (内存统计用，写线程卡住时会持续增长)"""
+    if _listener is None:
+        return []
+    log_queue = _listener.queue
+    with log_queue.mutex:
+        return list(log_queue.queue)
@@ -0,0 +1,242 @@
+"""
+主循环看门狗与健康检查端点
+
+- 每轮 tick 按固定节奏 (默认 60s) 计算启动漂移，各阶段耗时对照预算，超时记录告警
+- 预算超过一个周期的阶段 (整点扫描) 在预算内运行属于正常情况，这部分时间不计入落后，
+  下一轮的计划开始时间也相应顺延
+- 落后时 (漂移或本轮耗时超出容忍) 跳过/推迟低优先级工作 (状态表、扫描进度日志、余额刷新)，
+  优先保证持仓监控与平仓
+- 可选的本地 HTTP 端点 (HEALTH_PORT): /healthz 存活检查，/readyz 就绪检查，正常 200，异常 503
+"""
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from clock import Clock
+
+# 各阶段耗时预算 (秒)
+DEFAULT_BUDGETS = {
+    "commands": 5.0,
+    "scan": 300.0,
+    "context": 5.0,
+    "signals": 10.0,
+    "monitor": 10.0,
+    "balance": 5.0,
+    "status": 2.0,
+    "memory": 5.0,
+}
+
+
+class LoopWatchdog:
+    """记录主循环的节奏与阶段耗时，判断是否需要降级"""
+
+    def __init__(
+        self,
+        clock: Optional[Clock] = None,
+        interval: float = 60.0,
+        budgets: Optional[Dict[str, float]] = None,
+        lag_tolerance: float = 15.0,
+        stall_after: float = 180.0,
+    ):
+        self.clock = clock or Clock()
+        self.interval = interval
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.lag_tolerance = lag_tolerance
+        self.stall_after = stall_after
+        self.ticks = 0
+        self.tick_started_at: Optional[float] = None
+        self.in_tick = False
+        self.scheduled_at: Optional[float] = None  # 按固定节奏本轮应开始的时间
+        self.drift = 0.0
+        self.last_tick_seconds = 0.0
+        self.last_beat = self.clock.time()
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_finished_at: Dict[str, float] = {}
+        self.stage_running: Dict[str, float] = {}  # 正在运行的阶段 -> 开始时间
+        self.tick_on_budget = 0.0  # 本轮长阶段在预算内已用的时间 (不计入落后)
+        self.overruns: Dict[str, int] = {}
+        self.shed_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    # ---- tick / 阶段 ----
+    def tick_started(self):
+        now = self.clock.time()
+        with self._lock:
+            self.drift = max(0.0, now - self.scheduled_at) if self.scheduled_at is not None else 0.0
+            self.tick_started_at = now
+            self.tick_on_budget = 0.0
+            self.in_tick = True
+            self.last_beat = now
+        if self.drift > self.lag_tolerance:
+            logging.warning(f"⏱ 主循环落后 {self.drift:.1f}s，本轮跳过低优先级任务")
+
+    def tick_finished(self) -> float:
+        """结束本轮，返回距下一轮的等待时间 (固定节奏，落后时立即开始下一轮)"""
+        now = self.clock.time()
+        with self._lock:
+            started = self.tick_started_at if self.tick_started_at is not None else now
+            self.last_tick_seconds = now - started
+            self.ticks += 1
+            self.in_tick = False
+            self.last_beat = now
+            # 超时的一轮结束后立即开始下一轮 (不补跑错过的周期)，下一轮的漂移即为落后量；
+            # 长阶段在预算内的耗时顺延计划时间，不算作落后
+            self.scheduled_at = started + self.interval + self.tick_on_budget
+            return max(0.0, self.scheduled_at - now)
+
+    def beat(self):
+        """长任务中的进度心跳 (存活检查依据)"""
+        self.last_beat = self.clock.time()
+
+    def is_long_stage(self, name: str) -> bool:
+        """预算超过一个周期的阶段"""
+        budget = self.budgets.get(name)
+        return budget is not None and budget > self.interval
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = self.clock.time()
+        with self._lock:
+            self.stage_running[name] = started
+        try:
+            yield
+        finally:
+            now = self.clock.time()
+            elapsed = now - started
+            budget = self.budgets.get(name)
+            with self._lock:
+                self.stage_running.pop(name, None)
+                self.stage_seconds[name] = elapsed
+                self.stage_finished_at[name] = now
+                self.last_beat = now
+                if self.in_tick and self.is_long_stage(name):
+                    self.tick_on_budget += min(elapsed, budget)
+            if budget is not None and elapsed > budget:
+                self.overruns[name] = self.overruns.get(name, 0) + 1
+                logging.warning(f"⏱ 阶段 {name} 耗时 {elapsed:.1f}s，超出预算 {budget:.0f}s")
+
+    def since(self, name: str) -> Optional[float]:
+        """距某阶段上次完成的秒数 (从未运行时为 None)"""
+        finished = self.stage_finished_at.get(name)
+        return None if finished is None else self.clock.time() - finished
+
+    # ---- 降级判断 ----
+    def tick_elapsed(self) -> float:
+        return self.clock.time() - self.tick_started_at if self.in_tick else 0.0
+
+    def on_budget_seconds(self) -> float:
+        """本轮长阶段在预算内的耗时 (含正在运行的长阶段)"""
+        if not self.in_tick:
+            return 0.0
+        now = self.clock.time()
+        seconds = self.tick_on_budget
+        for name, started in list(self.stage_running.items()):
+            if self.is_long_stage(name):
+                seconds += min(now - started, self.budgets[name])
+        return seconds
+
+    def is_lagging(self) -> bool:
+        """
+        本轮启动已落后，或本轮扣除长阶段预算内耗时后已运行超过一个周期
+        (两轮之间按上一轮的漂移判断)；整点扫描在预算内运行不算落后
+        """
+        return self.drift > self.lag_tolerance or self.tick_elapsed() - self.on_budget_seconds() > self.interval
+
+    def shed(self, name: str) -> bool:
+        """落后时返回 True (调用方跳过该低优先级任务)"""
+        if not self.is_lagging():
+            return False
+        self.shed_counts[name] = self.shed_counts.get(name, 0) + 1
+        logging.debug("⏱ 主循环落后，跳过 %s", name)
+        return True
+
+    # ---- 健康状态 ----
+    def is_alive(self) -> bool:
+        return self.clock.time() - self.last_beat < self.stall_after
+
+    def is_ready(self) -> bool:
+        return self.ticks > 0 and self.is_alive() and not self.is_lagging()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ticks": self.ticks,
+                "drift_seconds": round(self.drift, 3),
+                "last_tick_seconds": round(self.last_tick_seconds, 3),
+                "tick_elapsed_seconds": round(self.tick_elapsed(), 3),
+                "on_budget_seconds": round(self.on_budget_seconds(), 3),
+                "seconds_since_beat": round(self.clock.time() - self.last_beat, 3),
+                "lagging": self.is_lagging(),
+                "stage_seconds": {k: round(v, 3) for k, v in self.stage_seconds.items()},
+                "overruns": dict(self.overruns),
+                "shed": dict(self.shed_counts),
+            }
+
+
+class HealthServer:
+    """本地健康检查端点 (供 PM2 之外的监控探测)，在后台线程中运行"""
+
+    def __init__(
+        self,
+        watchdog: LoopWatchdog,
+        port: int,
+        host: str = "127.0.0.1",
+        status: Optional[Callable[[], Dict[str, Any]]] = None,
+        ready: Optional[Callable[[], bool]] = None,
+    ):
+        self.watchdog = watchdog
+        self.status = status
+        self.ready = ready
+        handler = self._handler()
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="health", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"🩺 健康检查端点: http://{host}:{port}/healthz /readyz")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _body(self, check: str):
+        watchdog = self.watchdog
+        ok = watchdog.is_alive()
+        if check == "ready":
+            ok = watchdog.is_ready() and (self.ready() if self.ready else True)
+        body = {"status": "ok" if ok else "fail", "check": check, "loop": watchdog.snapshot()}
+        if self.status:
+            try:
+                body.update(self.status())
+            except Exception as e:
+                body["status_error"] = str(e)
+        return (200 if ok else 503), body
+
+    def _handler(self):
+        health = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0].rstrip("/")
+                checks = {"/healthz": "live", "/health": "live", "/readyz": "ready", "/ready": "ready"}
+                if path not in checks:
+                    self.send_error(404)
+                    return
+                code, body = health._body(checks[path])
+                payload = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                # 探测请求频繁，不写入业务日志
+                pass
+
+        return Handler
@@ -1,15 +1,34 @@
 import time
-import json
 import logging
 import threading
 import os
+import queue
 import pandas as pd
-from datetime import datetime, timedelta, UTC
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
 # 使用当前目录下的 binance_api
 from binance_api import BinanceAPI, kline2df
+from market_cache import KlineWindowCache, SymbolTableCache
+from records import Position, PendingSignal, SignalBook
+from log_setup import setup_logging, LazyTable, pending_records
+from market_context import MarketContext, first_peak_minute, fold_candle_highs, BASE_TAKE_PROFIT, MINUTE_MS, HOUR_MS
+from position_book import PositionBook, ACTION_VIRTUAL_ADD
+from performance import append_trade, restore as restore_performance
+from features import FeatureStore
+from tracing import new_trace, mark, spans
+from strategy_plugin import StrategyPlugin, Candidate, Fill
+from buy_surge import BuySurgePlugin
+from scan_checkpoint import ScanCheckpoint
+from rate_limit import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from state_snapshot import SnapshotWriter
+from analytics_export import AnalyticsExporter
+from state_schema import STATE_VERSION, StateLoadError, migrate, dumps, loads
+from clock import Clock
+from loop_watchdog import LoopWatchdog, HealthServer
+from memory_monitor import MemoryMonitor, deep_sizeof, MB
+from sharding import ROLE_STANDALONE, ROLE_WORKER, ROLE_COORDINATOR, HashRing, shard_filter
 
 # 设置目录路径
 BASE_DIR = Path(__file__).parent.parent
@@ -17,25 +36,8 @@ LOG_DIR = BASE_DIR / "logs"
 DATA_DIR = BASE_DIR / "data"
 
 # 确保目录存在
-LOG_DIR.mkdir(exist_ok=True)
 DATA_DIR.mkdir(exist_ok=True)
 
-# 重新配置日志
-root_logger = logging.getLogger()
-if root_logger.handlers:
-    for handler in root_logger.handlers:
-        root_logger.removeHandler(handler)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_DIR / "trading.log"),
-        logging.StreamHandler()
-    ],
-    force=True
-)
-
 class RealTimeBuySurgeStrategyV3:
     _instance = None
     _lock = threading.Lock()
@@ -47,7 +49,18 @@ class RealTimeBuySurgeStrategyV3:
                 cls._instance._initialized = False
             return cls._instance
 
-    def __init__(self, dry_run: Optional[bool] = None):
+    def __init__(
+        self,
+        dry_run: Optional[bool] = None,
+        api: Optional[BinanceAPI] = None,
+        data_dir: Optional[Path] = None,
+        clock: Optional[Clock] = None,
+        role: str = ROLE_STANDALONE,
+        shard: Optional[Tuple[int, int]] = None,
+        signal_queue=None,
+        universe_queue=None,
+        universe_queues: Optional[List] = None,
+    ):
         if self._initialized:
             return
             
@@ -58,31 +71,42 @@ class RealTimeBuySurgeStrategyV3:
         else:
             self.dry_run = not env_live_mode
             
-        self.api = BinanceAPI()
-        self.state_file = DATA_DIR / "trading_state.json"
+        # api / data_dir / clock 可注入 (回放、模拟与离线测试时使用独立的数据目录和虚拟时钟)
+        self.api = api or BinanceAPI()
+        self.clock = clock or Clock()
+        
+        # 主循环看门狗：固定 60s 节奏，记录漂移与各阶段耗时，落后时跳过低优先级任务
+        self.tick_interval = 60
+        self.watchdog = LoopWatchdog(self.clock, interval=self.tick_interval)
+        self.balance_max_staleness = 600  # 落后时余额刷新最多推迟 10 分钟
+        self.health_port = int(os.getenv("HEALTH_PORT", "0") or 0)
+        self.health_server: Optional[HealthServer] = None
+        self.data_dir = Path(data_dir) if data_dir else DATA_DIR
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.state_file = self.data_dir / "trading_state.json"
         
         # 加载状态
         state = self.load_state()
-        self.positions = state.get("positions", {})
-        self.pending_signals = state.get("pending_signals", [])
+        self.positions: Dict[str, Position] = {
+            symbol: Position.from_dict(p) for symbol, p in state.get("positions", {}).items()
+        }
+        self.position_book = PositionBook()  # 持仓的列式视图，供批量退出判定
+        self.pending_signals = SignalBook.from_list(state.get("pending_signals", []))
         self.history = state.get("history", [])
+        # 绩效统计随平仓增量更新；每笔平仓同时追加到不截断的成交日志，可据此全量重算
+        self.trade_log = self.data_dir / "trades.jsonl"
+        self.performance = restore_performance(state, self.trade_log, self.history)
         self.pending_commands = state.get("pending_commands", [])
         self.balance = state.get("balance", 10000.0 if self.dry_run else 0.0)
+        self.last_scan_at = state.get("last_scan_at")
         
         # === 策略参数 ===
         self.leverage = 4
         self.position_size_ratio = 0.06  # 6%
         self.max_daily_positions = 6     # 最大持仓数
         
-        self.buy_surge_threshold = 2.2
-        self.buy_surge_max = 3.0
-        
-        # 风控参数
-        self.min_account_ratio = 0.70    # 最小多空比
-        self.enable_trader_filter = False 
-        
         # 止盈止损
-        self.take_profit_pct = 0.33      # 33%
+        self.take_profit_pct = BASE_TAKE_PROFIT  # 33%
         self.stop_loss_pct = -0.18       # -18%
         
         # 虚拟补仓
@@ -92,30 +116,145 @@ class RealTimeBuySurgeStrategyV3:
         
         # 时间限制
         self.max_hold_hours = 72
-        self.wait_timeout_hours = 37     # 信号等待超时
+        
+        # 峰值跟踪并入 1m K线最高价 (分钟采样之间的尖刺也会计入 12h/24h 最大涨幅)
+        self.enable_intrabar_peaks = True
         
         # 弱势平仓
         self.enable_weak_24h_exit = True
         self.weak_24h_threshold = 0.08   # 8%
         
-        # 等待回调配置 (倍数, 回调比例)
-        self.wait_drop_pct_config = [
-            (3, -0.07),     # 2-3倍：等待7%回调
-            (5, -0.04),     # 3-5倍：等待4%回调
-            (10, -0.03),    # 5-10倍：等待3%回调
-            (9999, -0.01),  # 10倍以上：等待1%回调
-        ]
+        # 热启动缓存 (交易所信息 + 1h K线窗口)
+        self.exchange_info_max_age = 30 * 60  # 交易所信息缓存有效期(秒)
+        self.cache_dir = self.data_dir / "cache"
+        # K线窗口内存预算 (约 4.6KB/交易对，超出时按 LRU 淘汰，下次扫描重新拉取)
+        self.kline_cache = KlineWindowCache(
+            self.cache_dir, interval="1h", window=48, max_bytes=int(float(os.getenv("KLINE_CACHE_MB", "64")) * MB),
+        )
+        self.symbol_cache = SymbolTableCache(self.cache_dir)
+        
+        # 基于本地 1h 窗口的多周期特征 (4h/1d 合成、24h 买量均值/最高价/VWAP)；超出上限时按 LRU 淘汰
+        self.features = FeatureStore(window_hours=24, max_symbols=1000)
+        
+        # 策略插件 (共用上面的行情缓存、权重调度与执行层)；买量暴涨的信号参数见 buy_surge.py
+        self.buy_surge = BuySurgePlugin(self)
+        self.plugins: List[StrategyPlugin] = [self.buy_surge]
+        self._symbol_table_saved_at = 0.0
+        
+        # 流动性预过滤 (一次 24h 统计请求，剔除低流动性交易对后再拉K线)
+        self.enable_liquidity_filter = True
+        self.min_quote_volume_24h = 1_000_000   # 24h 成交额下限 (USDT)
+        self.min_trade_count_24h = 5_000        # 24h 成交笔数下限
+        self.min_hourly_volume_change = None    # 24h 成交额小时变化下限 (如 0.0 表示未增长的剔除)，None 关闭
+        self._liquidity_snapshot: Optional[Tuple[float, Dict[str, float]]] = None
+        
+        # 扫描断点续扫 (同一小时内重启从检查点继续)
+        self.scan_checkpoint = ScanCheckpoint(self.data_dir / "scan_checkpoint.json")
+        self.scan_checkpoint_every = 25  # 每处理多少个交易对保存一次进度
+        self._scan_interrupted = False     # 扫描因停止/限流熔断中断，熔断结束后续扫
+        
+        # 分片扫描 (见 sharding.py)：worker 只扫描 shard=(序号, 总数) 内的交易对并把信号放入 signal_queue，
+        # 协调者 (执行进程) 不扫描，从 signal_queue 接收信号并独占持仓/余额
+        # 协调者每小时取一次交易对列表与 24h 统计并做流动性过滤，经 universe_queues 把各分片的列表发给 worker，
+        # worker 从 universe_queue 接收 (等待超过 universe_wait 秒时自行获取并按分片过滤)
+        self.role = role
+        self.shard = shard
+        self.signal_queue = signal_queue
+        self.universe_queue = universe_queue
+        self.universe_queues = universe_queues
+        self.universe_wait = 180
+        self._shard_filter = shard_filter(*shard) if shard else None
+        
+        # 共享内存状态快照 (看板无需解析 JSON 即可读取余额/持仓/信号)
+        try:
+            self.snapshot: Optional[SnapshotWriter] = SnapshotWriter(self.data_dir / "state.shm")
+        except Exception as e:
+            logging.warning(f"创建共享内存快照失败，看板将回退到状态文件: {e}")
+            self.snapshot = None
+        
+        # 信号/拒绝/成交/平仓的列式归档 (data/analytics，需要 pyarrow)
+        self.analytics = AnalyticsExporter(self.data_dir / "analytics")
+        
+        # 内存监控：各子系统大小、按需 tracemalloc、超过软上限 (低于 PM2 的 500M 重启阈值) 时收缩缓存
+        self.memory = MemoryMonitor(
+            self.clock,
+            soft_limit_mb=float(os.getenv("MEMORY_SOFT_LIMIT_MB", "400")),
+            report_dir=self.data_dir / "memory",
+        )
+        self._state_bytes = 0
+        self._register_memory_sources()
+        if os.getenv("MEMORY_TRACE", "false").lower() == "true":
+            self.memory.start_trace()
         
         # 运行时状态
         self.last_scan_hour = None
+        self.market_context: Optional[MarketContext] = None
         self.is_running = False
         self.stop_event = threading.Event()
         self.thread = None
         self._initialized = True
+        self.warm_start()
         
         mode_str = "🟢 模拟模式 (Dry Run)" if self.dry_run else "🔴 实盘模式 (Real Money)"
         logging.info(f"策略初始化完成. 当前模式: {mode_str}")
 
+    def _register_memory_sources(self):
+        memory = self.memory
+        memory.register(
+            "kline_cache", lambda: self.kline_cache.nbytes,
+            shrink=lambda: len(self.kline_cache.evict(self.kline_cache.nbytes // 2)),
+        )
+        memory.register("features", lambda: deep_sizeof(self.features), shrink=self.prune_features)
+        memory.register("positions", lambda: deep_sizeof(self.positions))
+        memory.register("pending_signals", lambda: deep_sizeof(self.pending_signals))
+        memory.register("history", lambda: deep_sizeof(self.history))
+        memory.register("performance", lambda: deep_sizeof(self.performance))
+        memory.register("market_context", lambda: deep_sizeof(self.market_context))
+        memory.register(
+            "api_caches", lambda: deep_sizeof(self.api.cache_objects()),
+            shrink=self.api.prune_caches,
+        )
+        memory.register("analytics_buffers", lambda: deep_sizeof(self.analytics), shrink=lambda: self.analytics.flush())
+        memory.register("state_file", lambda: self._state_bytes)
+        memory.register("log_queue", lambda: deep_sizeof(pending_records()))
+
+    def prune_features(self) -> int:
+        """清除已下架交易对的特征 (内存超出软上限时调用)；交易对信息尚未加载时不清理"""
+        table = self.api.cache_objects()["symbol_table"]
+        if not table:
+            return 0
+        return self.features.retain({symbol for symbol, (status, _, _) in table.items() if status == "TRADING"})
+
+    def warm_start(self):
+        """从本地缓存恢复交易所信息、K线窗口和扫描进度，避免重启后冷启动"""
+        table, fetched_at = self.symbol_cache.load()
+        if table:
+            self.api.load_symbol_table(table, fetched_at)
+            self._symbol_table_saved_at = fetched_at
+        loaded = self.kline_cache.load()
+        for symbol, window in self.kline_cache.items():
+            self.features.update_from_window(symbol, window)
+        
+        # 本小时已扫描过则不再立即全量扫描
+        if self.last_scan_at:
+            try:
+                last_scan = datetime.fromisoformat(self.last_scan_at)
+                now = self.clock.now()
+                if now - last_scan < timedelta(hours=1) and last_scan.hour == now.hour:
+                    self.last_scan_hour = last_scan.hour
+            except Exception as e:
+                logging.warning(f"解析上次扫描时间失败: {e}")
+        
+        logging.info(f"♻️ 热启动: {len(table)} 个交易对信息, {loaded} 个K线窗口, 上次扫描小时={self.last_scan_hour}")
+
+    def save_market_cache(self):
+        """持久化交易对信息与K线窗口"""
+        fetched_at = self.api._symbol_table_fetched_at
+        if fetched_at > self._symbol_table_saved_at:
+            self.symbol_cache.save(self.api.get_symbol_table(), fetched_at)
+            self._symbol_table_saved_at = fetched_at
+        self.kline_cache.save()
+
     def start(self):
         """启动策略线程"""
         if self.is_running:
@@ -127,6 +266,18 @@ class RealTimeBuySurgeStrategyV3:
         self.stop_event.clear()
         self.thread = threading.Thread(target=self._run_loop, daemon=True)
         self.thread.start()
+        
+        if self.health_port and self.health_server is None:
+            try:
+                self.health_server = HealthServer(
+                    self.watchdog, self.health_port,
+                    status=self.get_status,
+                    ready=lambda: not self.api.governor.is_open(),
+                )
+                self.health_server.start()
+            except OSError as e:
+                self.health_server = None
+                logging.error(f"健康检查端点启动失败 (端口 {self.health_port}): {e}")
 
     def stop(self):
         """停止策略线程"""
@@ -139,6 +290,10 @@ class RealTimeBuySurgeStrategyV3:
         if self.thread:
             self.thread.join(timeout=5)
             self.thread = None
+        if self.health_server:
+            self.health_server.stop()
+            self.health_server = None
+        self.analytics.flush()
         logging.info("实盘策略线程已停止")
 
     def get_status(self) -> Dict:
@@ -151,78 +306,79 @@ class RealTimeBuySurgeStrategyV3:
             "last_scan_hour": self.last_scan_hour
         }
 
-    def log_detailed_status(self):
-        """打印详细状态表"""
+    def log_detailed_status(self, ctx: Optional[MarketContext] = None):
+        """打印详细状态表 (复用本轮行情上下文，不再重复请求价格)"""
+        ctx = ctx or self.build_market_context()
+        
         # 1. 待建仓信号表 (Pending Entry Signals)
         if self.pending_signals:
             data = []
             for s in self.pending_signals:
                 try:
-                    curr_price = self.get_current_price(s['symbol'])
-                    # 计算距离目标价的百分比
-                    dist_pct = (curr_price - s['target_entry_price']) / curr_price if curr_price else 0
+                    view = ctx.observe_signal(s)
+                    curr_price = view.price
+                    dist_pct = view.distance_pct
                 except:
                     curr_price = 0
                     dist_pct = 0
                 
                 data.append({
-                    "Symbol": s['symbol'],
-                    "Surge(x)": f"{s['buy_surge_ratio']:.2f}",
-                    "SigPrice": s['signal_close'],
-                    "TargetEntry": f"{s['target_entry_price']:.4f}",
-                    "DropReq": f"{s['drop_pct']*100:.1f}%",
+                    "Symbol": s.symbol,
+                    "Surge(x)": f"{s.buy_surge_ratio:.2f}",
+                    "SigPrice": s.signal_close,
+                    "TargetEntry": f"{s.target_entry_price:.4f}",
+                    "DropReq": f"{s.drop_pct*100:.1f}%",
                     "CurrPrice": curr_price,
                     "DistToEntry": f"{dist_pct*100:.1f}%",
-                    "Expire": s['timeout_time'].split('T')[1][:5]
+                    "Expire": s.timeout_time.split('T')[1][:5]
                 })
             
-            df = pd.DataFrame(data)
-            try:
-                table_str = df.to_markdown(index=False)
-            except:
-                table_str = df.to_string(index=False)
-                
-            logging.info(f"\n=== 📋 待建仓信号 (Pending Entries) ===\n{table_str}")
+            # 表格渲染在日志线程中完成
+            logging.info("%s", LazyTable("📋 待建仓信号 (Pending Entries)", data))
 
         # 2. 持仓监控表 (Active Positions)
         if self.positions:
             data = []
             for symbol, pos in self.positions.items():
                 try:
-                    curr_price = self.get_current_price(symbol)
-                    entry_price = pos['entry_price']
-                    # PnL based on Virtual Entry
-                    virtual_entry = pos['virtual_entry_price']
-                    pnl_pct = (curr_price - virtual_entry) / virtual_entry if virtual_entry else 0
-                    
-                    entry_time = datetime.fromisoformat(pos['entry_time']).replace(tzinfo=UTC)
-                    hold_hours = (datetime.now(UTC) - entry_time).total_seconds() / 3600
-                    
-                    # 动态止盈目标计算
-                    current_tp = self.take_profit_pct
-                    if hold_hours >= 12 and pos.get('max_up_12h', 0) < 0.025: current_tp = 0.20
-                    if hold_hours >= 24 and pos.get('max_up_24h', 0) < 0.05: current_tp = 0.11
-                    
+                    view = ctx.position_view(symbol) or ctx.observe_position(pos, self.take_profit_pct)
                     data.append({
                         "Symbol": symbol,
-                        "Entry": f"{entry_price:.4f}",
-                        "Curr": f"{curr_price:.4f}",
-                        "PnL%": f"{pnl_pct*100:.2f}%",
-                        "Hold(h)": f"{hold_hours:.1f}",
-                        "MaxUp12h": f"{pos.get('max_up_12h',0)*100:.1f}%",
-                        "TP_Target": f"{current_tp*100:.0f}%",
-                        "Added?": "Yes" if pos['is_virtual_added'] else "No"
+                        "Entry": f"{pos.entry_price:.4f}",
+                        "Curr": f"{view.price:.4f}",
+                        "PnL%": f"{view.pnl_pct*100:.2f}%",
+                        "Hold(h)": f"{view.hold_hours:.1f}",
+                        "MaxUp12h": f"{pos.max_up_12h*100:.1f}%",
+                        "TP_Target": f"{view.take_profit_pct*100:.0f}%",
+                        "Added?": "Yes" if pos.is_virtual_added else "No"
                     })
                 except:
                     continue
             
             if data:
-                df = pd.DataFrame(data)
-                try:
-                    table_str = df.to_markdown(index=False)
-                except:
-                    table_str = df.to_string(index=False)
-                logging.info(f"\n=== 🛡 持仓监控 (Active Positions) ===\n{table_str}")
+                logging.info("%s", LazyTable("🛡 持仓监控 (Active Positions)", data))
+
+    def build_market_context(self) -> MarketContext:
+        """构建本轮 tick 的行情上下文：待建仓与持仓涉及的交易对价格只取一次"""
+        symbols = {s.symbol for s in self.pending_signals} | set(self.positions.keys())
+        for plugin in self.plugins:
+            symbols.update(plugin.watch_symbols())
+        prices: Dict[str, float] = {}
+        if len(symbols) > 2:
+            # 全量价格接口权重为 2，超过 2 个交易对时比逐个请求更省
+            try:
+                all_prices = self.api.get_all_prices()
+                prices = {s: all_prices[s] for s in symbols if s in all_prices}
+            except Exception as e:
+                logging.error(f"批量获取价格失败: {e}")
+        for symbol in symbols - prices.keys():
+            try:
+                prices[symbol] = self.get_current_price(symbol)
+            except Exception:
+                continue
+        ctx = MarketContext(self.clock.now(), prices)
+        self.market_context = ctx
+        return ctx
 
     def _run_loop(self):
         """后台运行循环 (核心串行架构)"""
@@ -230,83 +386,211 @@ class RealTimeBuySurgeStrategyV3:
         
         while not self.stop_event.is_set():
             try:
-                # 记录心跳并保存
-                self.save_state()
-                
-                now = datetime.now(UTC)
-                
-                # 1. 串行任务一：处理手动指令 (最高优先级)
-                self.process_commands()
-                
-                # 2. 串行任务二：每小时扫描
-                should_scan = False
-                if self.last_scan_hour is None:
-                    logging.info("🚀 首次启动，立即执行扫描...")
-                    should_scan = True
-                elif now.minute == 2 and self.last_scan_hour != now.hour:
-                    should_scan = True
-                
-                if should_scan:
-                    self.scan_market()
-                    self.last_scan_hour = now.hour
-                
-                # 2. 串行任务二：每分钟处理信号
-                self.process_pending_signals()
-                
-                # 3. 串行任务三：每分钟监控持仓
-                self.monitor_positions()
-                
-                # 4. 串行任务四：更新账户余额
-                self.update_account_balance()
-                
-                # 5. 打印状态摘要
-                if now.second % 60 == 0:
-                    status = self.get_status()
-                    weight = getattr(self.api, 'used_weight', 0)
-                    logging.info(f"💓 Heartbeat | Positions: {status['positions_count']} | Pending: {status['pending_signals_count']} | API Weight: {weight} | Next Scan: {now.hour + 1}:02")
-
-                # 休眠 60 秒
-                self.stop_event.wait(60)
+                wait = self.run_tick()
+
+                # 固定节奏：本轮耗时计入 60 秒周期，落后时立即开始下一轮
+                self.clock.sleep(wait, self.stop_event)
                 
             except Exception as e:
                 logging.error(f"主循环崩溃重启: {e}")
                 import traceback
                 logging.error(traceback.format_exc())
-                self.stop_event.wait(10) # 崩溃后等待10秒重启 loop
+                self.clock.sleep(10, self.stop_event) # 崩溃后等待10秒重启 loop
 
-    def load_state(self) -> Dict:
-        """加载状态"""
-        if self.state_file.exists():
+    def run_tick(self) -> float:
+        """执行一轮串行任务，返回距下一轮的等待秒数"""
+        self.watchdog.tick_started()
+        try:
+            self._run_tick()
+        finally:
+            wait = self.watchdog.tick_finished()
+        return wait
+
+    def _run_tick(self):
+        watchdog = self.watchdog
+        
+        # 记录心跳并保存
+        self.save_state()
+        
+        now = self.clock.now()
+        
+        # 1. 串行任务一：处理手动指令 (最高优先级，使用预留的权重容量)
+        with self.api.governor.priority(PRIORITY_HIGH), watchdog.stage("commands"):
+            self.process_commands()
+        
+        # 2. 串行任务二：每小时扫描 (协调模式下扫描由各分片 worker 完成，这里只接收信号)
+        should_scan = False
+        if self.role == ROLE_COORDINATOR:
+            self.ingest_remote_signals()
+            if self.universe_queues and (self.last_scan_hour is None or (now.minute == 2 and self.last_scan_hour != now.hour)):
+                with self.api.governor.priority(PRIORITY_LOW), watchdog.stage("scan"):
+                    if self.publish_universe():
+                        self.last_scan_hour = now.hour
+                        self.last_scan_at = now.isoformat()
+        elif self.last_scan_hour is None:
+            logging.info("🚀 首次启动，立即执行扫描...")
+            should_scan = True
+        elif now.minute == 2 and self.last_scan_hour != now.hour:
+            should_scan = True
+        elif self._scan_interrupted and not self.api.governor.is_open():
+            logging.info("⏯ 限流熔断结束，继续未完成的扫描...")
+            should_scan = True
+        
+        if should_scan:
+            # 扫描为最低优先级，不占用预留给平仓/手动指令的权重
+            with self.api.governor.priority(PRIORITY_LOW), watchdog.stage("scan"):
+                self.scan_market()
+            # 中断的扫描不算本小时已扫描，重启后 warm_start 不会跳过，从检查点继续
+            if not self._scan_interrupted:
+                self.last_scan_hour = now.hour
+                self.last_scan_at = now.isoformat()
+        
+        # 内存检查 (worker 持有本分片的K线缓存，同样需要)
+        with watchdog.stage("memory"):
+            self.memory.check()
+        self.analytics.flush_due()
+        
+        if self.role == ROLE_WORKER:
+            # worker 不持仓，只负责扫描
+            return
+        
+        # 本轮共享行情上下文 (扫描可能耗时较长，在其之后构建)
+        with watchdog.stage("context"):
+            ctx = self.build_market_context()
+        
+        # 2. 串行任务二：每分钟处理信号 (插件先看到本轮价格)
+        with watchdog.stage("signals"):
+            for plugin in self.plugins:
+                try:
+                    plugin.on_price(ctx)
+                except Exception as e:
+                    logging.error(f"插件 {plugin.name} 处理价格失败: {e}")
+            self.process_pending_signals(ctx)
+        
+        # 3. 串行任务三：每分钟监控持仓
+        with watchdog.stage("monitor"):
+            self.monitor_positions(ctx)
+        
+        # 4. 串行任务四：更新账户余额 (落后时推迟，但不超过 balance_max_staleness)
+        since_balance = watchdog.since("balance")
+        if since_balance is None or since_balance > self.balance_max_staleness or not watchdog.shed("balance"):
+            with watchdog.stage("balance"):
+                self.update_account_balance()
+        
+        # 5. 打印状态摘要 (落后时跳过)
+        if not watchdog.shed("status"):
+            with watchdog.stage("status"):
+                self.log_detailed_status(ctx)
+        if now.second % 60 == 0:
+            status = self.get_status()
+            weight = getattr(self.api, 'used_weight', 0)
+            logging.info(f"💓 Heartbeat | Positions: {status['positions_count']} | Pending: {status['pending_signals_count']} | API Weight: {weight} | Next Scan: {now.hour + 1}:02")
+
+    def ingest_remote_signals(self):
+        """协调模式：接收各分片 worker 上报的信号 (已持仓的交易对忽略)"""
+        count = 0
+        while True:
+            try:
+                data = self.signal_queue.get_nowait()
+            except queue.Empty:
+                break
             try:
-                data = json.loads(self.state_file.read_text())
-                logging.info(f"已加载状态: {len(data.get('positions', {}))} 持仓, {len(data.get('pending_signals', []))} 待建仓")
-                return data
+                signal = PendingSignal.from_dict(data)
             except Exception as e:
-                logging.error(f"加载状态文件失败: {e}")
-                return {}
-        return {}
+                logging.error(f"解析分片信号失败: {e}")
+                continue
+            if signal.symbol in self.positions:
+                continue
+            mark(signal.trace, "signal_ingested")
+            if self.pending_signals.upsert(signal):
+                count += 1
+        if count:
+            logging.info(f"🧩 收到分片信号 {count} 个，当前等待: {len(self.pending_signals)}")
+            self.save_state()
+
+    def monitor_if_due(self):
+        """长时间扫描期间按周期穿插持仓监控，平仓不因扫描而延迟"""
+        if not self.positions:
+            return
+        since = self.watchdog.since("monitor")
+        if since is not None and since < self.tick_interval:
+            return
+        with self.api.governor.priority(PRIORITY_NORMAL), self.watchdog.stage("monitor"):
+            self.monitor_positions()
+
+    def load_state(self) -> Dict:
+        """
+        加载状态 (旧版本的状态文件自动迁移，迁移前先备份原文件)
+        文件存在但无法解析或迁移时抛出 StateLoadError：以空状态启动会在第一次保存时覆盖真实持仓
+        """
+        if not self.state_file.exists():
+            return {}
+        raw = self.state_file.read_bytes()
+        try:
+            data = loads(raw)
+        except Exception as e:
+            backup = self.state_file.with_name(f"trading_state.corrupt.{int(time.time())}.json")
+            backup.write_bytes(raw)
+            logging.error(f"状态文件无法解析 (已另存为 {backup.name})，拒绝启动: {e}")
+            raise StateLoadError(f"状态文件无法解析: {e}") from e
+        version = int(data.get("schema_version", 0)) if isinstance(data, dict) else 0
+        if version < STATE_VERSION:
+            # 迁移前备份，迁移失败时原文件也不会丢
+            backup = self.state_file.with_name(f"trading_state.v{version}.bak.json")
+            backup.write_bytes(raw)
+        try:
+            data, applied = migrate(data)
+        except Exception as e:
+            logging.error(f"状态文件从 v{version} 迁移失败，拒绝启动 (原文件未改动): {e}")
+            raise StateLoadError(f"状态文件迁移失败: {e}") from e
+        if applied:
+            logging.info(f"🔧 状态文件已从 v{applied[0]} 迁移到 v{STATE_VERSION} (原文件备份: trading_state.v{applied[0]}.bak.json)")
+        logging.info(f"已加载状态: {len(data.get('positions', {}))} 持仓, {len(data.get('pending_signals', []))} 待建仓")
+        return data
 
     def save_state(self):
         """原子化保存状态，防止文件损坏"""
         try:
+            now = self.clock.now()  # 状态文件与共享快照使用同一时刻
             data = {
+                "schema_version": STATE_VERSION,
                 "is_dry_run": self.dry_run,
-                "positions": self.positions,
-                "pending_signals": self.pending_signals,
+                "positions": {symbol: pos.to_dict() for symbol, pos in self.positions.items()},
+                "pending_signals": self.pending_signals.to_list(),
                 "history": self.history,
+                "performance": self.performance.to_dict(),
                 "balance": self.balance,
                 "pending_commands": self.pending_commands,
-                "last_heartbeat": datetime.now(UTC).isoformat(),
-                "updated_at": datetime.now(UTC).isoformat()
+                "api_latency": self.api.get_latency_stats(),
+                "api_weight": self.api.governor.snapshot(),
+                "loop": self.watchdog.snapshot(),
+                "memory": self.memory.snapshot(),
+                "last_scan_at": self.last_scan_at,
+                "market": self.market_context.export(self.positions.keys(), [s.symbol for s in self.pending_signals]) if self.market_context else {},
+                "last_heartbeat": now.isoformat(),
+                "updated_at": now.isoformat()
             }
             
             # 先写入临时文件
             temp_file = self.state_file.with_suffix(".tmp")
-            temp_file.write_text(json.dumps(data, indent=2))
+            payload = dumps(data)
+            self._state_bytes = len(payload)
+            temp_file.write_bytes(payload)
             
             # 然后重命名（原子操作）
             temp_file.replace(self.state_file)
             
+            if self.snapshot:
+                self.snapshot.publish(
+                    balance=self.balance,
+                    is_dry_run=self.dry_run,
+                    positions=self.positions.values(),
+                    signals=self.pending_signals,
+                    views=self.market_context.positions if self.market_context else None,
+                    history=self.history,
+                    now=now.timestamp(),
+                )
+            
         except Exception as e:
             logging.error(f"保存状态文件失败: {e}")
 
@@ -343,7 +627,7 @@ class RealTimeBuySurgeStrategyV3:
                     manual_signal = {
                         "symbol": symbol,
                         "buy_surge_ratio": 0,
-                        "signal_time": datetime.now(UTC).isoformat(),
+                        "signal_time": self.clock.now().isoformat(),
                     }
                     
                     # 临时调整杠杆
@@ -374,6 +658,11 @@ class RealTimeBuySurgeStrategyV3:
                     logging.info(f"🛠 执行手动平仓: {symbol}")
                     current_price = self.get_current_price(symbol)
                     self.close_position(symbol, "manual_exit", current_price)
+                
+                elif action == "MEMORY_PROFILE":
+                    logging.info("🛠 执行内存分析")
+                    self.memory.account()
+                    self.memory.start_trace()
                     
             except Exception as e:
                 logging.error(f"执行手动指令失败: {cmd} - {e}")
@@ -398,170 +687,207 @@ class RealTimeBuySurgeStrategyV3:
             return pd.DataFrame()
         return kline2df(raw_data)
 
-    def get_wait_drop_pct(self, buy_surge_ratio: float) -> float:
-        """根据买量倍数获取等待回调比例"""
-        for max_ratio, drop_pct in self.wait_drop_pct_config:
-            if buy_surge_ratio < max_ratio:
-                return drop_pct
-        return self.wait_drop_pct_config[-1][1]
+    def get_hourly_window(self, symbol: str) -> pd.DataFrame:
+        """获取最近 48 根 1h K线：复用本地窗口，只补拉缺失的部分"""
+        now_ms = int(self.clock.now().timestamp() * 1000)
+        limit = self.kline_cache.missing_limit(symbol, now_ms)
+        raw_data = self.api.kline_candlestick_data(symbol=symbol, interval="1h", limit=limit)
+        if not raw_data:
+            return pd.DataFrame()
+        window = self.kline_cache.update(symbol, raw_data)
+        self.features.update_from_window(symbol, window)
+        return kline2df(window)
 
     def get_current_price(self, symbol: str) -> float:
         """获取当前价格"""
         try:
-            response = self.api.client.rest_api.symbol_price_ticker(symbol=symbol)
-            data = response.data()
-            
-            # SDK 可能返回列表或单个对象
-            if isinstance(data, list):
-                if not data:
-                    raise ValueError("Price data is empty list")
-                ticker = data[0]
-            else:
-                ticker = data
-                
-            # 尝试获取价格
-            if hasattr(ticker, 'price'):
-                return float(ticker.price)
-            elif isinstance(ticker, dict) and 'price' in ticker:
-                return float(ticker['price'])
-            elif hasattr(ticker, 'actual_instance'):
-                inner = ticker.actual_instance
-                if hasattr(inner, 'price'):
-                    return float(inner.price)
-                elif isinstance(inner, dict) and 'price' in inner:
-                    return float(inner['price'])
-            
-            logging.warning(f"Price object structure: {ticker}")
-            return 0.0
+            return self.api.get_symbol_price(symbol)
         except Exception as e:
             logging.error(f"获取价格失败 {symbol}: {e}")
             raise
 
     def scan_market(self):
-        """扫描全市场寻找交易机会 (串行执行 + 错误隔离)"""
+        """扫描全市场寻找交易机会 (串行执行 + 错误隔离)：每个交易对的K线只取一次，交给所有插件"""
         logging.info("🔍 开始全市场扫描...")
         
-        try:
-            symbols = self.api.in_exchange_trading_symbols(symbol_pattern=r"USDT$")
-        except Exception as e:
-            logging.error(f"获取交易对列表失败: {e}")
-            return
-
-        logging.info(f"获取到 {len(symbols)} 个交易对")
+        signal_hour = self.clock.now().replace(minute=0, second=0, microsecond=0).isoformat()
+        checkpoint = self.scan_checkpoint.load(signal_hour)
+        if checkpoint:
+            symbols = checkpoint["symbols"]
+            start_index = checkpoint["next_index"]
+            candidates = [Candidate.from_list(row, self.buy_surge.name) for row in checkpoint["candidates"]]
+            logging.info(f"⏯ 从检查点恢复扫描: {start_index}/{len(symbols)}, 已有候选 {len(candidates)} 个")
+        else:
+            symbols = self.receive_universe(signal_hour) if self.universe_queue is not None else None
+            if symbols is None and not self.stop_event.is_set():
+                symbols = self.scan_universe()
+            if symbols is None:
+                return
+            start_index = 0
+            candidates = []
+        
+        def save_checkpoint(next_index: int):
+            self.scan_checkpoint.save(signal_hour, symbols, next_index, [c.to_list() for c in candidates])
+        
+        for plugin in self.plugins:
+            plugin.on_scan_start()
         
         count = 0
-        scan_progress_data = []
+        completed = True
         
-        # 计算扫描间隔，将请求平摊（假设全市场扫描在一小时内平滑完成，这里设为每个Symbol间隔0.2s）
-        for symbol in symbols:
-            if self.stop_event.is_set(): break
+        for index in range(start_index, len(symbols)):
+            symbol = symbols[index]
+            if self.stop_event.is_set():
+                save_checkpoint(index)
+                completed = False
+                break
+            if self.api.governor.is_open():
+                # 触发熔断的上一个交易对请求失败，续扫时重新处理
+                logging.warning(f"🧯 限流熔断中，暂停扫描 ({index}/{len(symbols)})，熔断结束后从检查点继续")
+                save_checkpoint(max(start_index, index - 1))
+                completed = False
+                break
+            if index > start_index and (index - start_index) % self.scan_checkpoint_every == 0:
+                save_checkpoint(index)
             
-            # 串行执行，每个Symbol之间留一点喘息时间
-            time.sleep(0.1)
+            # 串行执行，按剩余权重与响应延迟自适应间隔 (空闲时加速，接近上限时放慢)
+            self.clock.sleep(self.api.governor.pace(), self.stop_event)
+            self.watchdog.beat()
+            self.monitor_if_due()
 
             if symbol in self.positions:
                 continue
             
             try:
-                df_1h = self.get_kline_data(symbol, "1h", limit=48)
-                if df_1h.empty or len(df_1h) < 25:
-                    continue
-                
-                last_closed_candle = df_1h.iloc[-2]
-                current_buy_volume = last_closed_candle['active_buy_volume']
-                signal_close = float(last_closed_candle['close'])
-                signal_time = last_closed_candle['trade_date'] + pd.Timedelta(hours=8)
-                
-                prev_24h_df = df_1h.iloc[-26:-2] 
-                if prev_24h_df.empty:
-                    continue
-                    
-                avg_buy_volume = prev_24h_df['active_buy_volume'].mean()
-                if avg_buy_volume == 0:
-                    continue
-                    
-                buy_surge_ratio = current_buy_volume / avg_buy_volume
-                
-                # 记录高买量币种
-                if buy_surge_ratio > 1.5:
-                    scan_progress_data.append({
-                        "Symbol": symbol,
-                        "Price": signal_close,
-                        "Surge": f"{buy_surge_ratio:.2f}x",
-                        "AvgVol": f"{avg_buy_volume:.1f}",
-                        "CurrVol": f"{current_buy_volume:.1f}"
-                    })
-                    if len(scan_progress_data) >= 5:
-                        logging.info(f"📊 扫描中发现的高买量币种: {[s['Symbol'] for s in scan_progress_data]}")
-                        scan_progress_data = [] 
-
-                # 检查信号触发
-                if self.buy_surge_threshold <= buy_surge_ratio <= self.buy_surge_max:
-                    logging.info(f"💡 发现潜在信号: {symbol} 买量倍数={buy_surge_ratio:.2f} 价格={signal_close}")
-                    
-                    if self.enable_trader_filter:
-                        ratio = self.api.get_top_long_short_ratio(symbol, period="1h")
-                        if ratio > 0 and ratio < self.min_account_ratio:
-                            logging.info(f"   ❌ 多空比过滤: {ratio} < {self.min_account_ratio}")
-                            continue
-                    
-                    drop_pct = self.get_wait_drop_pct(buy_surge_ratio)
-                    target_price = signal_close * (1 + drop_pct)
-                    timeout_time = datetime.now(UTC) + timedelta(hours=self.wait_timeout_hours)
-                    
-                    signal_info = {
-                        "symbol": symbol,
-                        "signal_time": signal_time.isoformat(),
-                        "signal_close": signal_close,
-                        "buy_surge_ratio": buy_surge_ratio,
-                        "target_entry_price": target_price,
-                        "drop_pct": drop_pct,
-                        "timeout_time": timeout_time.isoformat(),
-                        "created_at": datetime.now(UTC).isoformat()
-                    }
-                    
-                    existing_index = next((i for i, s in enumerate(self.pending_signals) if s['symbol'] == symbol), -1)
-                    if existing_index != -1:
-                        self.pending_signals[existing_index] = signal_info
-                    else:
-                        self.pending_signals.append(signal_info)
-                        count += 1
-                    
+                df_1h = self.get_hourly_window(symbol)
             except Exception as e:
                 # 错误隔离：单个Symbol出错不影响整体扫描
-                logging.debug(f"扫描 {symbol} 出错: {e}")
+                logging.debug("扫描 %s 出错: %s", symbol, e)
                 continue
+            for plugin in self.plugins:
+                try:
+                    candidate = plugin.on_candle_close(symbol, df_1h)
+                except Exception as e:
+                    logging.debug("扫描 %s 出错 (%s): %s", symbol, plugin.name, e)
+                    continue
+                if candidate is not None:
+                    candidates.append(candidate)
+        
+        # 各插件确认自己的候选，信号统一进入待建仓队列
+        for plugin in self.plugins:
+            try:
+                signals = plugin.on_scan_end([c for c in candidates if c.strategy == plugin.name])
+            except Exception as e:
+                logging.error(f"插件 {plugin.name} 确认候选失败: {e}")
+                continue
+            for signal_info in signals:
+                if self.role == ROLE_WORKER:
+                    # 由执行进程统一管理待建仓信号
+                    self.signal_queue.put(signal_info.to_dict())
+                    count += 1
+                elif self.pending_signals.upsert(signal_info):
+                    count += 1
         
         self.save_state()
+        self.save_market_cache()
+        self._scan_interrupted = not completed
+        if completed:
+            self.scan_checkpoint.clear()
         logging.info(f"扫描结束，新增 {count} 个信号，当前等待: {len(self.pending_signals)}")
 
-    def process_pending_signals(self):
+    def scan_universe(self, apply_shard: bool = True) -> Optional[List[str]]:
+        """本小时要扫描的交易对：交易中的 USDT 合约 -> 本分片 -> 流动性过滤 (列表获取失败时返回 None)"""
+        try:
+            symbols = self.api.in_exchange_trading_symbols(symbol_pattern=r"USDT$", max_age=self.exchange_info_max_age)
+        except Exception as e:
+            logging.error(f"获取交易对列表失败: {e}")
+            return None
+        logging.info(f"获取到 {len(symbols)} 个交易对")
+        if apply_shard and self._shard_filter:
+            symbols = self._shard_filter(symbols)
+            logging.info(f"🧩 分片 {self.shard[0] + 1}/{self.shard[1]}: 本进程扫描 {len(symbols)} 个交易对")
+        if self.enable_liquidity_filter:
+            symbols = self.liquidity_prefilter(symbols)
+        return symbols
+
+    def publish_universe(self) -> bool:
+        """协调模式：全市场列表与 24h 统计只取一次，按一致性哈希切分后发给各 worker"""
+        symbols = self.scan_universe(apply_shard=False)
+        if symbols is None:
+            return False
+        signal_hour = self.clock.now().replace(minute=0, second=0, microsecond=0).isoformat()
+        parts = HashRing(len(self.universe_queues)).partition(symbols)
+        for index, universe_queue in enumerate(self.universe_queues):
+            universe_queue.put({"signal_hour": signal_hour, "symbols": parts[index]})
+        logging.info(f"🧩 已向 {len(self.universe_queues)} 个分片下发扫描列表 ({len(symbols)} 个交易对)")
+        return True
+
+    def receive_universe(self, signal_hour: str) -> Optional[List[str]]:
+        """worker：等待协调者下发本小时本分片的交易对 (早于本小时的列表丢弃)，超时返回 None"""
+        deadline = time.monotonic() + self.universe_wait
+        while not self.stop_event.is_set() and time.monotonic() < deadline:
+            self.watchdog.beat()
+            try:
+                data = self.universe_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if data["signal_hour"] == signal_hour:
+                logging.info(f"🧩 分片 {self.shard[0] + 1}/{self.shard[1]}: 收到协调者下发的 {len(data['symbols'])} 个交易对")
+                return data["symbols"]
+        if not self.stop_event.is_set():
+            logging.warning("未收到协调者下发的扫描列表，自行获取")
+        return None
+
+    def liquidity_prefilter(self, symbols: List[str]) -> List[str]:
+        """按 24h 成交额/成交笔数剔除低流动性交易对 (统计请求失败时不过滤)"""
+        try:
+            tickers = self.api.get_24h_tickers()
+        except Exception as e:
+            logging.warning(f"获取 24h 统计失败，跳过流动性过滤: {e}")
+            return symbols
+        
+        now_ts = self.clock.time()
+        previous = None
+        if self._liquidity_snapshot is not None:
+            snapshot_ts, snapshot = self._liquidity_snapshot
+            # 仅与约一小时前的快照比较
+            if 1800 <= now_ts - snapshot_ts <= 7200:
+                previous = snapshot
+        self._liquidity_snapshot = (now_ts, {s: t["quote_volume"] for s, t in tickers.items()})
+        
+        kept = []
+        for symbol in symbols:
+            stats = tickers.get(symbol)
+            if stats is None:
+                # 新上线等缺少统计的交易对保留
+                kept.append(symbol)
+                continue
+            if stats["quote_volume"] < self.min_quote_volume_24h or stats["count"] < self.min_trade_count_24h:
+                continue
+            if self.min_hourly_volume_change is not None and previous and previous.get(symbol):
+                change = (stats["quote_volume"] - previous[symbol]) / previous[symbol]
+                if change < self.min_hourly_volume_change:
+                    continue
+            kept.append(symbol)
+        
+        logging.info(f"💧 流动性预过滤: {len(symbols)} -> {len(kept)} 个交易对")
+        return kept
+
+    def process_pending_signals(self, ctx: Optional[MarketContext] = None):
         """处理待建仓信号"""
         if not self.pending_signals:
             return
             
         logging.info(f"🔄 检查待建仓信号 ({len(self.pending_signals)}个)...")
-        now = datetime.now(UTC)
+        ctx = ctx or self.build_market_context()
+        now_ts = ctx.now_ts
         remaining_signals = []
         
         for signal in self.pending_signals:
-            symbol = signal['symbol']
-            target_price = signal['target_entry_price']
-            timeout_time = datetime.fromisoformat(signal['timeout_time']).replace(tzinfo=UTC)
-            
-            try:
-                if now.tzinfo is not None and timeout_time.tzinfo is None:
-                    # now is aware, timeout_time is naive
-                    logging.debug(f"Handling naive timeout_time for {symbol}")
-                    timeout_time = timeout_time.replace(tzinfo=UTC)
-                elif now.tzinfo is None and timeout_time.tzinfo is not None:
-                    # now is naive, timeout_time is aware
-                    logging.debug(f"Handling naive now for {symbol}")
-                    now = now.replace(tzinfo=UTC)
-            except Exception as e:
-                logging.error(f"Error normalizing datetimes: {e}")
+            symbol = signal.symbol
+            target_price = signal.target_entry_price
 
-            if now > timeout_time:
+            if now_ts > signal.timeout_ts:
                 logging.info(f"⏰ 信号超时移除: {symbol}")
                 continue
                 
@@ -570,18 +896,13 @@ class RealTimeBuySurgeStrategyV3:
                 continue
             
             try:
-                current_price = self.get_current_price(symbol)
-                
-                # 更新实时信息到状态中，供看板使用
-                signal['current_price'] = current_price
-                if current_price > 0:
-                    signal['distance_pct'] = (current_price - target_price) / current_price
-                else:
-                    signal['distance_pct'] = 0
+                # 同时更新实时信息到状态中，供看板使用
+                current_price = ctx.observe_signal(signal).price
 
                 if current_price <= target_price:
+                    mark(signal.trace, "trigger_detected")
                     logging.info(f"🚀 触发建仓: {symbol} 现价{current_price} <= 目标{target_price}")
-                    self.open_position(symbol, current_price, signal)
+                    self.open_position(symbol, current_price, signal.to_dict())
                 else:
                     remaining_signals.append(signal)
                     
@@ -589,11 +910,14 @@ class RealTimeBuySurgeStrategyV3:
                 logging.error(f"检查信号 {symbol} 失败: {e}")
                 remaining_signals.append(signal)
         
-        self.pending_signals = remaining_signals
+        self.pending_signals = SignalBook(remaining_signals)
         self.save_state()
 
     def open_position(self, symbol: str, price: float, signal_info: Dict, side: str = "BUY", ord_type: str = "MARKET", override_qty: float = 0):
         """执行开仓"""
+        # 手动指令没有信号追踪，从这里开始计时
+        trace = signal_info.get('trace') or new_trace()
+        mark(trace, "open_called")
         quantity = 0.0
         
         try:
@@ -619,6 +943,7 @@ class RealTimeBuySurgeStrategyV3:
                 self.api.change_leverage(symbol, self.leverage)
                 self.api.change_margin_type(symbol, "ISOLATED")
                 
+                mark(trace, "order_sent")
                 response = self.api.post_order(
                     symbol=symbol,
                     side=side,
@@ -626,104 +951,121 @@ class RealTimeBuySurgeStrategyV3:
                     quantity=quantity,
                     price=price if ord_type == "LIMIT" else None
                 )
+                mark(trace, "order_ack")
                 real_entry_price = float(response.get('avgPrice', price))
                 quantity = float(response.get('executedQty', quantity))
             else:
+                # 模拟下单同样打点，延迟统计中的各区间在模拟模式下也完整
+                mark(trace, "order_sent")
+                mark(trace, "order_ack")
                 logging.info(f"[模拟] 下单成功: {symbol} {side} {ord_type} {quantity}")
             
-            self.positions[symbol] = {
-                "symbol": symbol,
-                "entry_time": datetime.now(UTC).isoformat(),
-                "signal_time": signal_info.get('signal_time'),
-                "entry_price": real_entry_price,
-                "quantity": quantity,
-                "buy_surge_ratio": signal_info['buy_surge_ratio'],
-                "virtual_entry_price": real_entry_price, 
-                "is_virtual_added": False,
-                "max_up_12h": 0.0, 
-                "max_up_24h": 0.0
-            }
+            self.positions[symbol] = Position(
+                symbol=symbol,
+                entry_time=self.clock.now().isoformat(),
+                signal_time=signal_info.get('signal_time'),
+                entry_price=real_entry_price,
+                quantity=quantity,
+                buy_surge_ratio=signal_info['buy_surge_ratio'],
+                virtual_entry_price=real_entry_price,
+                is_virtual_added=False,
+                max_up_12h=0.0,
+                max_up_24h=0.0,
+                strategy=signal_info.get('strategy'),
+                trace=trace
+            )
+            mark(trace, "position_recorded")
+            position = self.positions[symbol]
+            self.analytics.record(
+                "fill", symbol, ts=position.entry_time,
+                signal_time=position.signal_time, buy_surge_ratio=position.buy_surge_ratio,
+                drop_pct=signal_info.get('drop_pct'), target_price=signal_info.get('target_entry_price'),
+                price=real_entry_price, quantity=quantity, reason=f"{side} {ord_type}", trace_id=trace['id'],
+            )
+            logging.info(f"⏱ {symbol} 信号到成交延迟(ms): {spans(trace)}", extra={"event": {"type": "fill_latency", "symbol": symbol, "trace_id": trace['id'], "spans": spans(trace)}})
             self.save_state()
+            self.dispatch_fill(Fill("open", symbol, real_entry_price, quantity, position, reason=f"{side} {ord_type}"))
             
         except Exception as e:
             logging.error(f"开仓失败 {symbol}: {e}")
 
-    def monitor_positions(self):
+    def monitor_positions(self, ctx: Optional[MarketContext] = None):
         """监控持仓"""
         if not self.positions:
             return
             
         logging.info(f"🛡 监控持仓 ({len(self.positions)}个)...")
+        ctx = ctx or self.build_market_context()
         
-        for symbol in list(self.positions.keys()):
+        if self.enable_intrabar_peaks:
+            for pos in list(self.positions.values()):
+                try:
+                    self.update_intrabar_peaks(pos)
+                except Exception as e:
+                    logging.error(f"更新 {pos.symbol} 分钟峰值失败: {e}")
+        
+        # 全部持仓的退出条件一次向量化判定 (峰值与动态止盈档位同时更新，视图缓存在上下文中)
+        actions = self.position_book.evaluate(
+            self.positions, ctx,
+            base_tp=self.take_profit_pct,
+            add_trigger_pct=self.add_position_trigger_pct,
+            stop_loss_pct=self.stop_loss_pct,
+            max_hold_hours=self.max_hold_hours,
+            weak_24h_threshold=self.weak_24h_threshold if self.enable_weak_24h_exit else None,
+        )
+        for action in actions:
+            symbol = action.symbol
             try:
-                pos = self.positions[symbol]
-                current_price = self.get_current_price(symbol)
-                pos['current_price'] = current_price # 保存当前价到状态
-                entry_time = datetime.fromisoformat(pos['entry_time']).replace(tzinfo=UTC)
-                hold_hours = (datetime.now(UTC) - entry_time).total_seconds() / 3600
-                entry_price = pos['entry_price']
-                current_up = (current_price - entry_price) / entry_price
-                
-                if hold_hours <= 12:
-                    pos['max_up_12h'] = max(pos.get('max_up_12h', 0), current_up)
-                if hold_hours <= 24:
-                    pos['max_up_24h'] = max(pos.get('max_up_24h', 0), current_up)
-                
-                virtual_entry = pos['virtual_entry_price']
-                pnl_pct = (current_price - virtual_entry) / virtual_entry
-                
-                # 动态止盈
-                current_tp = self.take_profit_pct
-                if hold_hours >= 12 and pos.get('max_up_12h', 0) < 0.025: 
-                    current_tp = 0.20 
-                if hold_hours >= 24 and pos.get('max_up_24h', 0) < 0.05: 
-                    current_tp = 0.11 
-                
-                if pnl_pct >= current_tp:
-                    self.close_position(symbol, f"take_profit_dynamic_{current_tp*100:.0f}%", current_price)
-                    continue
-                    
-                # 虚拟补仓
-                if not pos['is_virtual_added'] and pnl_pct <= self.add_position_trigger_pct:
-                    logging.info(f"📉 {symbol} 触发虚拟补仓! 当前跌幅 {pnl_pct*100:.2f}%")
-                    new_virtual = (virtual_entry + current_price) / 2
-                    self.positions[symbol]['virtual_entry_price'] = new_virtual
-                    self.positions[symbol]['is_virtual_added'] = True
+                if action.kind == ACTION_VIRTUAL_ADD:
+                    pos = self.positions[symbol]
+                    logging.info(f"📉 {symbol} 触发虚拟补仓! 当前跌幅 {action.pnl_pct*100:.2f}%")
+                    pos.virtual_entry_price = (pos.virtual_entry_price + action.price) / 2
+                    pos.is_virtual_added = True
                     self.save_state()
-                    continue
-                
-                # 真实止损
-                if pnl_pct <= self.stop_loss_pct:
-                    self.close_position(symbol, "stop_loss", current_price)
-                    continue
-                
-                # 时间止损
-                if hold_hours >= self.max_hold_hours:
-                    self.close_position(symbol, "timeout_72h", current_price)
-                    continue
-                    
-                # 弱势平仓
-                if self.enable_weak_24h_exit and hold_hours >= 24:
-                    if pos.get('max_up_24h', 0) < self.weak_24h_threshold:
-                         self.close_position(symbol, "weak_trend_24h", current_price)
-                         continue
-
+                else:
+                    self.close_position(symbol, action.reason, action.price)
             except Exception as e:
                 logging.error(f"监控 {symbol} 失败: {e}")
         
         self.save_state()
 
+    def update_intrabar_peaks(self, pos: Position):
+        """
+        拉取上次更新以来的 1m K线 (通常 1~2 根)，最高价并入峰值；持仓超过 24h 后不再请求
+        已并入到当前分钟的持仓本轮跳过 (当前分钟内的最新价由退出判定并入峰值)
+        """
+        entry_ms = int(pos.entry_ts * 1000)
+        start = pos.peak_until_ms if pos.peak_until_ms is not None else first_peak_minute(pos)
+        if start >= entry_ms + 24 * HOUR_MS:
+            return
+        now_ms = int(self.clock.time() * 1000)
+        if start > now_ms or (pos.peak_until_ms is not None and pos.peak_until_ms >= now_ms - now_ms % MINUTE_MS):
+            return
+        limit = min(1500, (now_ms - start) // MINUTE_MS + 1)
+        rows = self.api.kline_candlestick_data(symbol=pos.symbol, interval="1m", starttime=start, limit=limit)
+        if rows:
+            fold_candle_highs(pos, rows)
+
+    def dispatch_fill(self, fill: Fill):
+        """成交回调给产生该持仓的插件 (手动开仓与旧版本的持仓没有插件)"""
+        for plugin in self.plugins:
+            if plugin.name == fill.position.strategy:
+                try:
+                    plugin.on_fill(fill)
+                except Exception as e:
+                    logging.error(f"插件 {plugin.name} 处理成交失败: {e}")
+
     def close_position(self, symbol: str, reason: str, price: float):
         """平仓"""
         try:
             pos = self.positions[symbol]
-            quantity = pos['quantity']
+            quantity = pos.quantity
+            mark(pos.trace, "exit_triggered")
             
             logging.info(f"执行平仓 {symbol}: 原因={reason}, 价格={price}")
             
             # 计算盈亏记录到历史
-            entry_price = pos.get('entry_price', price)
+            entry_price = pos.entry_price
             pnl_pct = (price - entry_price) / entry_price
             
             # 模拟模式下更新虚拟余额
@@ -735,20 +1077,8 @@ class RealTimeBuySurgeStrategyV3:
                 self.balance += profit_amount
                 logging.info(f"[模拟] 余额更新: {self.balance:.2f} (盈亏: {profit_amount:.2f})")
 
-            history_entry = {
-                "symbol": symbol,
-                "reason": reason,
-                "entry_price": entry_price,
-                "exit_price": price,
-                "pnl_pct": pnl_pct,
-                "entry_time": pos.get('entry_time'),
-                "exit_time": datetime.now(UTC).isoformat(),
-                "quantity": pos.get('quantity')
-            }
-            self.history.insert(0, history_entry) # 新的排在前面
-            self.history = self.history[:100] # 只保留最近100条
-            
             if not self.dry_run:
+                mark(pos.trace, "close_sent")
                 self.api.post_order(
                     symbol=symbol,
                     side="SELL", 
@@ -756,16 +1086,56 @@ class RealTimeBuySurgeStrategyV3:
                     quantity=0,
                     close_position=True
                 )
+                mark(pos.trace, "close_ack")
             else:
+                mark(pos.trace, "close_sent")
+                mark(pos.trace, "close_ack")
                 logging.info(f"[模拟] 平仓成功: {symbol}")
-                
+            
+            # 平仓成交后才记入历史与统计 (下单失败时持仓保留，下一轮重试不会重复计入)
+            history_entry = {
+                "symbol": symbol,
+                "reason": reason,
+                "entry_price": entry_price,
+                "exit_price": price,
+                "pnl_pct": pnl_pct,
+                "entry_time": pos.entry_time,
+                "exit_time": self.clock.now().isoformat(),
+                "quantity": pos.quantity,
+                "hold_hours": pos.hold_hours(self.clock.time()),
+            }
+            if pos.trace:
+                history_entry["trace"] = pos.trace
+                history_entry["latency_ms"] = spans(pos.trace)
+            self.history.insert(0, history_entry) # 新的排在前面
+            self.history = self.history[:100] # 只保留最近100条
+            try:
+                # 成交日志只保存 TRADE_FIELDS (重算绩效所需)，追踪与延迟留在 history 与列式归档中
+                append_trade(self.trade_log, history_entry)
+            except Exception as e:
+                logging.error(f"写入成交日志失败 {symbol}: {e}")
+            self.performance.fold(history_entry)
+
+            self.analytics.record(
+                "exit", symbol, ts=history_entry["exit_time"],
+                signal_time=pos.signal_time, buy_surge_ratio=pos.buy_surge_ratio,
+                drop_pct=self.buy_surge.get_wait_drop_pct(pos.buy_surge_ratio) if pos.buy_surge_ratio > 0 else None,
+                price=price, quantity=quantity, pnl_pct=pnl_pct,
+                hold_hours=history_entry["hold_hours"], reason=reason,
+                trace_id=pos.trace['id'] if pos.trace else None,
+            )
             del self.positions[symbol]
             self.save_state()
+            self.dispatch_fill(Fill("close", symbol, price, quantity, pos, reason=reason, pnl_pct=pnl_pct))
             
         except Exception as e:
             logging.error(f"平仓失败 {symbol}: {e}")
 
 if __name__ == "__main__":
+    # 配置日志 (队列异步写入 + 滚动文件)；只在作为程序运行时配置，
+    # 模拟/回放/测试导入本模块时不写入 logs/ 下的交易日志
+    setup_logging(LOG_DIR)
+
     # 默认开启 DRY_RUN 模式，安全第一
     # 如果要实盘，请修改为 dry_run=False
     trader = RealTimeBuySurgeStrategyV3(dry_run=True)
@@ -0,0 +1,206 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+HOUR_MS = 3600 * 1000
+
+# K线字段顺序与 kline2df 保持一致 (reserved_field 固定存 0)
+KLINE_FIELDS = 12
+
+# 交易对过滤器表的紧凑布局
+SYMBOL_DTYPE = np.dtype([
+    ("symbol", "U32"),
+    ("status", "U16"),
+    ("tick_size", "f8"),
+    ("step_size", "f8"),
+])
+
+
+def _atomic_save_npy(path: Path, array: np.ndarray):
+    """先写临时文件再替换，防止重启时读到半个文件"""
+    temp_file = path.with_name(path.name + ".tmp")
+    with open(temp_file, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    temp_file.replace(path)
+
+
+def _atomic_write_json(path: Path, data: Dict):
+    temp_file = path.with_name(path.name + ".tmp")
+    temp_file.write_text(json.dumps(data))
+    temp_file.replace(path)
+
+
+def rows_to_array(rows) -> np.ndarray:
+    """原始K线 (字符串/数字混合列表) 转为 float64 矩阵"""
+    arr = np.zeros((len(rows), KLINE_FIELDS), dtype=np.float64)
+    for i, row in enumerate(rows):
+        # 最后一列 reserved_field 无意义，保持为 0
+        arr[i, :11] = [float(v) for v in row[:11]]
+    return arr
+
+
+class KlineWindowCache:
+    """
+    最近 K 线窗口的本地缓存，以 .npy 文件持久化，可 mmap 加载
+
+    max_bytes 为内存预算：超出时淘汰最久未更新/读取的交易对 (下次扫描重新拉取完整窗口)
+    """
+
+    def __init__(self, cache_dir: Path, interval: str = "1h", window: int = 48, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.interval = interval
+        self.window = window
+        self.data_file = self.cache_dir / f"klines_{interval}.npy"
+        self.index_file = self.cache_dir / f"klines_{interval}.json"
+        self._windows: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._windows
+
+    def items(self):
+        return self._windows.items()
+
+    def get(self, symbol: str) -> Optional[np.ndarray]:
+        """获取某个交易对的K线窗口 (按 open_time 升序)"""
+        arr = self._windows.get(symbol)
+        if arr is not None:
+            self._windows.move_to_end(symbol)
+        return arr
+
+    def _put(self, symbol: str, arr: np.ndarray):
+        old = self._windows.pop(symbol, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self._windows[symbol] = arr
+        self.nbytes += arr.nbytes
+
+    def evict(self, max_bytes: int) -> List[str]:
+        """按 LRU 淘汰到不超过 max_bytes，返回被淘汰的交易对"""
+        evicted = []
+        while self._windows and self.nbytes > max_bytes:
+            symbol, arr = self._windows.popitem(last=False)
+            self.nbytes -= arr.nbytes
+            evicted.append(symbol)
+        self.evictions += len(evicted)
+        return evicted
+
+    def _enforce_budget(self):
+        if self.max_bytes is not None and self.nbytes > self.max_bytes:
+            # 多淘汰 10%，避免每次更新都触发
+            evicted = self.evict(int(self.max_bytes * 0.9))
+            logging.info(f"🧠 K线缓存超出预算 {self.max_bytes / 1024 / 1024:.1f}MB，淘汰 {len(evicted)} 个交易对")
+
+    def missing_limit(self, symbol: str, now_ms: int) -> int:
+        """计算补齐窗口所需拉取的K线数量 (包含上次未收盘的那根)"""
+        arr = self._windows.get(symbol)
+        if arr is None or len(arr) == 0:
+            return self.window
+        last_open = int(arr[-1, 0])
+        current_open = now_ms - now_ms % HOUR_MS
+        missing = (current_open - last_open) // HOUR_MS + 1
+        return int(min(self.window, max(2, missing)))
+
+    def update(self, symbol: str, rows) -> np.ndarray:
+        """合并新拉取的K线：同一 open_time 以新数据为准，仅保留最近 window 根"""
+        fresh = rows_to_array(rows)
+        old = self._windows.get(symbol)
+        if old is not None and len(old) and len(fresh):
+            keep = old[old[:, 0] < fresh[0, 0]]
+            merged = np.vstack([keep, fresh])
+        else:
+            merged = fresh
+        merged = np.ascontiguousarray(merged[-self.window:])
+        self._put(symbol, merged)
+        self._enforce_budget()
+        return merged
+
+    def save(self):
+        """将所有窗口写入一个 (N, window, 12) 的 .npy 文件，短窗口以 NaN 填充"""
+        try:
+            symbols = list(self._windows.keys())
+            block = np.full((len(symbols), self.window, KLINE_FIELDS), np.nan, dtype=np.float64)
+            for i, symbol in enumerate(symbols):
+                arr = self._windows[symbol]
+                block[i, self.window - len(arr):] = arr
+            _atomic_save_npy(self.data_file, block)
+            _atomic_write_json(self.index_file, {
+                "symbols": symbols,
+                "window": self.window,
+                "saved_at": time.time(),
+            })
+        except Exception as e:
+            logging.error(f"保存K线缓存失败: {e}")
+
+    def load(self) -> int:
+        """以 mmap 方式加载K线窗口，返回加载的交易对数量"""
+        if not self.data_file.exists() or not self.index_file.exists():
+            return 0
+        try:
+            index = json.loads(self.index_file.read_text())
+            block = np.load(self.data_file, mmap_mode="r", allow_pickle=False)
+            symbols = index.get("symbols", [])
+            if block.ndim != 3 or block.shape[0] != len(symbols):
+                logging.warning("K线缓存与索引不一致，忽略")
+                return 0
+            for i, symbol in enumerate(symbols):
+                arr = block[i]
+                valid = ~np.isnan(arr[:, 0])
+                if not valid.any():
+                    continue
+                # 有效行位于尾部，切片保持为 mmap 只读视图；update 时会生成新数组
+                self._put(symbol, arr[int(np.argmax(valid)):])
+            self._enforce_budget()
+            return len(symbols)
+        except Exception as e:
+            logging.error(f"加载K线缓存失败: {e}")
+            return 0
+
+
+class SymbolTableCache:
+    """交易对状态与精度过滤器的本地缓存"""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.data_file = self.cache_dir / "symbols.npy"
+        self.meta_file = self.cache_dir / "symbols.json"
+
+    def save(self, table: Dict[str, Tuple[str, Optional[float], Optional[float]]], fetched_at: float):
+        try:
+            records = np.array(
+                [(s, status, tick or np.nan, step or np.nan) for s, (status, tick, step) in table.items()],
+                dtype=SYMBOL_DTYPE,
+            )
+            _atomic_save_npy(self.data_file, records)
+            _atomic_write_json(self.meta_file, {"fetched_at": fetched_at, "count": len(records)})
+        except Exception as e:
+            logging.error(f"保存交易对缓存失败: {e}")
+
+    def load(self) -> Tuple[Dict[str, Tuple[str, Optional[float], Optional[float]]], float]:
+        """返回 (交易对表, 获取时间戳)，无缓存时返回 ({}, 0)"""
+        if not self.data_file.exists() or not self.meta_file.exists():
+            return {}, 0.0
+        try:
+            meta = json.loads(self.meta_file.read_text())
+            records = np.load(self.data_file, mmap_mode="r", allow_pickle=False)
+            table = {}
+            for r in records:
+                tick = None if np.isnan(r["tick_size"]) else float(r["tick_size"])
+                step = None if np.isnan(r["step_size"]) else float(r["step_size"])
+                table[str(r["symbol"])] = (str(r["status"]), tick, step)
+            return table, float(meta.get("fetched_at", 0.0))
+        except Exception as e:
+            logging.error(f"加载交易对缓存失败: {e}")
+            return {}, 0.0
@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from records import Position, PendingSignal
+
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 3600 * 1000
+
+
+def first_peak_minute(pos: Position) -> int:
+    """开仓后第一根完整 1m K线的开盘时间 (ms)"""
+    entry_ms = int(pos.entry_ts * 1000)
+    return entry_ms - entry_ms % MINUTE_MS + MINUTE_MS
+
+
+def fold_candle_highs(pos: Position, rows: List[Sequence]):
+    """
+    把 1m K线最高价并入 12h/24h 峰值 (与按K线回测的口径一致)，每根K线 O(1)
+
+    开仓所在分钟的K线不并入：最高价可能出现在成交之前，该分钟由退出判定采样的最新价覆盖
+    """
+    first_open = first_peak_minute(pos)
+    entry_ms = int(pos.entry_ts * 1000)
+    last_open = pos.peak_until_ms
+    for row in rows:
+        open_time = int(row[0])
+        if open_time < first_open:
+            continue
+        up = (float(row[2]) - pos.entry_price) / pos.entry_price
+        if open_time < entry_ms + 12 * HOUR_MS:
+            pos.max_up_12h = max(pos.max_up_12h, up)
+        if open_time < entry_ms + 24 * HOUR_MS:
+            pos.max_up_24h = max(pos.max_up_24h, up)
+        last_open = open_time if last_open is None else max(last_open, open_time)
+    pos.peak_until_ms = last_open
+
+
+BASE_TAKE_PROFIT = 0.33  # 默认止盈 33%
+
+# 动态止盈档位 (唯一来源，逐个/批量判定与看板回退计算共用)：
+# (持仓满多少小时, 峰值窗口小时数, 窗口内最大涨幅低于该值, 止盈降至)，后面的档位优先
+TAKE_PROFIT_TIERS = (
+    (12, 12, 0.025, 0.20),
+    (24, 24, 0.05, 0.11),
+)
+
+
+def dynamic_take_profit(hold_hours: float, max_up_12h: float, max_up_24h: float, base_tp: float) -> float:
+    """动态止盈档位：12h 未涨 2.5% 降至 20%，24h 未涨 5% 降至 11% (见 TAKE_PROFIT_TIERS)"""
+    peaks = {12: max_up_12h, 24: max_up_24h}
+    current_tp = base_tp
+    for min_hours, window, below, tp in TAKE_PROFIT_TIERS:
+        if hold_hours >= min_hours and peaks[window] < below:
+            current_tp = tp
+    return current_tp
+
+
+@dataclass(slots=True)
+class PositionView:
+    """单个持仓在本轮 tick 的计算结果"""
+    symbol: str
+    price: float
+    hold_hours: float
+    current_up: float        # 相对真实开仓价
+    pnl_pct: float           # 相对虚拟开仓价
+    take_profit_pct: float
+    target_exit_price: float
+
+    @property
+    def dist_to_exit(self) -> float:
+        return (self.target_exit_price - self.price) / self.price if self.price > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "price": self.price,
+            "hold_hours": self.hold_hours,
+            "pnl_pct": self.pnl_pct,
+            "take_profit_pct": self.take_profit_pct,
+            "target_exit_price": self.target_exit_price,
+            "dist_to_exit": self.dist_to_exit,
+        }
+
+
+@dataclass(slots=True)
+class SignalView:
+    """单个待建仓信号在本轮 tick 的计算结果"""
+    symbol: str
+    price: float
+    distance_pct: float
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"price": self.price, "distance_pct": self.distance_pct}
+
+
+class MarketContext:
+    """每轮 tick 共享的行情快照：价格只取一次，衍生指标只算一次"""
+
+    def __init__(self, now: datetime, prices: Dict[str, float]):
+        self.now = now
+        self.now_ts = now.timestamp()
+        self.prices = prices
+        self.positions: Dict[str, PositionView] = {}
+        self.signals: Dict[str, SignalView] = {}
+
+    def price(self, symbol: str) -> float:
+        """获取本轮价格，缺失时抛出异常 (与逐个请求失败时的行为一致)"""
+        price = self.prices.get(symbol)
+        if price is None:
+            raise KeyError(f"{symbol} 本轮无价格数据")
+        return price
+
+    def observe_position(self, pos: Position, base_tp: float) -> PositionView:
+        """更新持仓峰值并计算止盈档位，结果缓存供状态表与看板复用"""
+        price = self.price(pos.symbol)
+        pos.current_price = price
+        hold_hours = pos.hold_hours(self.now_ts)
+        current_up = (price - pos.entry_price) / pos.entry_price
+
+        if hold_hours <= 12:
+            pos.max_up_12h = max(pos.max_up_12h, current_up)
+        if hold_hours <= 24:
+            pos.max_up_24h = max(pos.max_up_24h, current_up)
+
+        virtual_entry = pos.virtual_entry_price
+        current_tp = dynamic_take_profit(hold_hours, pos.max_up_12h, pos.max_up_24h, base_tp)
+        view = PositionView(
+            symbol=pos.symbol,
+            price=price,
+            hold_hours=hold_hours,
+            current_up=current_up,
+            pnl_pct=(price - virtual_entry) / virtual_entry,
+            take_profit_pct=current_tp,
+            target_exit_price=virtual_entry * (1 + current_tp),
+        )
+        self.positions[pos.symbol] = view
+        return view
+
+    def observe_signal(self, signal: PendingSignal) -> SignalView:
+        """计算信号距离目标价的比例 (同一轮只算一次)"""
+        view = self.signals.get(signal.symbol)
+        if view is None:
+            price = self.price(signal.symbol)
+            distance = (price - signal.target_entry_price) / price if price > 0 else 0
+            view = self.signals[signal.symbol] = SignalView(signal.symbol, price, distance)
+            signal.current_price = price
+            signal.distance_pct = distance
+        return view
+
+    def position_view(self, symbol: str) -> Optional[PositionView]:
+        return self.positions.get(symbol)
+
+    def export(self, position_symbols: Iterable[str], signal_symbols: Iterable[str]) -> Dict[str, Dict]:
+        """导出到状态文件供看板直接展示 (只包含仍然存在的持仓/信号)"""
+        return {
+            "updated_at": self.now.isoformat(),
+            "positions": {s: self.positions[s].to_dict() for s in position_symbols if s in self.positions},
+            "signals": {s: self.signals[s].to_dict() for s in signal_symbols if s in self.signals},
+        }
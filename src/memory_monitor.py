@@ -0,0 +1,235 @@
+"""
+内存占用监控与预算
+
+PM2 在 RSS 超过 500M 时重启进程 (ecosystem.config.js)，重启意味着一次冷启动扫描，
+而且可能发生在下单途中。这里提供:
+- 各子系统的大小估算 (K线缓存、特征、持仓/信号/历史、接口缓存、归档缓冲…)，定期计算并随状态文件保存
+- 按需 tracemalloc: 收到 MEMORY_PROFILE 指令后开始追踪，若干轮后与基线对比，
+  输出增长最多的分配位置 (日志 + data/memory/ 下的报告)，随后停止追踪以免持续开销
+- 软上限: RSS 超过 soft_limit 时调用各子系统登记的收缩函数 (按 LRU 淘汰缓存、写出缓冲) 并 gc，
+  在被 PM2 杀掉之前主动降级
+"""
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from clock import Clock
+
+MB = 1024 * 1024
+
+
+def rss_bytes() -> int:
+    """当前常驻内存 (Linux 读 /proc，其他平台退回 getrusage 的峰值)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+def deep_sizeof(obj: Any) -> int:
+    """
+    递归估算对象占用的字节数 (同一对象只计一次)
+    numpy 数组按 nbytes，DataFrame 按 memory_usage(deep=True)，不进入模块、类与函数
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, type(sys)) or callable(o):
+            continue
+        seen.add(id(o))
+        if isinstance(o, np.ndarray):
+            total += o.nbytes + sys.getsizeof(np.empty(0))
+            continue
+        if isinstance(o, (pd.DataFrame, pd.Series)):
+            total += int(o.memory_usage(deep=True).sum()) if isinstance(o, pd.DataFrame) else int(o.memory_usage(deep=True))
+            continue
+        total += sys.getsizeof(o)
+        if isinstance(o, (str, bytes, bytearray, int, float, bool)) or o is None:
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+        else:
+            if hasattr(o, "__dict__"):
+                stack.append(o.__dict__)
+            for slot in getattr(type(o), "__slots__", ()):
+                if hasattr(o, slot):
+                    stack.append(getattr(o, slot))
+    return total
+
+
+class MemoryMonitor:
+    """定期记录 RSS 与各子系统大小，超过软上限时收缩缓存"""
+
+    def __init__(
+        self,
+        clock: Optional[Clock] = None,
+        soft_limit_mb: float = 400,
+        report_dir: Optional[Path] = None,
+        account_interval: float = 600,
+        shrink_cooldown: float = 300,
+        trace_ticks: int = 10,
+        top: int = 15,
+    ):
+        self.clock = clock or Clock()
+        self.soft_limit = int(soft_limit_mb * MB)
+        self.report_dir = Path(report_dir) if report_dir else None
+        self.account_interval = account_interval
+        self.shrink_cooldown = shrink_cooldown
+        self.trace_ticks = trace_ticks
+        self.top = top
+        self._sources: Dict[str, Callable[[], int]] = {}
+        self._shrinkers: Dict[str, Callable[[], Any]] = {}
+        self.rss = 0
+        self.peak_rss = 0
+        self.sizes: Dict[str, int] = {}
+        self.accounted_at: Optional[float] = None
+        self.shrinks = 0
+        self.last_shrink_at: Optional[float] = None
+        self.profile: List[Dict[str, Any]] = []  # 最近一次 tracemalloc 对比结果
+        self.profiled_at: Optional[str] = None
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._trace_remaining = 0
+        self._owns_trace = False  # 由本模块启动的追踪才由本模块停止
+
+    def register(self, name: str, size: Callable[[], int], shrink: Optional[Callable[[], Any]] = None):
+        """登记子系统：size 返回字节数，shrink 在超过软上限时调用 (可返回释放的条目数)"""
+        self._sources[name] = size
+        if shrink is not None:
+            self._shrinkers[name] = shrink
+
+    # ---- 大小统计 ----
+    def account(self) -> Dict[str, int]:
+        sizes = {}
+        for name, size in self._sources.items():
+            try:
+                sizes[name] = int(size())
+            except Exception as e:
+                logging.error(f"统计内存占用失败 {name}: {e}")
+        self.sizes = sizes
+        self.accounted_at = self.clock.time()
+        return sizes
+
+    # ---- tracemalloc ----
+    @property
+    def tracing(self) -> bool:
+        return self._baseline is not None
+
+    def start_trace(self, frames: int = 10):
+        """开始追踪并记录基线，trace_ticks 轮后自动对比并停止"""
+        if self.tracing:
+            logging.info("🧠 tracemalloc 已在追踪中")
+            return
+        self._owns_trace = not tracemalloc.is_tracing()
+        if self._owns_trace:
+            tracemalloc.start(frames)
+        self._baseline = tracemalloc.take_snapshot()
+        self._trace_remaining = self.trace_ticks
+        logging.info(f"🧠 开始 tracemalloc 追踪，{self.trace_ticks} 轮后输出对比")
+
+    def finish_trace(self) -> List[Dict[str, Any]]:
+        """与基线对比，记录增长最多的分配位置并停止追踪"""
+        if not self.tracing:
+            return []
+        snapshot = tracemalloc.take_snapshot()
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ]
+        stats = snapshot.filter_traces(filters).compare_to(self._baseline.filter_traces(filters), "lineno")
+        self._baseline = None
+        if self._owns_trace:
+            tracemalloc.stop()
+
+        top = stats[:self.top]
+        self.profile = [
+            {
+                "where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                "size_diff_kb": round(s.size_diff / 1024, 1),
+                "size_kb": round(s.size / 1024, 1),
+                "count_diff": s.count_diff,
+            }
+            for s in top
+        ]
+        self.profiled_at = self.clock.now().isoformat()
+        logging.info("🧠 tracemalloc 对比 (增长最多):\n" + "\n".join(
+            f"   {p['size_diff_kb']:+.1f} KB ({p['count_diff']:+d}) {p['where']}" for p in self.profile[:5]
+        ))
+        if self.report_dir:
+            try:
+                self.report_dir.mkdir(parents=True, exist_ok=True)
+                path = self.report_dir / f"tracemalloc_{self.clock.now().strftime('%Y%m%d_%H%M%S')}.txt"
+                path.write_text("\n".join(str(s) for s in stats[:100]))
+                logging.info(f"🧠 完整报告: {path}")
+            except Exception as e:
+                logging.error(f"写入 tracemalloc 报告失败: {e}")
+        return self.profile
+
+    # ---- 每轮检查 ----
+    def check(self):
+        now = self.clock.time()
+        self.rss = rss_bytes()
+        self.peak_rss = max(self.peak_rss, self.rss)
+
+        if self.tracing:
+            self._trace_remaining -= 1
+            if self._trace_remaining <= 0:
+                self.finish_trace()
+
+        if self.accounted_at is None or now - self.accounted_at >= self.account_interval:
+            self.account()
+
+        if self.soft_limit and self.rss > self.soft_limit:
+            if self.last_shrink_at is None or now - self.last_shrink_at >= self.shrink_cooldown:
+                self.shrink()
+
+    def shrink(self):
+        """超过软上限：收缩各子系统并 gc (tracemalloc 本身也占内存，先停掉)"""
+        before = self.rss
+        logging.warning(f"🧠 内存 {before / MB:.0f}MB 超过软上限 {self.soft_limit / MB:.0f}MB，收缩缓存")
+        if self.tracing:
+            self.finish_trace()
+        for name, shrink in self._shrinkers.items():
+            try:
+                result = shrink()
+                if result:
+                    logging.info(f"   {name}: 释放 {result} 项")
+            except Exception as e:
+                logging.error(f"收缩 {name} 失败: {e}")
+        gc.collect()
+        self.shrinks += 1
+        self.last_shrink_at = self.clock.time()
+        self.rss = rss_bytes()
+        self.account()
+        logging.info(f"🧠 收缩后 RSS {self.rss / MB:.0f}MB (之前 {before / MB:.0f}MB)")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "rss_mb": round(self.rss / MB, 1),
+            "peak_rss_mb": round(self.peak_rss / MB, 1),
+            "soft_limit_mb": round(self.soft_limit / MB, 1),
+            "sizes_kb": {name: round(size / 1024, 1) for name, size in self.sizes.items()},
+            "shrinks": self.shrinks,
+            "tracing": self.tracing,
+            "profile": self.profile,
+            "profiled_at": self.profiled_at,
+        }
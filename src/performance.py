@@ -0,0 +1,202 @@
+"""
+增量维护的交易绩效统计
+
+每次平仓调用 fold(trade) 更新汇总值 (胜率、累计盈亏、回撤、按平仓原因/持仓时长分组)，
+随状态文件保存，看板直接读取，不需要每次刷新都遍历历史成交。
+累计盈亏按每笔 pnl_pct 相加 (不复利，与仓位大小无关)，回撤为累计盈亏距历史高点的差值。
+
+状态文件中的 history 只保留最近 100 笔，因此每笔平仓同时追加到不截断的成交日志 (data/trades.jsonl)。
+from_trades 用同一个 fold 按时间顺序重算，对成交日志重算的结果与增量维护的数值逐位一致，
+启动时两者笔数不一致 (例如保存状态前退出) 则以成交日志重建。
+"""
+import argparse
+import json
+import logging
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from records import parse_ts
+
+# 成交日志中保存的字段 (fold 所需字段 + 便于核对的价格与时间)
+TRADE_FIELDS = ("symbol", "reason", "entry_price", "exit_price", "pnl_pct", "entry_time", "exit_time", "quantity", "hold_hours")
+
+# 持仓时长分组上界 (小时)
+HOLD_BUCKETS = [(6, "<6h"), (12, "6-12h"), (24, "12-24h"), (48, "24-48h"), (float("inf"), "48h+")]
+EQUITY_POINTS = 500  # 权益曲线只保留最近的点数
+
+
+def hold_bucket(hours: float) -> str:
+    for upper, label in HOLD_BUCKETS:
+        if hours < upper:
+            return label
+    return HOLD_BUCKETS[-1][1]
+
+
+def trade_hold_hours(trade: Dict[str, Any]) -> float:
+    """历史成交的持仓时长 (旧记录没有 hold_hours 字段时按开平仓时间计算)"""
+    hours = trade.get("hold_hours")
+    if hours is not None:
+        return hours
+    return (parse_ts(trade.get("exit_time")) - parse_ts(trade.get("entry_time"))) / 3600
+
+
+@dataclass(slots=True)
+class Bucket:
+    """一组成交的计数与盈亏合计"""
+    trades: int = 0
+    wins: int = 0
+    pnl_sum: float = 0.0
+
+    def add(self, pnl_pct: float):
+        self.trades += 1
+        self.wins += pnl_pct > 0
+        self.pnl_sum += pnl_pct
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.trades if self.trades else 0.0
+
+    @property
+    def avg_pnl(self) -> float:
+        return self.pnl_sum / self.trades if self.trades else 0.0
+
+    def to_list(self) -> List[Any]:
+        return [self.trades, self.wins, self.pnl_sum]
+
+
+@dataclass(slots=True)
+class PerformanceStats:
+    total: Bucket = field(default_factory=Bucket)
+    peak: float = 0.0            # 累计盈亏的历史高点
+    max_drawdown: float = 0.0
+    best: Optional[float] = None
+    worst: Optional[float] = None
+    by_reason: Dict[str, Bucket] = field(default_factory=dict)
+    by_hold: Dict[str, Bucket] = field(default_factory=dict)
+    equity: List[List[Any]] = field(default_factory=list)  # [平仓时间, 累计盈亏]
+
+    @property
+    def cum_pnl(self) -> float:
+        return self.total.pnl_sum
+
+    @property
+    def drawdown(self) -> float:
+        return self.peak - self.total.pnl_sum
+
+    def fold(self, trade: Dict[str, Any]):
+        """计入一笔平仓 (trade 为 history 中的记录)"""
+        pnl_pct = trade["pnl_pct"]
+        self.total.add(pnl_pct)
+        self.by_reason.setdefault(trade.get("reason") or "unknown", Bucket()).add(pnl_pct)
+        self.by_hold.setdefault(hold_bucket(trade_hold_hours(trade)), Bucket()).add(pnl_pct)
+        self.best = pnl_pct if self.best is None else max(self.best, pnl_pct)
+        self.worst = pnl_pct if self.worst is None else min(self.worst, pnl_pct)
+        cum = self.total.pnl_sum
+        self.peak = max(self.peak, cum)
+        self.max_drawdown = max(self.max_drawdown, self.peak - cum)
+        self.equity.append([trade.get("exit_time"), cum])
+        if len(self.equity) > EQUITY_POINTS:
+            del self.equity[:-EQUITY_POINTS]
+
+    @classmethod
+    def from_trades(cls, trades: Iterable[Dict[str, Any]]) -> "PerformanceStats":
+        """按时间顺序 (旧的在前) 全量重算"""
+        stats = cls()
+        for trade in trades:
+            stats.fold(trade)
+        return stats
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total.to_list(),
+            "peak": self.peak,
+            "max_drawdown": self.max_drawdown,
+            "best": self.best,
+            "worst": self.worst,
+            "by_reason": {k: b.to_list() for k, b in self.by_reason.items()},
+            "by_hold": {k: b.to_list() for k, b in self.by_hold.items()},
+            "equity": self.equity,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PerformanceStats":
+        return cls(
+            total=Bucket(*data["total"]),
+            peak=data["peak"],
+            max_drawdown=data["max_drawdown"],
+            best=data.get("best"),
+            worst=data.get("worst"),
+            by_reason={k: Bucket(*v) for k, v in data.get("by_reason", {}).items()},
+            by_hold={k: Bucket(*v) for k, v in data.get("by_hold", {}).items()},
+            equity=[list(p) for p in data.get("equity", [])],
+        )
+
+
+def _trade_line(trade: Dict[str, Any]) -> str:
+    # 浮点数按 repr 写出，读回后逐位相同
+    return json.dumps({k: trade[k] for k in TRADE_FIELDS if k in trade}) + "\n"
+
+
+def append_trade(path: Path, trade: Dict[str, Any]):
+    """追加一笔平仓到成交日志 (每行一个 JSON)"""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(_trade_line(trade))
+
+
+def load_trades(path: Path) -> List[Dict[str, Any]]:
+    """读取成交日志 (按平仓先后顺序)，末尾写了一半的行忽略"""
+    trades = []
+    if not Path(path).exists():
+        return trades
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                trades.append(json.loads(line))
+            except ValueError:
+                logging.warning(f"成交日志中有无法解析的行，已忽略: {line[:80]!r}")
+    return trades
+
+
+def restore(state: Dict[str, Any], trade_log: Path, history: List[Dict[str, Any]]) -> PerformanceStats:
+    """
+    启动时恢复统计:
+    - 没有成交日志 (旧版本) 时用现存 history 生成日志，history 已被截断时只能覆盖保留下来的成交
+    - 状态中的统计与成交日志笔数一致时直接使用，否则以成交日志重算
+    """
+    if not Path(trade_log).exists():
+        trades = list(reversed(history))  # history 新的在前
+        if len(trades) >= 100:
+            logging.warning(f"⚠️ 成交日志不存在，只能从状态文件保留的最近 {len(trades)} 笔成交重建绩效统计")
+        with open(trade_log, "w", encoding="utf-8") as f:
+            f.writelines(_trade_line(trade) for trade in trades)
+        return PerformanceStats.from_trades(trades)
+
+    trades = load_trades(trade_log)
+    if state.get("performance"):
+        stats = PerformanceStats.from_dict(state["performance"])
+        if stats.total.trades == len(trades):
+            return stats
+        logging.warning(f"⚠️ 绩效统计 ({stats.total.trades} 笔) 与成交日志 ({len(trades)} 笔) 不一致，按成交日志重算")
+    return PerformanceStats.from_trades(trades)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="从成交日志全量重算绩效统计")
+    parser.add_argument("trade_log", type=Path, nargs="?", default=Path("data/trades.jsonl"))
+    parser.add_argument("--state", type=Path, help="与状态文件中增量维护的统计对比")
+    args = parser.parse_args(argv)
+
+    stats = PerformanceStats.from_trades(load_trades(args.trade_log)).to_dict()
+    print(json.dumps(stats, indent=2, ensure_ascii=False))
+    if args.state:
+        saved = json.loads(args.state.read_text()).get("performance")
+        if saved != stats:
+            print("⚠️ 与状态文件中的统计不一致", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
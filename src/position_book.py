@@ -0,0 +1,162 @@
+"""
+持仓的列式视图与批量退出判定
+
+每个字段一列 (numpy 数组)，对全部持仓一次性计算持仓时长、峰值、止盈档位、盈亏，
+并按原有优先级 (动态止盈 > 虚拟补仓 > 止损 > 超时 > 弱势) 给出本轮要执行的动作列表。
+静态列 (开仓时间/开仓价) 只在持仓增删时重建；可变列 (虚拟开仓价/补仓标记/峰值) 每轮从持仓记录同步，
+记录仍是状态文件的唯一来源。
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from market_context import TAKE_PROFIT_TIERS, MarketContext, PositionView
+from records import Position
+
+ACTION_CLOSE = "close"
+ACTION_VIRTUAL_ADD = "virtual_add"
+
+# np.select 的分支编号 (顺序即优先级)
+_NONE, _TAKE_PROFIT, _VIRTUAL_ADD, _STOP_LOSS, _TIMEOUT, _WEAK = range(6)
+
+
+@dataclass(slots=True)
+class ExitAction:
+    """批量判定给出的单个动作"""
+    symbol: str
+    kind: str        # ACTION_CLOSE / ACTION_VIRTUAL_ADD
+    reason: str
+    price: float
+    pnl_pct: float
+
+
+def dynamic_take_profit_batch(
+    hold_hours: np.ndarray, max_up_12h: np.ndarray, max_up_24h: np.ndarray, base_tp: float
+) -> np.ndarray:
+    """market_context.dynamic_take_profit 的向量化版本 (同一张 TAKE_PROFIT_TIERS 档位表)"""
+    peaks = {12: max_up_12h, 24: max_up_24h}
+    tp = np.full(hold_hours.shape, base_tp)
+    for min_hours, window, below, tier_tp in TAKE_PROFIT_TIERS:
+        tp = np.where((hold_hours >= min_hours) & (peaks[window] < below), tier_tp, tp)
+    return tp
+
+
+class PositionBook:
+    """持仓簿的列式存储"""
+
+    def __init__(self):
+        self._key: tuple = ()
+        self.symbols: List[str] = []
+        self.records: List[Position] = []
+        self.entry_ts = np.empty(0)
+        self.entry_price = np.empty(0)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def sync(self, positions: Dict[str, Position]):
+        """持仓增删 (或记录被替换) 时重建静态列"""
+        key = tuple((symbol, id(pos)) for symbol, pos in positions.items())
+        if key == self._key:
+            return
+        self._key = key
+        self.symbols = list(positions.keys())
+        self.records = list(positions.values())
+        n = len(self.records)
+        self.entry_ts = np.fromiter((p.entry_ts for p in self.records), float, n)
+        self.entry_price = np.fromiter((p.entry_price for p in self.records), float, n)
+
+    def _column(self, attr: str, dtype=float) -> np.ndarray:
+        return np.array([getattr(p, attr) for p in self.records], dtype=dtype)
+
+    def evaluate(
+        self,
+        positions: Dict[str, Position],
+        ctx: MarketContext,
+        base_tp: float,
+        add_trigger_pct: float,
+        stop_loss_pct: float,
+        max_hold_hours: float,
+        weak_24h_threshold: Optional[float] = None,
+    ) -> List[ExitAction]:
+        """
+        一次向量化计算全部持仓的退出条件
+
+        峰值写回持仓记录，视图登记到 ctx (状态表/看板复用)；
+        本轮无价格的持仓跳过并记录错误 (与逐个判定时的行为一致)。
+        weak_24h_threshold 为 None 时不启用弱势平仓。
+        """
+        self.sync(positions)
+        if not self.records:
+            return []
+
+        prices = ctx.prices
+        price = np.array([prices.get(s, np.nan) for s in self.symbols], dtype=float)
+        missing = np.isnan(price)
+        for i in np.flatnonzero(missing):
+            logging.error(f"监控 {self.symbols[i]} 失败: '{self.symbols[i]} 本轮无价格数据'")
+
+        hold_hours = (ctx.now_ts - self.entry_ts) / 3600
+        current_up = (price - self.entry_price) / self.entry_price
+
+        # 峰值 (缺价格时 fmax 保留原值)
+        max_up_12h = self._column("max_up_12h")
+        max_up_24h = self._column("max_up_24h")
+        max_up_12h = np.where(hold_hours <= 12, np.fmax(max_up_12h, current_up), max_up_12h)
+        max_up_24h = np.where(hold_hours <= 24, np.fmax(max_up_24h, current_up), max_up_24h)
+
+        virtual_entry = self._column("virtual_entry_price")
+        is_added = self._column("is_virtual_added", bool)
+        tp = dynamic_take_profit_batch(hold_hours, max_up_12h, max_up_24h, base_tp)
+        pnl_pct = (price - virtual_entry) / virtual_entry
+
+        weak = (
+            (hold_hours >= 24) & (max_up_24h < weak_24h_threshold)
+            if weak_24h_threshold is not None else np.zeros(len(price), bool)
+        )
+        decision = np.select(
+            [
+                missing,
+                pnl_pct >= tp,
+                ~is_added & (pnl_pct <= add_trigger_pct),
+                pnl_pct <= stop_loss_pct,
+                hold_hours >= max_hold_hours,
+                weak,
+            ],
+            [_NONE, _TAKE_PROFIT, _VIRTUAL_ADD, _STOP_LOSS, _TIMEOUT, _WEAK],
+            default=_NONE,
+        )
+
+        # 写回记录并登记视图 (整列转为 Python float 后逐个赋值，避免逐元素取 numpy 标量)
+        target_exit = virtual_entry * (1 + tp)
+        columns = zip(
+            self.records, (~missing).tolist(), price.tolist(), hold_hours.tolist(), current_up.tolist(),
+            pnl_pct.tolist(), tp.tolist(), target_exit.tolist(), max_up_12h.tolist(), max_up_24h.tolist(),
+        )
+        views = ctx.positions
+        for pos, has_price, p, hours, up, pnl, take_profit, target, up_12h, up_24h in columns:
+            if not has_price:
+                continue
+            pos.current_price = p
+            pos.max_up_12h = up_12h
+            pos.max_up_24h = up_24h
+            views[pos.symbol] = PositionView(pos.symbol, p, hours, up, pnl, take_profit, target)
+
+        reasons = {
+            _STOP_LOSS: "stop_loss",
+            _TIMEOUT: "timeout_72h",
+            _WEAK: "weak_trend_24h",
+        }
+        actions = []
+        for i in np.flatnonzero(decision != _NONE):
+            code = int(decision[i])
+            if code == _TAKE_PROFIT:
+                kind, reason = ACTION_CLOSE, f"take_profit_dynamic_{tp[i]*100:.0f}%"
+            elif code == _VIRTUAL_ADD:
+                kind, reason = ACTION_VIRTUAL_ADD, "virtual_add"
+            else:
+                kind, reason = ACTION_CLOSE, reasons[code]
+            actions.append(ExitAction(self.symbols[i], kind, reason, float(price[i]), float(pnl_pct[i])))
+        return actions
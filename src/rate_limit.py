@@ -0,0 +1,255 @@
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Deque, Dict, Iterator, Mapping, Optional, Tuple
+
+from clock import Clock
+
+# 请求优先级：手动指令/下单/平仓 > 信号与持仓监控 > 全市场扫描
+PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW = 0, 1, 2
+
+# 各优先级可使用的每分钟权重比例 (差额即为更高优先级预留的容量)
+DEFAULT_SHARES = {PRIORITY_HIGH: 1.0, PRIORITY_NORMAL: 0.9, PRIORITY_LOW: 0.75}
+
+USED_WEIGHT_HEADER = "x-mbx-used-weight-1m"
+
+if TYPE_CHECKING:
+    from weight_ledger import WeightLedger
+
+
+class CircuitOpenError(Exception):
+    """熔断期间的低优先级请求直接拒绝"""
+
+
+class WeightGovernor:
+    """
+    每分钟请求权重调度
+
+    - 本地计数按交易所的自然分钟窗口重置，并用响应头 X-MBX-USED-WEIGHT-1M 校准
+    - 低优先级只能使用部分预算，为平仓/手动指令预留容量
+    - 429/418 时熔断：低优先级立即失败，其余请求等待到熔断结束
+    - pace() 根据剩余预算与响应延迟给出扫描节奏；延迟基线取最近 latency_window 秒内的最小值，
+      网络状况变化或空闲一段时间后基线随之更新，不会被很久以前的一次快速响应长期压低
+    - 配置 ledger (weight_ledger.WeightLedger) 时预算与熔断在同机所有进程间共享，
+      本地只记录本进程用量
+    - 时间取自 clock (模拟/回放时为虚拟时钟)；共享账本按系统时间协调多个进程，虚拟时钟下不使用账本
+    """
+
+    def __init__(
+        self,
+        max_weight: int = 1200,
+        shares: Optional[Dict[int, float]] = None,
+        min_delay: float = 0.0,
+        max_delay: float = 2.0,
+        ledger: Optional["WeightLedger"] = None,
+        latency_window: float = 600.0,
+        clock: Optional[Clock] = None,
+    ):
+        self.clock = clock or Clock()
+        self.max_weight = max_weight
+        self.shares = shares or dict(DEFAULT_SHARES)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.used = 0
+        self._minute = int(self.clock.time() // 60)
+        self._open_until = 0.0
+        self.latency_ewma_ms = 0.0
+        self.latency_window = latency_window
+        self._latency_mins: Deque[Tuple[float, float]] = deque()  # (时间, 延迟) 单调递增，队首为窗口内最小值
+        self.trips = 0
+        if ledger is not None and self.clock.simulated:
+            logging.warning("虚拟时钟与同机共享权重账本的时间轴不同，改用进程内计数")
+            ledger = None
+        self.ledger = ledger
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ---- 优先级上下文 ----
+    def current_priority(self) -> int:
+        return getattr(self._local, "priority", PRIORITY_NORMAL)
+
+    @contextmanager
+    def priority(self, priority: int) -> Iterator[None]:
+        """在当前线程内以指定优先级发送请求"""
+        previous = self.current_priority()
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    # ---- 权重预算 ----
+    def _roll(self, now: float):
+        minute = int(now // 60)
+        if minute != self._minute:
+            self._minute = minute
+            self.used = 0
+
+    def limit(self, priority: int) -> float:
+        return self.max_weight * self.shares.get(priority, 1.0)
+
+    def _shared_open_until(self) -> float:
+        return max(self._open_until, self.ledger.state()["open_until"]) if self.ledger else self._open_until
+
+    def is_open(self) -> bool:
+        """熔断中 (共享账本时包括其他进程触发的熔断)"""
+        return self.clock.time() < self._shared_open_until()
+
+    def total_used(self) -> int:
+        """本分钟已用权重 (共享账本时为同机所有进程合计)"""
+        if self.ledger:
+            return self.ledger.state()["used"]
+        with self._lock:
+            self._roll(self.clock.time())
+            return self.used
+
+    def _fit(self, weight: int, priority: int) -> Tuple[int, int]:
+        """超过该优先级上限的单次请求按最高优先级占用 (最多占满整分钟额度)，否则永远等不到足够的预算"""
+        if weight <= self.limit(priority):
+            return weight, priority
+        logging.warning(f"⚠️ 单次请求权重 {weight} 超过优先级 {priority} 的上限 {self.limit(priority):.0f}，按最高优先级占用")
+        return min(weight, self.max_weight), PRIORITY_HIGH
+
+    def acquire(self, weight: int = 1, priority: Optional[int] = None):
+        """占用权重，预算不足时等待到下一分钟窗口"""
+        priority = self.current_priority() if priority is None else priority
+        weight, priority = self._fit(weight, priority)
+        if self.ledger:
+            self._acquire_shared(weight, priority)
+            return
+        while True:
+            with self._lock:
+                now = self.clock.time()
+                self._roll(now)
+                if now < self._open_until:
+                    if priority == PRIORITY_LOW:
+                        raise CircuitOpenError(f"限流熔断中，剩余 {self._open_until - now:.1f}s")
+                    wait = self._open_until - now
+                elif self.used + weight <= self.limit(priority):
+                    self.used += weight
+                    return
+                else:
+                    wait = 60 - now % 60
+                    logging.warning(f"⚠️ API权重接近临界值 ({self.used}/{self.limit(priority):.0f}), 暂停 {wait:.1f}s")
+            self.clock.sleep(wait)
+
+    def _acquire_shared(self, weight: int, priority: int):
+        """从共享账本占用权重：最高优先级不受公平份额限制"""
+        while True:
+            ok, wait, reason = self.ledger.try_acquire(
+                weight, self.limit(priority), self.max_weight, fair=priority != PRIORITY_HIGH,
+            )
+            if ok:
+                with self._lock:
+                    self._roll(self.clock.time())
+                    self.used += weight
+                return
+            if reason == "circuit":
+                if priority == PRIORITY_LOW:
+                    raise CircuitOpenError(f"限流熔断中 (同机共享)，剩余 {wait:.1f}s")
+            elif reason == "fair_share":
+                logging.warning(f"⚠️ 同机权重争用，本进程已达公平份额，暂停 {wait:.1f}s")
+            else:
+                logging.warning(f"⚠️ 同机API权重接近临界值 (上限 {self.limit(priority):.0f}), 暂停 {wait:.1f}s")
+            self.clock.sleep(wait)
+
+    def observe_headers(self, headers: Optional[Mapping[str, str]]):
+        """用服务端返回的已用权重校准本地计数 (包含同 IP 其他进程的消耗)"""
+        if not headers:
+            return
+        for key, value in headers.items():
+            if key.lower() == USED_WEIGHT_HEADER:
+                try:
+                    server_used = int(value)
+                except (TypeError, ValueError):
+                    return
+                if self.ledger:
+                    self.ledger.observe_used(server_used)
+                    return
+                with self._lock:
+                    self._roll(self.clock.time())
+                    self.used = max(self.used, server_used)
+                return
+
+    def _expire_latency(self, now: float):
+        mins = self._latency_mins
+        while mins and mins[0][0] < now - self.latency_window:
+            mins.popleft()
+
+    @property
+    def latency_floor_ms(self) -> float:
+        """最近 latency_window 秒内的最小延迟 (窗口内没有请求时为 0)"""
+        with self._lock:
+            self._expire_latency(self.clock.time())
+            return self._latency_mins[0][1] if self._latency_mins else 0.0
+
+    def observe_latency(self, elapsed_ms: float):
+        now = self.clock.time()
+        with self._lock:
+            self._expire_latency(now)
+            if self.latency_ewma_ms == 0 or not self._latency_mins:
+                # 空闲超过一个窗口后重新开始，旧的拥塞延迟不再拖慢节奏
+                self.latency_ewma_ms = elapsed_ms
+            else:
+                self.latency_ewma_ms = 0.8 * self.latency_ewma_ms + 0.2 * elapsed_ms
+            mins = self._latency_mins
+            while mins and mins[-1][1] >= elapsed_ms:
+                mins.pop()
+            mins.append((now, elapsed_ms))
+
+    def trip(self, seconds: float, reason: str):
+        """429/418 触发熔断"""
+        until = self.clock.time() + max(seconds, 1.0)
+        shared = self.ledger.trip(until) if self.ledger else False
+        with self._lock:
+            if until > self._open_until:
+                self._open_until = until
+                self.trips += 1
+                logging.error(f"🧯 API 限流熔断 {seconds:.0f}s: {reason}" + (" (同机所有进程暂停)" if shared else ""))
+
+    def pace(self, weight: int = 1) -> float:
+        """低优先级请求的建议间隔 (秒)：把剩余预算均摊到本分钟剩余时间，延迟升高时放慢"""
+        shared = self.ledger.state() if self.ledger else None
+        with self._lock:
+            now = self.clock.time()
+            self._roll(now)
+            open_until = max(self._open_until, shared["open_until"]) if shared else self._open_until
+            if now < open_until:
+                return open_until - now
+            seconds_left = 60 - now % 60
+            if shared:
+                # 共享时按同机合计用量计算；争用状态下只能使用本进程的公平份额
+                remaining = self.limit(PRIORITY_LOW) - shared["used"]
+                if shared["used"] >= self.max_weight * self.ledger.contention_ratio:
+                    remaining = min(remaining, self.limit(PRIORITY_LOW) / shared["processes"] - shared["own_used"])
+            else:
+                remaining = self.limit(PRIORITY_LOW) - self.used
+            if remaining <= weight:
+                return seconds_left
+            delay = seconds_left * weight / remaining
+            # 延迟明显高于基线说明服务端或网络拥塞
+            self._expire_latency(now)
+            floor_ms = self._latency_mins[0][1] if self._latency_mins else 0.0
+            if floor_ms and self.latency_ewma_ms > 2 * floor_ms:
+                delay = max(delay, self.latency_ewma_ms / 1000)
+            return min(max(delay, self.min_delay), self.max_delay)
+
+    def snapshot(self) -> Dict[str, float]:
+        shared = self.ledger.state() if self.ledger else None
+        with self._lock:
+            now = self.clock.time()
+            self._roll(now)
+            self._expire_latency(now)
+            open_until = max(self._open_until, shared["open_until"]) if shared else self._open_until
+            data = {
+                "used_weight": shared["used"] if shared else self.used,
+                "max_weight": self.max_weight,
+                "latency_ewma_ms": round(self.latency_ewma_ms, 1),
+                "latency_floor_ms": round(self._latency_mins[0][1], 1) if self._latency_mins else 0.0,
+                "circuit_open_for": round(max(0.0, open_until - now), 1),
+                "trips": self.trips,
+            }
+            if shared:
+                data.update(own_weight=self.used, processes=shared["processes"], shared_trips=shared["trips"])
+            return data
@@ -0,0 +1,144 @@
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta, timezone, UTC
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# signal_time 使用北京时间 (+08:00)
+BJ_TZ = timezone(timedelta(hours=8))
+
+# 仅在取值不为 None 时写回状态文件的字段
+_OPTIONAL = {"optional": True}
+
+
+def parse_ts(value: Optional[str]) -> float:
+    """ISO 时间字符串转为 epoch 秒 (无时区时按 UTC 处理，与原有逻辑一致)"""
+    if not value:
+        return 0.0
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt.timestamp()
+
+
+def _record_keys(cls) -> List[str]:
+    return [f.name for f in fields(cls) if f.init and f.name != "extra"]
+
+
+def _to_dict(record) -> Dict[str, Any]:
+    """按状态文件原有布局导出，未知字段原样保留"""
+    data = {}
+    for f in fields(record):
+        if not f.init or f.name == "extra":
+            continue
+        value = getattr(record, f.name)
+        if value is None and f.metadata.get("optional"):
+            continue
+        data[f.name] = value
+    data.update(record.extra)
+    return data
+
+
+def _from_dict(cls, data: Dict[str, Any]):
+    keys = _record_keys(cls)
+    kwargs = {k: data[k] for k in keys if k in data}
+    extra = {k: v for k, v in data.items() if k not in kwargs}
+    return cls(**kwargs, extra=extra)
+
+
+@dataclass(slots=True, kw_only=True)
+class PendingSignal:
+    """待建仓信号"""
+    symbol: str
+    signal_time: str
+    signal_close: float
+    buy_surge_ratio: float
+    target_entry_price: float
+    drop_pct: float
+    timeout_time: str
+    created_at: str
+    current_price: Optional[float] = field(default=None, metadata=_OPTIONAL)
+    distance_pct: Optional[float] = field(default=None, metadata=_OPTIONAL)
+    strategy: Optional[str] = field(default=None, metadata=_OPTIONAL)  # 产生信号的插件 (旧数据为空)
+    trace: Optional[Dict[str, Any]] = field(default=None, metadata=_OPTIONAL)
+    extra: Dict[str, Any] = field(default_factory=dict, repr=False)
+    timeout_ts: float = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.timeout_ts = parse_ts(self.timeout_time)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PendingSignal":
+        return _from_dict(cls, data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _to_dict(self)
+
+
+@dataclass(slots=True, kw_only=True)
+class Position:
+    """持仓记录"""
+    symbol: str
+    entry_time: str
+    signal_time: Optional[str] = None
+    entry_price: float
+    quantity: float
+    buy_surge_ratio: float = 0.0
+    virtual_entry_price: float
+    is_virtual_added: bool = False
+    max_up_12h: float = 0.0
+    max_up_24h: float = 0.0
+    peak_until_ms: Optional[int] = field(default=None, metadata=_OPTIONAL)  # 已并入峰值的最后一根 1m K线开盘时间
+    current_price: Optional[float] = field(default=None, metadata=_OPTIONAL)
+    strategy: Optional[str] = field(default=None, metadata=_OPTIONAL)  # 手动开仓与旧数据为空
+    trace: Optional[Dict[str, Any]] = field(default=None, metadata=_OPTIONAL)
+    extra: Dict[str, Any] = field(default_factory=dict, repr=False)
+    entry_ts: float = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.entry_ts = parse_ts(self.entry_time)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Position":
+        return _from_dict(cls, data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _to_dict(self)
+
+    def hold_hours(self, now_ts: float) -> float:
+        return (now_ts - self.entry_ts) / 3600
+
+
+class SignalBook:
+    """按交易对索引的待建仓信号集合 (保持插入顺序)"""
+
+    def __init__(self, signals: Iterable[PendingSignal] = ()):
+        self._by_symbol: Dict[str, PendingSignal] = {}
+        for s in signals:
+            self._by_symbol[s.symbol] = s
+
+    def __len__(self) -> int:
+        return len(self._by_symbol)
+
+    def __iter__(self) -> Iterator[PendingSignal]:
+        return iter(list(self._by_symbol.values()))
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._by_symbol
+
+    def get(self, symbol: str) -> Optional[PendingSignal]:
+        return self._by_symbol.get(symbol)
+
+    def upsert(self, signal: PendingSignal) -> bool:
+        """新增或原位替换同一交易对的信号，返回是否为新增"""
+        is_new = signal.symbol not in self._by_symbol
+        self._by_symbol[signal.symbol] = signal
+        return is_new
+
+    def remove(self, symbol: str) -> Optional[PendingSignal]:
+        return self._by_symbol.pop(symbol, None)
+
+    @classmethod
+    def from_list(cls, data: List[Dict[str, Any]]) -> "SignalBook":
+        return cls(PendingSignal.from_dict(d) for d in data)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [s.to_dict() for s in self._by_symbol.values()]
@@ -0,0 +1,43 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class ScanCheckpoint:
+    """全市场扫描进度检查点：崩溃或重启后在同一小时内从断点继续"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def load(self, signal_hour: str) -> Optional[Dict[str, Any]]:
+        """读取检查点，不属于当前信号小时的检查点视为过期"""
+        if not self.path.exists():
+            return None
+        try:
+            data = json.loads(self.path.read_text())
+        except Exception as e:
+            logging.warning(f"读取扫描检查点失败: {e}")
+            return None
+        if data.get("signal_hour") != signal_hour:
+            self.clear()
+            return None
+        return data
+
+    def save(self, signal_hour: str, symbols: List[str], next_index: int, candidates: List[List[Any]]):
+        """原子化写入扫描进度 (next_index 之前的交易对均已处理)"""
+        try:
+            data = {
+                "signal_hour": signal_hour,
+                "next_index": next_index,
+                "symbols": symbols,
+                "candidates": candidates,
+            }
+            temp_file = self.path.with_suffix(".tmp")
+            temp_file.write_text(json.dumps(data))
+            temp_file.replace(self.path)
+        except Exception as e:
+            logging.error(f"保存扫描检查点失败: {e}")
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
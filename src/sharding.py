@@ -0,0 +1,161 @@
+"""
+全市场扫描的水平分片
+
+协调模式下由 N 个 worker 进程分担扫描：执行进程 (协调者) 每小时取一次交易对列表与 24h 统计 (流动性过滤)，
+按一致性哈希切分后经各 worker 的队列下发；worker 只扫描收到的交易对 (超时未收到时自行获取并按哈希过滤)，
+扫描出的信号 (已过多空比过滤) 通过队列上报给执行进程。
+执行进程不扫描K线，独占持仓、max_daily_positions 与余额。
+一致性哈希保证增减 worker 时只有约 1/N 的交易对换分片，各 worker 的K线缓存大部分仍然有效。
+
+用法: python src/sharding.py --workers 4 [--live]
+worker 日志写入 logs/trading.shard<k>.log，缓存与检查点在 data/shards/shard<k>/，列式归档与主进程共用 data/analytics。
+"""
+import argparse
+import bisect
+import hashlib
+import logging
+import multiprocessing as mp
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+ROLE_STANDALONE = "standalone"
+ROLE_WORKER = "worker"
+ROLE_COORDINATOR = "coordinator"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """一致性哈希环 (每个分片 replicas 个虚拟节点，分布更均匀)"""
+
+    def __init__(self, shards: int, replicas: int = 128):
+        if shards < 1:
+            raise ValueError(f"分片数必须大于 0: {shards}")
+        self.shards = shards
+        points = sorted((_hash(f"shard-{shard}#{r}"), shard) for shard in range(shards) for r in range(replicas))
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def shard_of(self, key: str) -> int:
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+    def partition(self, keys: Iterable[str]) -> Dict[int, List[str]]:
+        parts: Dict[int, List[str]] = {shard: [] for shard in range(self.shards)}
+        for key in keys:
+            parts[self.shard_of(key)].append(key)
+        return parts
+
+
+def shard_filter(index: int, count: int) -> Callable[[List[str]], List[str]]:
+    """返回只保留第 index 个分片交易对的过滤函数 (保持原有顺序)"""
+    ring = HashRing(count)
+    return lambda symbols: [s for s in symbols if ring.shard_of(s) == index]
+
+
+def _worker_main(index: int, count: int, signal_queue, universe_queue, stop_event, dry_run: bool):
+    """worker 进程入口：只扫描本分片，信号放入队列"""
+    from log_setup import setup_logging
+
+    # 在导入 main 之前配置独立的日志文件
+    base_dir = Path(__file__).parent.parent
+    setup_logging(base_dir / "logs", name=f"trading.shard{index}")
+
+    from main import RealTimeBuySurgeStrategyV3, DATA_DIR
+    from analytics_export import AnalyticsExporter
+
+    trader = RealTimeBuySurgeStrategyV3(
+        dry_run=dry_run,
+        data_dir=DATA_DIR / "shards" / f"shard{index}",
+        role=ROLE_WORKER,
+        shard=(index, count),
+        signal_queue=signal_queue,
+        universe_queue=universe_queue,
+    )
+    trader.analytics = AnalyticsExporter(DATA_DIR / "analytics")
+    trader.health_port = 0  # 健康检查端点只由执行进程提供
+    trader.start()
+    try:
+        while not stop_event.wait(1):
+            if not trader.thread or not trader.thread.is_alive():
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        trader.stop()
+
+
+class ShardCoordinator:
+    """启动并看护 worker 进程，执行进程在本进程内运行"""
+
+    def __init__(self, workers: int, dry_run: bool = True):
+        self.workers = workers
+        self.dry_run = dry_run
+        self._mp = mp.get_context("spawn")  # 子进程重新导入模块，不继承日志线程等运行时状态
+        self.signal_queue = self._mp.Queue()
+        # 每个分片一个下发队列 (重启的 worker 沿用同一队列)
+        self.universe_queues = [self._mp.Queue() for _ in range(workers)]
+        self.stop_event = self._mp.Event()
+        self.processes: Dict[int, mp.Process] = {}
+        self.restarts = 0
+
+    def _spawn(self, index: int):
+        process = self._mp.Process(
+            target=_worker_main,
+            args=(index, self.workers, self.signal_queue, self.universe_queues[index], self.stop_event, self.dry_run),
+            name=f"shard{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+        logging.info(f"🧩 启动扫描分片 {index + 1}/{self.workers} (pid={process.pid})")
+
+    def supervise(self):
+        """重启意外退出的 worker"""
+        for index, process in list(self.processes.items()):
+            if not process.is_alive() and not self.stop_event.is_set():
+                logging.error(f"扫描分片 {index} 退出 (exitcode={process.exitcode})，重新启动")
+                self.restarts += 1
+                self._spawn(index)
+
+    def run(self):
+        from main import RealTimeBuySurgeStrategyV3
+
+        trader = RealTimeBuySurgeStrategyV3(
+            dry_run=self.dry_run, role=ROLE_COORDINATOR, signal_queue=self.signal_queue,
+            universe_queues=self.universe_queues,
+        )
+        for index in range(self.workers):
+            self._spawn(index)
+        trader.start()
+        try:
+            while not self.stop_event.wait(5):
+                self.supervise()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_event.set()
+            trader.stop()
+            for process in self.processes.values():
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="分片扫描 + 单一执行进程")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--live", action="store_true", help="实盘模式 (默认模拟盘)")
+    args = parser.parse_args(argv)
+    from log_setup import setup_logging
+
+    setup_logging(Path(__file__).parent.parent / "logs")
+    ShardCoordinator(args.workers, dry_run=not args.live).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
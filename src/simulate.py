@@ -0,0 +1,241 @@
+"""
+加速模拟：虚拟时钟 + 合成行情，完整跑通信号 -> 等待回调 -> 建仓 -> 动态止盈/超时 的生命周期
+
+用法: python src/simulate.py --hours 160 [--symbols 20] [--seed 7] [--out report.json]
+数日的引擎行为在数十秒内完成 (默认种子下前 72 小时只有建仓，约 160 小时才出现弱势/止盈平仓)；基于录制行情的回放见 tape.py (同样使用虚拟时钟)。
+"""
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, UTC
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from binance_api import BinanceAPI, to_plain
+from clock import SimulatedClock
+
+HOUR_MS = 3600 * 1000
+MINUTE_MS = 60 * 1000
+HISTORY_HOURS = 49  # 起点之前预生成的历史，保证首次扫描有完整的 48h 窗口
+
+
+class SimulationUnsupported(Exception):
+    """模拟行情不支持的接口"""
+
+
+class SyntheticMarket:
+    """按分钟生成的随机游走行情，小时买量偶尔放大以产生信号"""
+
+    def __init__(
+        self,
+        start: datetime,
+        hours: int,
+        symbols: int = 20,
+        seed: int = 7,
+        minute_vol: float = 0.002,
+        surge_prob: float = 0.02,
+    ):
+        rng = np.random.default_rng(seed)
+        self.symbols = [f"SIM{i:02d}USDT" for i in range(symbols)]
+        self.t0 = int(start.timestamp() * 1000) - HISTORY_HOURS * HOUR_MS
+        n_hours = HISTORY_HOURS + hours + 2
+        n_minutes = n_hours * 60
+
+        base = rng.uniform(0.1, 10.0, size=(symbols, 1))
+        returns = rng.normal(0.0, minute_vol, size=(symbols, n_minutes))
+        self.close = base * np.exp(np.cumsum(returns, axis=1))
+        self.open = np.concatenate([base, self.close[:, :-1]], axis=1)
+        wick = np.abs(rng.normal(0.0, minute_vol / 2, size=(2, symbols, n_minutes)))
+        self.high = np.maximum(self.open, self.close) * (1 + wick[0])
+        self.low = np.minimum(self.open, self.close) * (1 - wick[1])
+
+        buy_hourly = 100.0 * rng.lognormal(0.0, 0.2, size=(symbols, n_hours))
+        surges = rng.random((symbols, n_hours)) < surge_prob
+        buy_hourly[surges] *= rng.uniform(2.2, 3.0, size=surges.sum())
+        self.buy_volume = np.repeat(buy_hourly / 60, 60, axis=1)
+        self.volume = self.buy_volume * 2
+        self._index = {s: i for i, s in enumerate(self.symbols)}
+
+    def _minute(self, ts_ms: int) -> int:
+        return min(int((ts_ms - self.t0) // MINUTE_MS), self.close.shape[1] - 1)
+
+    def price(self, symbol: str, ts_ms: int) -> float:
+        return float(self.close[self._index[symbol], self._minute(ts_ms)])
+
+    def klines(self, symbol: str, interval: str, now_ms: int, limit: int) -> List[List[Any]]:
+        """截至 now_ms 的最近 limit 根K线 (最后一根未收盘)，格式与交易所一致"""
+        i = self._index[symbol]
+        step = {"1m": 1, "1h": 60}[interval]
+        last_minute = self._minute(now_ms)
+        current = last_minute - last_minute % step
+        rows = []
+        for start in range(current - (limit - 1) * step, current + 1, step):
+            if start < 0:
+                continue
+            end = min(start + step, last_minute + 1)
+            open_time = self.t0 + start * MINUTE_MS
+            volume = float(self.volume[i, start:end].sum())
+            buy_volume = float(self.buy_volume[i, start:end].sum())
+            close = float(self.close[i, end - 1])
+            rows.append([
+                open_time,
+                str(self.open[i, start]),
+                str(self.high[i, start:end].max()),
+                str(self.low[i, start:end].min()),
+                str(close),
+                str(volume),
+                open_time + step * MINUTE_MS - 1,
+                str(volume * close),
+                int(volume),
+                str(buy_volume),
+                str(buy_volume * close),
+                "0",
+            ])
+        return rows
+
+
+class SimulatedBinanceAPI(BinanceAPI):
+    """按虚拟时钟从合成行情应答的 BinanceAPI (只支持模拟盘用到的接口)"""
+
+    def __init__(self, market: SyntheticMarket, clock: SimulatedClock):
+        super().__init__(api_key="simulate", api_secret="simulate", max_retries=0, weight_ledger="off", clock=clock)
+        self.market = market
+        self.clock = clock
+        self.served = 0
+
+    def _now_ms(self) -> int:
+        return int(self.clock.time() * 1000)
+
+    def _request(self, endpoint: str, weight: int = 1, idempotent: bool = True, parse=to_plain, **params) -> Any:
+        # 权重预算按真实时间计算，虚拟时间下不做限速
+        handler = getattr(self, f"_sim_{endpoint}", None)
+        if handler is None:
+            raise SimulationUnsupported(f"模拟行情不支持接口: {endpoint}")
+        self.served += 1
+        return handler(**params)
+
+    def _sim_exchange_information(self, **params):
+        filters = [
+            {"filter_type": "PRICE_FILTER", "tick_size": "0.0001"},
+            {"filter_type": "LOT_SIZE", "step_size": "0.001"},
+        ]
+        return {"symbols": [{"symbol": s, "status": "TRADING", "filters": filters} for s in self.market.symbols]}
+
+    def _sim_kline_candlestick_data(self, symbol, interval, limit=None, **params):
+        return self.market.klines(symbol, interval, self._now_ms(), limit or 500)
+
+    def _sim_symbol_price_ticker(self, symbol=None, **params):
+        now_ms = self._now_ms()
+        if symbol:
+            return {"symbol": symbol, "price": str(self.market.price(symbol, now_ms))}
+        return [{"symbol": s, "price": str(self.market.price(s, now_ms))} for s in self.market.symbols]
+
+    def _sim_ticker24hr_price_change_statistics(self, **params):
+        # 合成行情均视为流动性充足
+        return [{"symbol": s, "quote_volume": "1e9", "count": 10 ** 6} for s in self.market.symbols]
+
+    def _sim_top_trader_long_short_ratio_accounts(self, symbol, **params):
+        return [{"symbol": symbol, "long_short_ratio": "1.5"}]
+
+    def _sim_futures_account_balance_v2(self, **params):
+        return [{"asset": "USDT", "available_balance": "10000"}]
+
+
+def simulate(
+    hours: int = 160,
+    symbols: int = 20,
+    seed: int = 7,
+    tick_seconds: int = 60,
+    start: Optional[datetime] = None,
+    log_level: int = logging.INFO,
+) -> Dict[str, Any]:
+    """以虚拟时间运行模拟盘，返回决策与耗时报告"""
+    from main import RealTimeBuySurgeStrategyV3
+
+    # 模拟不配置文件日志 (不写入 logs/ 下的交易日志)，只调整终端输出级别
+    logging.getLogger().setLevel(log_level)
+
+    start = start or datetime(2026, 1, 1, tzinfo=UTC)
+    clock = SimulatedClock(start)
+    market = SyntheticMarket(start, hours, symbols=symbols, seed=seed)
+    api = SimulatedBinanceAPI(market, clock)
+    end_ts = (start + timedelta(hours=hours)).timestamp()
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="simulate_") as data_dir:
+        RealTimeBuySurgeStrategyV3._instance = None
+        trader = RealTimeBuySurgeStrategyV3(dry_run=True, api=api, data_dir=Path(data_dir), clock=clock)
+        ticks = 0
+        while clock.time() < end_ts:
+            tick_start = clock.time()
+            try:
+                trader.run_tick()
+            except Exception as e:
+                logging.error(f"模拟 tick 失败: {e}")
+            ticks += 1
+            # 与实盘循环一致：本轮结束后等待 tick_seconds (扫描耗时已计入虚拟时间)
+            clock.advance(max(0.0, tick_seconds - (clock.time() - tick_start)))
+        RealTimeBuySurgeStrategyV3._instance = None
+    wall = time.perf_counter() - started
+
+    return {
+        "start": start.isoformat(),
+        "hours": hours,
+        "symbols": symbols,
+        "seed": seed,
+        "ticks": ticks,
+        "wall_seconds": round(wall, 2),
+        "speedup": round(hours * 3600 / wall, 1) if wall > 0 else None,
+        "requests": api.served,
+        "decisions": {
+            "pending_signals": sorted(s.symbol for s in trader.pending_signals),
+            "positions": sorted(trader.positions.keys()),
+            "history": [
+                {
+                    "symbol": h["symbol"],
+                    "reason": h["reason"],
+                    "entry_time": h["entry_time"],
+                    "exit_time": h["exit_time"],
+                    "pnl_pct": round(h["pnl_pct"], 6),
+                }
+                for h in reversed(trader.history)
+            ],
+        },
+        "balance": round(trader.balance, 2),
+        "performance": {
+            "trades": trader.performance.total.trades,
+            "win_rate": round(trader.performance.total.win_rate, 4),
+            "cum_pnl": round(trader.performance.cum_pnl, 6),
+            "max_drawdown": round(trader.performance.max_drawdown, 6),
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="虚拟时钟加速模拟")
+    parser.add_argument("--hours", type=int, default=160)
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tick", type=int, default=60, help="每轮间隔 (虚拟秒)")
+    parser.add_argument("--out", type=Path)
+    parser.add_argument("--verbose", action="store_true", help="输出引擎 INFO 日志")
+    args = parser.parse_args(argv)
+
+    report = simulate(
+        hours=args.hours, symbols=args.symbols, seed=args.seed, tick_seconds=args.tick,
+        log_level=logging.INFO if args.verbose else logging.WARNING,
+    )
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
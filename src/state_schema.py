@@ -0,0 +1,117 @@
+"""
+状态文件的版本与迁移
+
+状态文件带 schema_version 字段；load_state 时按版本号依次执行迁移函数，
+新增迁移: 在 MIGRATIONS 中登记 {旧版本: 函数}，并把 STATE_VERSION 加一。
+"""
+import json
+import logging
+from datetime import datetime, timedelta, UTC
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时使用标准库 json
+    orjson = None
+
+from records import BJ_TZ
+
+STATE_VERSION = 1
+
+
+class StateLoadError(RuntimeError):
+    """状态文件存在但无法读取或迁移 (引擎拒绝启动，避免空状态覆盖真实持仓)"""
+
+
+# signal_time 为信号K线开盘时间: 信号在K线收盘后的下一个小时内创建，创建后最多等待 37h 建仓
+SIGNAL_CREATE_MAX_HOURS = 2
+SIGNAL_ENTRY_MAX_HOURS = SIGNAL_CREATE_MAX_HOURS + 37
+
+
+def _bj_signal_time(value: Any, anchor: Any = None, max_age_hours: float = SIGNAL_ENTRY_MAX_HOURS, symbol: str = "") -> Any:
+    """
+    signal_time 统一为带 +08:00 时区的 ISO 字符串
+
+    旧版状态文件中不带时区的 signal_time 可能是 UTC (早期代码) 或北京时间 (当前代码)，默认按北京时间解读。
+    anchor 为确定晚于信号K线的 UTC 时间 (信号的 created_at、持仓的 entry_time)，两者最多相差 max_age_hours：
+    只有北京时间解读不可能 (晚于 anchor 或早于 anchor 超过 max_age_hours) 而 UTC 解读可能时才按 UTC 处理。
+    两种解读都可能时无法区分，按北京时间处理并记录日志。
+    """
+    if not value:
+        return value
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        tz = BJ_TZ
+        if anchor:
+            anchor_dt = datetime.fromisoformat(anchor)
+            if anchor_dt.tzinfo is None:
+                anchor_dt = anchor_dt.replace(tzinfo=UTC)
+
+            def possible(reading: datetime) -> bool:
+                return timedelta(0) <= anchor_dt - reading <= timedelta(hours=max_age_hours)
+
+            as_bj, as_utc = possible(dt.replace(tzinfo=BJ_TZ)), possible(dt.replace(tzinfo=UTC))
+            if not as_bj and as_utc:
+                tz = UTC
+            elif as_bj and as_utc:
+                logging.warning(f"⚠️ {symbol} signal_time={value} 无法区分 UTC/北京时间 (anchor={anchor})，按北京时间迁移")
+            elif not as_bj:
+                logging.warning(f"⚠️ {symbol} signal_time={value} 与 anchor={anchor} 不一致，按北京时间迁移")
+        dt = dt.replace(tzinfo=tz)
+    return dt.astimezone(BJ_TZ).isoformat()
+
+
+def _v0_to_v1(data: Dict[str, Any]) -> Dict[str, Any]:
+    """signal_time 显式带时区 (取代 patch_time.py / revert_time.py)"""
+    for signal in data.get("pending_signals", []):
+        signal["signal_time"] = _bj_signal_time(
+            signal.get("signal_time"), signal.get("created_at"), SIGNAL_CREATE_MAX_HOURS, signal.get("symbol", ""),
+        )
+    for symbol, position in data.get("positions", {}).items():
+        if position.get("signal_time"):
+            position["signal_time"] = _bj_signal_time(
+                position["signal_time"], position.get("entry_time"), SIGNAL_ENTRY_MAX_HOURS, symbol,
+            )
+    return data
+
+
+MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    0: _v0_to_v1,
+}
+
+
+def migrate(data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[int]]:
+    """升级到当前版本，返回 (数据, 执行过迁移的起始版本列表)"""
+    version = int(data.get("schema_version", 0))
+    applied = []
+    if version > STATE_VERSION:
+        logging.warning(f"状态文件版本 {version} 高于当前代码支持的 {STATE_VERSION}，按原样加载")
+        return data, applied
+    while version < STATE_VERSION:
+        data = MIGRATIONS[version](data)
+        applied.append(version)
+        version += 1
+        data["schema_version"] = version
+    return data, applied
+
+
+def _default(obj: Any) -> Any:
+    # numpy 标量 / datetime 等
+    if hasattr(obj, "item"):
+        return obj.item()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"无法序列化 {type(obj).__name__}")
+
+
+def dumps(data: Dict[str, Any]) -> bytes:
+    """序列化状态 (安装了 orjson 时走快速路径，输出仍是标准 JSON)"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, indent=2, default=_default).encode("utf-8")
+
+
+def loads(raw: bytes) -> Dict[str, Any]:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
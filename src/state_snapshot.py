@@ -0,0 +1,276 @@
+"""
+引擎 -> 看板的共享内存状态快照
+
+固定布局的内存映射文件，写入端用顺序锁 (seqlock) 发布:
+序号加一 (奇数, 写入中) -> 写入数据 -> 序号再加一 (偶数, 完成)。
+读取端复制整块数据前后序号一致且为偶数时才采用，否则重试，不会读到半新半旧的数据。
+
+序号每次保存都会变化 (心跳)，持仓/信号/历史成交另有各自的版本号，只在该部分内容变化时加一。
+看板只读取头部 (header) 即可显示心跳/余额/数量并判断哪些区块需要重建。
+持仓/信号超过 MAX_POSITIONS / MAX_SIGNALS 时头部记录真实数量与截断标记，看板对该区块改用状态文件。
+"""
+import logging
+import math
+import mmap
+import struct
+import time
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence
+
+from records import Position, PendingSignal, parse_ts, BJ_TZ
+
+MAGIC = b"CNBS"
+LAYOUT_VERSION = 3
+MAX_POSITIONS = 64
+MAX_SIGNALS = 256
+
+# magic, 布局版本, 序号, 更新时间, 心跳, 余额, 模拟模式, 持仓数, 信号数 (真实数量), 截断标记, 持仓/信号/历史成交版本
+HEADER = struct.Struct("<4sIQdddIIIIQQQ")
+TRUNCATED_POSITIONS, TRUNCATED_SIGNALS = 1, 2
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+# 交易对, 开仓时间, 信号时间, 开仓价, 数量, 虚拟开仓价, 现价, 盈亏, 止盈档位, 目标平仓价, 12h/24h 峰值, 已补仓, 有本轮视图
+POSITION = struct.Struct("<16s11dII")
+# 交易对, 信号时间, 信号收盘价, 买量倍数, 目标价, 回调比例, 现价, 距离, 超时时间, 创建时间
+SIGNAL = struct.Struct("<16s9d")
+
+POSITIONS_OFFSET = HEADER.size
+SIGNALS_OFFSET = POSITIONS_OFFSET + POSITION.size * MAX_POSITIONS
+SNAPSHOT_SIZE = SIGNALS_OFFSET + SIGNAL.size * MAX_SIGNALS
+
+NAN = float("nan")
+
+
+def _num(value: Optional[float]) -> float:
+    return NAN if value is None else float(value)
+
+
+def _opt(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def _compact(data: Dict[str, Any]) -> Dict[str, Any]:
+    """与状态文件一致：取值为空的可选字段不输出"""
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def _iso(ts: float, tz=UTC) -> str:
+    """epoch 秒还原为 ISO 字符串 (与状态文件一致: signal_time 为北京时间，其余为 UTC)"""
+    if math.isnan(ts):
+        return ""
+    return datetime.fromtimestamp(ts, tz).isoformat()
+
+
+class SnapshotWriter:
+    """引擎端：每次保存状态时发布快照"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a+b") as f:
+            f.truncate(SNAPSHOT_SIZE)
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), SNAPSHOT_SIZE)
+        magic, layout = struct.unpack_from("<4sI", self._mm, 0)
+        if (magic, layout) == (MAGIC, LAYOUT_VERSION):
+            header = HEADER.unpack_from(self._mm, 0)
+            # 重启后版本号继续递增，看板按版本缓存的内容不会与旧数据混淆
+            self.seq, self.versions = header[2], list(header[10:])
+        else:
+            self.seq, self.versions = 0, [0, 0, 0]
+        self.seq += self.seq & 1  # 上次写入中途退出时序号为奇数
+        self._fingerprints: list = [None, None, None]
+        self._truncated = 0
+
+    def _bump(self, section: int, fingerprint):
+        if fingerprint != self._fingerprints[section]:
+            self._fingerprints[section] = fingerprint
+            self.versions[section] += 1
+
+    def publish(
+        self,
+        balance: float,
+        is_dry_run: bool,
+        positions: Iterable[Position],
+        signals: Iterable[PendingSignal],
+        views: Optional[Mapping[str, Any]] = None,
+        history: Sequence[Dict[str, Any]] = (),
+        now: Optional[float] = None,
+    ):
+        """now 为引擎时钟的时间 (与状态文件的 updated_at 一致)"""
+        views = views or {}
+        positions, signals = list(positions), list(signals)
+        counts = (len(positions), len(signals))
+        truncated = (TRUNCATED_POSITIONS if counts[0] > MAX_POSITIONS else 0) | (TRUNCATED_SIGNALS if counts[1] > MAX_SIGNALS else 0)
+        if truncated & ~self._truncated:
+            logging.warning(
+                f"⚠️ 持仓 {counts[0]} / 信号 {counts[1]} 超出共享快照容量 ({MAX_POSITIONS}/{MAX_SIGNALS})，看板改从状态文件读取超出的区块"
+            )
+        self._truncated = truncated
+        positions, signals = positions[:MAX_POSITIONS], signals[:MAX_SIGNALS]
+        mm = self._mm
+        now = time.time() if now is None else now
+
+        self.seq += 1
+        SEQ.pack_into(mm, SEQ_OFFSET, self.seq)
+        for i, pos in enumerate(positions):
+            view = views.get(pos.symbol)
+            POSITION.pack_into(
+                mm, POSITIONS_OFFSET + i * POSITION.size,
+                pos.symbol.encode()[:16], pos.entry_ts,
+                parse_ts(pos.signal_time) if pos.signal_time else NAN,
+                pos.entry_price, pos.quantity, pos.virtual_entry_price,
+                _num(view.price if view else pos.current_price),
+                _num(view.pnl_pct if view else None),
+                _num(view.take_profit_pct if view else None),
+                _num(view.target_exit_price if view else None),
+                pos.max_up_12h, pos.max_up_24h, int(pos.is_virtual_added), int(view is not None),
+            )
+        for i, sig in enumerate(signals):
+            SIGNAL.pack_into(
+                mm, SIGNALS_OFFSET + i * SIGNAL.size,
+                sig.symbol.encode()[:16], parse_ts(sig.signal_time), sig.signal_close,
+                sig.buy_surge_ratio, sig.target_entry_price, sig.drop_pct,
+                _num(sig.current_price), _num(sig.distance_pct), sig.timeout_ts, parse_ts(sig.created_at),
+            )
+        # 已打包的区块字节即内容指纹 (最多几十 KB)
+        # 截断时快照外的内容变化无法检测，每次都视为已变化
+        self._bump(0, None if truncated & TRUNCATED_POSITIONS else mm[POSITIONS_OFFSET:POSITIONS_OFFSET + len(positions) * POSITION.size])
+        self._bump(1, None if truncated & TRUNCATED_SIGNALS else mm[SIGNALS_OFFSET:SIGNALS_OFFSET + len(signals) * SIGNAL.size])
+        # 历史成交只在平仓时从头部插入
+        self._bump(2, (len(history), history[0].get("exit_time"), history[0].get("symbol")) if history else None)
+        HEADER.pack_into(
+            mm, 0, MAGIC, LAYOUT_VERSION, self.seq, now, now, balance,
+            int(is_dry_run), counts[0], counts[1], truncated, *self.versions,
+        )
+        self.seq += 1
+        SEQ.pack_into(mm, SEQ_OFFSET, self.seq)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class SnapshotReader:
+    """看板端：无锁读取一致的快照，文件不存在或布局不匹配时返回 None"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+
+    def _open(self) -> bool:
+        if self._mm is not None:
+            return True
+        if not self.path.exists() or self.path.stat().st_size < SNAPSHOT_SIZE:
+            return False
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), SNAPSHOT_SIZE, access=mmap.ACCESS_READ)
+        return True
+
+    def header(self, retries: int = 100) -> Optional[Dict[str, Any]]:
+        """只读取头部: 心跳/余额/数量与各区块版本号 (不复制持仓与信号区)"""
+        if not self._open():
+            return None
+        mm = self._mm
+        for _ in range(retries):
+            before = SEQ.unpack_from(mm, SEQ_OFFSET)[0]
+            if before & 1:
+                time.sleep(0.0005)
+                continue
+            header = HEADER.unpack_from(mm, 0)
+            if SEQ.unpack_from(mm, SEQ_OFFSET)[0] == before:
+                magic, layout, seq, updated_at, heartbeat, balance, dry_run, n_pos, n_sig, truncated, *versions = header
+                if magic != MAGIC or layout != LAYOUT_VERSION or seq == 0:
+                    return None
+                return {
+                    "seq": seq,
+                    "updated_at": _iso(updated_at),
+                    "last_heartbeat": _iso(heartbeat),
+                    "balance": balance,
+                    "is_dry_run": bool(dry_run),
+                    "positions_count": n_pos,
+                    "signals_count": n_sig,
+                    "positions_truncated": bool(truncated & TRUNCATED_POSITIONS),
+                    "signals_truncated": bool(truncated & TRUNCATED_SIGNALS),
+                    "versions": dict(zip(("positions", "signals", "history"), versions)),
+                }
+        return None
+
+    def read(self, retries: int = 100) -> Optional[Dict[str, Any]]:
+        if not self._open():
+            return None
+        mm = self._mm
+        for _ in range(retries):
+            before = SEQ.unpack_from(mm, SEQ_OFFSET)[0]
+            if before & 1:
+                time.sleep(0.0005)
+                continue
+            buf = mm[:SNAPSHOT_SIZE]
+            if SEQ.unpack_from(mm, SEQ_OFFSET)[0] == before:
+                return self._parse(buf)
+        return None
+
+    @staticmethod
+    def _parse(buf: bytes) -> Optional[Dict[str, Any]]:
+        magic, layout, seq, updated_at, heartbeat, balance, dry_run, n_pos, n_sig, truncated, *_ = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION or seq == 0:
+            return None
+
+        positions, market_positions = {}, {}
+        for i in range(min(n_pos, MAX_POSITIONS)):
+            (symbol, entry_ts, signal_ts, entry_price, quantity, virtual_entry, price, pnl_pct,
+             tp_pct, target_exit, max_up_12h, max_up_24h, added, has_view) = POSITION.unpack_from(
+                buf, POSITIONS_OFFSET + i * POSITION.size)
+            symbol = symbol.rstrip(b"\0").decode()
+            positions[symbol] = _compact({
+                "symbol": symbol,
+                "entry_time": _iso(entry_ts),
+                "signal_time": _iso(signal_ts, BJ_TZ) or None,
+                "entry_price": entry_price,
+                "quantity": quantity,
+                "virtual_entry_price": virtual_entry,
+                "is_virtual_added": bool(added),
+                "max_up_12h": max_up_12h,
+                "max_up_24h": max_up_24h,
+                "current_price": _opt(price),
+            })
+            if has_view:
+                market_positions[symbol] = {
+                    "price": price,
+                    "pnl_pct": pnl_pct,
+                    "take_profit_pct": tp_pct,
+                    "target_exit_price": target_exit,
+                    "dist_to_exit": (target_exit - price) / price if price > 0 else 0.0,
+                }
+
+        signals = []
+        for i in range(min(n_sig, MAX_SIGNALS)):
+            (symbol, signal_ts, signal_close, ratio, target, drop_pct, price, distance,
+             timeout_ts, created_ts) = SIGNAL.unpack_from(buf, SIGNALS_OFFSET + i * SIGNAL.size)
+            signals.append(_compact({
+                "symbol": symbol.rstrip(b"\0").decode(),
+                "signal_time": _iso(signal_ts, BJ_TZ),
+                "signal_close": signal_close,
+                "buy_surge_ratio": ratio,
+                "target_entry_price": target,
+                "drop_pct": drop_pct,
+                "current_price": _opt(price),
+                "distance_pct": _opt(distance),
+                "timeout_time": _iso(timeout_ts),
+                "created_at": _iso(created_ts),
+            }))
+
+        return {
+            "seq": seq,
+            "updated_at": _iso(updated_at),
+            "last_heartbeat": _iso(heartbeat),
+            "balance": balance,
+            "is_dry_run": bool(dry_run),
+            "positions": positions,
+            "pending_signals": signals,
+            "market_positions": market_positions,
+            "positions_truncated": bool(truncated & TRUNCATED_POSITIONS),
+            "signals_truncated": bool(truncated & TRUNCATED_SIGNALS),
+        }
@@ -0,0 +1,86 @@
+"""
+策略插件接口
+
+引擎 (main.RealTimeBuySurgeStrategyV3) 是共享的核心：交易对列表、1h K线窗口缓存、权重调度、
+本轮价格上下文、待建仓队列 (目标价/超时) 以及开平仓与持仓风控。插件只负责产生信号，
+同一进程内可以挂多个插件，每个交易对的K线和价格只请求一次。
+
+回调顺序:
+- 每小时扫描: on_scan_start() -> 每个交易对 on_candle_close(symbol, window) -> on_scan_end(candidates)
+- 每轮 tick: on_price(ctx)，ctx 中包含 watch_symbols() 声明的交易对价格
+- 开仓/平仓成交后: on_fill(fill)，只回调产生该持仓的插件
+"""
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from market_context import MarketContext
+from records import PendingSignal, Position
+
+if TYPE_CHECKING:
+    from main import RealTimeBuySurgeStrategyV3
+
+
+@dataclass(slots=True)
+class Candidate:
+    """扫描中产生、待 on_scan_end 确认的候选"""
+    strategy: str
+    symbol: str
+    signal_time: pd.Timestamp
+    signal_close: float
+    score: float
+    trace: Dict[str, Any] = field(default_factory=dict)
+
+    def to_list(self) -> List[Any]:
+        """扫描检查点中的格式"""
+        return [self.symbol, self.signal_time.isoformat(), self.signal_close, self.score, self.trace, self.strategy]
+
+    @classmethod
+    def from_list(cls, row: List[Any], default_strategy: str) -> "Candidate":
+        # 旧检查点没有策略名
+        symbol, signal_time, signal_close, score, trace = row[:5]
+        strategy = row[5] if len(row) > 5 else default_strategy
+        return cls(strategy, symbol, pd.Timestamp(signal_time), signal_close, score, trace)
+
+
+@dataclass(slots=True)
+class Fill:
+    """开仓或平仓成交"""
+    side: str                # "open" / "close"
+    symbol: str
+    price: float
+    quantity: float
+    position: Position
+    reason: Optional[str] = None
+    pnl_pct: Optional[float] = None
+
+
+class StrategyPlugin:
+    """策略插件基类 (未覆盖的回调为空操作)"""
+
+    name = "base"
+
+    def __init__(self, engine: "RealTimeBuySurgeStrategyV3"):
+        self.engine = engine
+
+    def watch_symbols(self) -> Iterable[str]:
+        """每轮需要价格的额外交易对 (并入引擎的批量价格请求)"""
+        return ()
+
+    def on_scan_start(self):
+        pass
+
+    def on_candle_close(self, symbol: str, window: pd.DataFrame) -> Optional[Candidate]:
+        """每小时扫描中对每个交易对调用一次，window 为最近 48 根 1h K线 (最后一根未收盘)，所有插件共用"""
+        return None
+
+    def on_scan_end(self, candidates: List[Candidate]) -> List[PendingSignal]:
+        """确认本插件的候选，返回待建仓信号 (引擎统一管理目标价触发与超时)"""
+        return []
+
+    def on_price(self, ctx: MarketContext):
+        pass
+
+    def on_fill(self, fill: Fill):
+        pass
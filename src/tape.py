@@ -0,0 +1,277 @@
+"""
+交易所请求录制与回放
+
+录制: 设置环境变量 API_TAPE_RECORD=data/tapes/2026-01-01.jsonl.gz 启动引擎，
+      BinanceAPI 的每次 REST 请求与响应都会追加写入压缩磁带。
+回放: python src/tape.py replay <tape> [--speed 1] [--out report.json]
+      speed=1 按原始节奏回放，speed=0 尽可能快。
+对比: python src/tape.py compare report_a.json report_b.json
+"""
+import argparse
+import gzip
+import json
+import logging
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from binance_common import errors as sdk_errors
+
+from binance_api import BinanceAPI, to_plain
+from clock import SimulatedClock
+
+# 不参与请求匹配的参数 (每次随机生成)
+VOLATILE_PARAMS = {"new_client_order_id"}
+
+
+def request_key(endpoint: str, params: Dict[str, Any]) -> str:
+    stable = {k: v for k, v in params.items() if k not in VOLATILE_PARAMS and v is not None}
+    return endpoint + "|" + json.dumps(stable, sort_keys=True, default=str)
+
+
+def read_tape(path: Path) -> Iterator[Dict[str, Any]]:
+    """逐条读取磁带 (兼容多次追加产生的多段 gzip，忽略崩溃时写了一半的尾行)"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except (EOFError, OSError):
+            return
+
+
+class TapeRecorder:
+    """追加写入的压缩请求磁带"""
+
+    def __init__(self, path: Path, flush_every: int = 50):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self._fh = gzip.open(self.path, "at", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.count = 0
+
+    def record(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        started_at: float,
+        elapsed_ms: float,
+        data: Any = None,
+        error: Optional[Exception] = None,
+    ):
+        entry = {
+            "t": round(started_at, 6),
+            "endpoint": endpoint,
+            "params": {k: v for k, v in params.items() if v is not None},
+            "elapsed_ms": round(elapsed_ms, 3),
+        }
+        if error is not None:
+            entry["error"] = {"type": type(error).__name__, "message": str(error),
+                              "retry_after": getattr(error, "retry_after", None)}
+        else:
+            entry["data"] = to_plain(data)
+        line = json.dumps(entry, default=str, ensure_ascii=False)
+        with self._lock:
+            self._fh.write(line + "\n")
+            self.count += 1
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                # 同步刷新，崩溃时已写入部分仍可读取
+                self._fh.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+
+class TapeMiss(KeyError):
+    """回放时磁带中没有对应的请求"""
+
+
+class ReplayBinanceAPI(BinanceAPI):
+    """从磁带回放响应的 BinanceAPI，不访问网络"""
+
+    def __init__(self, tape_path: Path, speed: float = 0.0, clock: Optional[SimulatedClock] = None):
+        # 回放不占用同机的真实权重额度
+        super().__init__(api_key="replay", api_secret="replay", max_retries=0, weight_ledger="off", clock=clock)
+        self.speed = speed
+        self.clock = clock  # 每次应答时推进到录制时间，策略看到的是录制当时的时间
+        self.entries: List[Dict[str, Any]] = list(read_tape(Path(tape_path)))
+        self._by_key: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._by_symbol: Dict[Tuple[str, Any], Deque[Dict[str, Any]]] = defaultdict(deque)
+        for entry in self.entries:
+            self._by_key[request_key(entry["endpoint"], entry["params"])].append(entry)
+            self._by_symbol[(entry["endpoint"], entry["params"].get("symbol"))].append(entry)
+        self.served = 0
+        self.misses = 0
+        self.tape_start = self.entries[0]["t"] if self.entries else 0.0
+        self.tape_time = self.tape_start
+        self._replay_start = time.monotonic()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.served >= len(self.entries)
+
+    @staticmethod
+    def _pop_unserved(queue: Optional[Deque[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        while queue:
+            entry = queue.popleft()
+            if not entry.get("_served"):
+                entry["_served"] = True
+                return entry
+        return None
+
+    def _take(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """精确匹配优先，其次同接口同交易对的下一条记录"""
+        entry = self._pop_unserved(self._by_key.get(request_key(endpoint, params)))
+        if entry is None:
+            entry = self._pop_unserved(self._by_symbol.get((endpoint, params.get("symbol"))))
+        if entry is None:
+            self.misses += 1
+            raise TapeMiss(f"磁带中没有请求: {endpoint} {params}")
+        return entry
+
+    def _request(self, endpoint: str, weight: int = 1, idempotent: bool = True, parse=to_plain, **params) -> Any:
+        # 回放不访问交易所，权重预算按真实时间计算，加速回放时会误触发限速，因此不做限速
+        entry = self._take(endpoint, params)
+        self.served += 1
+        self.tape_time = entry["t"]
+        if self.clock is not None:
+            self.clock.advance_to(entry["t"])
+        if self.speed > 0:
+            due = self._replay_start + (entry["t"] - self.tape_start) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            time.sleep(entry.get("elapsed_ms", 0) / 1000 / self.speed)
+        started = time.perf_counter() - entry.get("elapsed_ms", 0) / 1000
+        error = entry.get("error")
+        if error:
+            self._observe_latency(endpoint, started, ok=False)
+            error_cls = getattr(sdk_errors, error["type"], None)
+            if error_cls is not None and issubclass(error_cls, sdk_errors.Error):
+                raise error_cls(error_message=error["message"])
+            raise Exception(error["message"])
+        self._observe_latency(endpoint, started, ok=True)
+        return entry["data"]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def replay(tape_path: Path, speed: float = 0.0, max_ticks: int = 100000) -> Dict[str, Any]:
+    """用当前代码回放磁带，返回决策与耗时报告"""
+    from main import RealTimeBuySurgeStrategyV3
+
+    api = ReplayBinanceAPI(tape_path, speed=speed)
+    api.clock = api.governor.clock = clock = SimulatedClock(datetime.fromtimestamp(api.tape_start or time.time(), UTC))
+    with tempfile.TemporaryDirectory(prefix="replay_") as data_dir:
+        RealTimeBuySurgeStrategyV3._instance = None
+        trader = RealTimeBuySurgeStrategyV3(dry_run=True, api=api, data_dir=Path(data_dir), clock=clock)
+        tick_ms = []
+        ticks = 0
+        while not api.exhausted and ticks < max_ticks:
+            served_before = api.served
+            started = time.perf_counter()
+            try:
+                trader.run_tick()
+            except Exception as e:
+                logging.error(f"回放 tick 失败: {e}")
+            tick_ms.append((time.perf_counter() - started) * 1000)
+            ticks += 1
+            clock.advance(60)  # 与实盘循环的 60 秒间隔一致
+            if api.served == served_before:
+                # 当前代码不再请求磁带中剩余的内容
+                break
+        RealTimeBuySurgeStrategyV3._instance = None
+
+    return {
+        "tape": str(tape_path),
+        "entries": len(api.entries),
+        "served": api.served,
+        "misses": api.misses,
+        "decisions": {
+            "pending_signals": sorted(
+                [{"symbol": s.symbol, "target_entry_price": s.target_entry_price} for s in trader.pending_signals],
+                key=lambda d: d["symbol"],
+            ),
+            "positions": sorted(trader.positions.keys()),
+            "history": [
+                {"symbol": h["symbol"], "reason": h["reason"], "exit_price": h["exit_price"]}
+                for h in reversed(trader.history)
+            ],
+        },
+        "timing": {
+            "ticks": ticks,
+            "tick_p50_ms": _percentile(tick_ms, 0.50),
+            "tick_p95_ms": _percentile(tick_ms, 0.95),
+            "api": api.get_latency_stats(),
+        },
+    }
+
+
+def compare(report_a: Dict[str, Any], report_b: Dict[str, Any]) -> bool:
+    """对比两次回放的决策与耗时，决策一致时返回 True"""
+    same = report_a["decisions"] == report_b["decisions"]
+    print(f"决策一致: {'✅' if same else '❌'}")
+    if not same:
+        for key in report_a["decisions"]:
+            if report_a["decisions"][key] != report_b["decisions"].get(key):
+                print(f"  - {key}:\n    A={report_a['decisions'][key]}\n    B={report_b['decisions'].get(key)}")
+    for key in ("tick_p50_ms", "tick_p95_ms"):
+        a, b = report_a["timing"][key], report_b["timing"][key]
+        print(f"{key}: {a:.1f} -> {b:.1f} ({(b - a) / a * 100 if a else 0:+.1f}%)")
+    return same
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="交易所请求磁带工具")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_info = sub.add_parser("info", help="磁带摘要")
+    p_info.add_argument("tape", type=Path)
+    p_replay = sub.add_parser("replay", help="用当前代码回放磁带")
+    p_replay.add_argument("tape", type=Path)
+    p_replay.add_argument("--speed", type=float, default=0.0, help="1=原始节奏, 0=尽可能快")
+    p_replay.add_argument("--out", type=Path)
+    p_compare = sub.add_parser("compare", help="对比两份回放报告")
+    p_compare.add_argument("a", type=Path)
+    p_compare.add_argument("b", type=Path)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "info":
+        counts: Dict[str, int] = defaultdict(int)
+        first = last = None
+        for entry in read_tape(args.tape):
+            counts[entry["endpoint"]] += 1
+            first = first if first is not None else entry["t"]
+            last = entry["t"]
+        span = (last - first) / 3600 if first is not None else 0
+        print(json.dumps({"span_hours": round(span, 2), "requests": dict(counts)}, indent=2))
+    elif args.cmd == "replay":
+        report = replay(args.tape, speed=args.speed)
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if args.out:
+            args.out.write_text(text)
+        print(text)
+    elif args.cmd == "compare":
+        same = compare(json.loads(args.a.read_text()), json.loads(args.b.read_text()))
+        return 0 if same else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
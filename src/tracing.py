@@ -0,0 +1,46 @@
+import time
+import uuid
+from typing import Dict, Optional
+
+# 单调时钟锚点：进程内打点使用 monotonic，换算成 epoch 秒后可随状态持久化
+_ANCHOR_WALL = time.time()
+_ANCHOR_MONO = time.monotonic()
+
+# 关注的执行阶段: 名称 -> (起点, 终点)
+SPANS = {
+    "candle_to_signal": ("candle_close", "signal_recorded"),
+    "trigger_to_open": ("trigger_detected", "open_called"),
+    "open_to_order": ("open_called", "order_sent"),
+    "order_rtt": ("order_sent", "order_ack"),
+    "exit_to_close": ("exit_triggered", "close_ack"),
+    "close_rtt": ("close_sent", "close_ack"),
+}
+
+
+def trace_now() -> float:
+    """单调递增的 epoch 秒 (不受系统校时影响)"""
+    return _ANCHOR_WALL + (time.monotonic() - _ANCHOR_MONO)
+
+
+def new_trace() -> Dict:
+    """创建追踪记录，随信号/持仓/历史一起保存"""
+    return {"id": uuid.uuid4().hex[:12], "marks": {}}
+
+
+def mark(trace: Optional[Dict], name: str, ts: Optional[float] = None):
+    """记录某个阶段的时间点 (同名只保留第一次)"""
+    if trace is None:
+        return
+    trace["marks"].setdefault(name, round(trace_now() if ts is None else ts, 6))
+
+
+def spans(trace: Optional[Dict]) -> Dict[str, float]:
+    """计算各阶段耗时 (毫秒)，缺少端点的阶段跳过"""
+    if not trace:
+        return {}
+    marks = trace.get("marks", {})
+    result = {}
+    for name, (start, end) in SPANS.items():
+        if start in marks and end in marks:
+            result[name] = round((marks[end] - marks[start]) * 1000, 1)
+    return result
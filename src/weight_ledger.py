@@ -0,0 +1,210 @@
+"""
+同一主机上多个进程共享的 API 权重账本
+
+交易所按 IP 限制每分钟权重，同机运行的多个机器人 / 分片 worker 必须共用一份额度。
+账本是一个固定布局的内存映射文件，所有读写在 fcntl 文件锁内完成:
+- 全局计数: 当前分钟、已用权重 (含响应头校准的服务端数值)、熔断截止时间
+- 进程表: 每个进程本分钟的用量与最近活跃时间，用于公平分配
+
+分配规则 (由 WeightGovernor 调用):
+- 各优先级只能使用全局额度的一部分，差额为下单/平仓预留 (对所有进程生效)
+- 全局用量超过 contention_ratio 时视为争用，非最高优先级的进程不能超过 额度/活跃进程数
+- 任一进程遇到 429/418 时写入熔断时间，所有进程同时暂停
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows 无 fcntl，退回进程内计数
+    fcntl = None
+
+MAGIC = b"CNWL"
+LAYOUT_VERSION = 1
+MAX_SLOTS = 64
+ACTIVE_SECONDS = 120.0  # 超过该时间未请求的进程不计入公平份额
+
+# magic, 布局版本, 分钟, 已用权重, 熔断截止, 熔断次数
+HEADER = struct.Struct("<4sIqqdI")
+# pid, 本分钟用量, 最近活跃时间
+SLOT = struct.Struct("<qqd")
+SLOTS_OFFSET = 64
+LEDGER_SIZE = SLOTS_OFFSET + SLOT.size * MAX_SLOTS
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WeightLedger:
+    """mmap + 文件锁实现的跨进程权重计数"""
+
+    def __init__(self, path: Path, contention_ratio: float = 0.5):
+        if fcntl is None:
+            raise RuntimeError("当前平台不支持 fcntl 文件锁")
+        self.path = Path(path)
+        self.contention_ratio = contention_ratio
+        self.pid = os.getpid()
+        self._thread_lock = threading.Lock()  # flock 不区分同一进程内的线程
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        self._file = os.fdopen(fd, "r+b")
+        with self._locked():
+            if os.fstat(fd).st_size < LEDGER_SIZE:
+                os.ftruncate(fd, LEDGER_SIZE)
+        self._mm = mmap.mmap(fd, LEDGER_SIZE)
+        with self._locked():
+            magic, layout = struct.unpack_from("<4sI", self._mm, 0)
+            if (magic, layout) != (MAGIC, LAYOUT_VERSION):
+                self._mm[:LEDGER_SIZE] = b"\0" * LEDGER_SIZE
+                HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, 0, 0, 0.0, 0)
+            self._slot = self._claim_slot(time.time())
+
+    # ---- 锁与布局 ----
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._thread_lock:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _header(self) -> Tuple[int, int, float, int]:
+        _, _, minute, used, open_until, trips = HEADER.unpack_from(self._mm, 0)
+        return minute, used, open_until, trips
+
+    def _write_header(self, minute: int, used: int, open_until: float, trips: int):
+        HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, minute, used, open_until, trips)
+
+    def _read_slot(self, i: int) -> Tuple[int, int, float]:
+        return SLOT.unpack_from(self._mm, SLOTS_OFFSET + i * SLOT.size)
+
+    def _write_slot(self, i: int, pid: int, used: int, seen: float):
+        SLOT.pack_into(self._mm, SLOTS_OFFSET + i * SLOT.size, pid, used, seen)
+
+    def _claim_slot(self, now: float) -> int:
+        """登记本进程 (复用已退出进程的槽位)"""
+        free = None
+        for i in range(MAX_SLOTS):
+            pid, _, _ = self._read_slot(i)
+            if pid == self.pid:
+                return i
+            if free is None and (pid == 0 or not _pid_alive(pid)):
+                free = i
+        if free is None:
+            # 进程表已满：复用最久未活跃的槽位
+            free = min(range(MAX_SLOTS), key=lambda i: self._read_slot(i)[2])
+        self._write_slot(free, self.pid, 0, now)
+        return free
+
+    def _roll(self, now: float) -> Tuple[int, float, int]:
+        """进入新的一分钟时清零全局与各进程用量"""
+        minute, used, open_until, trips = self._header()
+        current = int(now // 60)
+        if current != minute:
+            used = 0
+            self._write_header(current, 0, open_until, trips)
+            for i in range(MAX_SLOTS):
+                pid, _, seen = self._read_slot(i)
+                if pid:
+                    self._write_slot(i, pid, 0, seen)
+        return used, open_until, trips
+
+    def _own_slot(self, now: float) -> int:
+        pid, _, _ = self._read_slot(self._slot)
+        if pid != self.pid:
+            self._slot = self._claim_slot(now)
+        return self._slot
+
+    def _active_processes(self, now: float) -> int:
+        count = 0
+        for i in range(MAX_SLOTS):
+            pid, _, seen = self._read_slot(i)
+            if pid and now - seen < ACTIVE_SECONDS:
+                count += 1
+        return max(count, 1)
+
+    # ---- 供 WeightGovernor 调用 ----
+    def try_acquire(self, weight: int, limit: float, max_weight: int, fair: bool) -> Tuple[bool, float, str]:
+        """
+        尝试占用权重，返回 (是否成功, 建议等待秒数, 原因)
+        fair 为 True 时在争用状态下受每进程公平份额约束
+        """
+        with self._locked():
+            now = time.time()
+            used, open_until, _ = self._roll(now)
+            slot = self._own_slot(now)
+            pid, own, _ = self._read_slot(slot)
+            if now < open_until:
+                return False, open_until - now, "circuit"
+            if used + weight > limit:
+                self._write_slot(slot, pid, own, now)
+                return False, 60 - now % 60, "budget"
+            if fair and used >= max_weight * self.contention_ratio:
+                share = limit / self._active_processes(now)
+                if own + weight > share:
+                    self._write_slot(slot, pid, own, now)
+                    return False, 60 - now % 60, "fair_share"
+            minute, _, _, trips = self._header()
+            self._write_header(minute, used + weight, open_until, trips)
+            self._write_slot(slot, pid, own + weight, now)
+            return True, 0.0, ""
+
+    def observe_used(self, server_used: int):
+        """用响应头中的服务端已用权重校准 (只升不降)"""
+        with self._locked():
+            now = time.time()
+            used, open_until, trips = self._roll(now)
+            if server_used > used:
+                self._write_header(int(now // 60), server_used, open_until, trips)
+
+    def trip(self, until: float) -> bool:
+        """写入熔断截止时间，返回是否延长了熔断"""
+        with self._locked():
+            minute, used, open_until, trips = self._header()
+            if until <= open_until:
+                return False
+            self._write_header(minute, used, until, trips + 1)
+            return True
+
+    def state(self) -> Dict[str, Any]:
+        with self._locked():
+            now = time.time()
+            used, open_until, trips = self._roll(now)
+            _, own, _ = self._read_slot(self._own_slot(now))
+            return {
+                "used": used,
+                "own_used": own,
+                "open_until": open_until,
+                "trips": trips,
+                "processes": self._active_processes(now),
+            }
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def open_ledger(path: Optional[str]) -> Optional[WeightLedger]:
+    """按配置打开账本，"off"/空值或平台不支持时返回 None (退回进程内计数)"""
+    if not path or path.lower() in ("off", "false", "0", "none"):
+        return None
+    try:
+        return WeightLedger(Path(path))
+    except Exception as e:
+        logging.warning(f"打开共享权重账本失败，改用进程内计数: {e}")
+        return None
@@ -0,0 +1,32 @@
+import os
+import sys
+from datetime import datetime, UTC
+from pathlib import Path
+
+import pytest
+
+# 源码为 src/ 下的平铺模块
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("BINANCE_API_KEY", "test")
+os.environ.setdefault("BINANCE_API_SECRET", "test")
+
+START = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    """在虚拟时钟 + 合成行情上构造引擎 (每次调用都是新的单例实例，data_dir 相同)"""
+    import main
+    import simulate
+
+    def factory(hours: int = 24, symbols: int = 5, seed: int = 1, dry_run: bool = True, data_dir: Path = tmp_path):
+        clock = simulate.SimulatedClock(START)
+        market = simulate.SyntheticMarket(START, hours, symbols=symbols, seed=seed)
+        api = simulate.SimulatedBinanceAPI(market, clock)
+        main.RealTimeBuySurgeStrategyV3._instance = None
+        return main.RealTimeBuySurgeStrategyV3(dry_run=dry_run, api=api, data_dir=data_dir, clock=clock)
+
+    yield factory
+    main_module = sys.modules.get("main")
+    if main_module:
+        main_module.RealTimeBuySurgeStrategyV3._instance = None
@@ -0,0 +1,96 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from conftest import START
+from features import COL_BUY_VOLUME, COL_QUOTE_VOLUME, HOUR_MS, SymbolFeatures
+
+START_MS = int(START.timestamp() * 1000)
+
+
+def random_rows(rng, hours=240, gap_rate=0.08):
+    """带随机缺口的 1h K线 (列顺序与 kline2df / market_cache 一致)"""
+    rows, price = [], rng.uniform(0.1, 100)
+    for h in range(hours):
+        if rng.random() < gap_rate:
+            continue
+        open_ = price
+        price *= 1 + rng.uniform(-0.05, 0.05)
+        high = max(open_, price) * (1 + rng.uniform(0, 0.03))
+        low = min(open_, price) * (1 - rng.uniform(0, 0.03))
+        volume = rng.uniform(10, 1000)
+        buy_volume = volume * rng.uniform(0.2, 0.8)
+        row = [START_MS + h * HOUR_MS, open_, high, low, price, volume, 0, volume * price, 0, buy_volume, 0, 0]
+        rows.append(row)
+    return np.array(rows, dtype=float)
+
+
+def frame(rows):
+    df = pd.DataFrame({
+        "open": rows[:, 1], "high": rows[:, 2], "low": rows[:, 3], "close": rows[:, 4], "volume": rows[:, 5],
+        "quote_volume": rows[:, COL_QUOTE_VOLUME], "buy_volume": rows[:, COL_BUY_VOLUME],
+    }, index=pd.to_datetime(rows[:, 0].astype("int64"), unit="ms", utc=True))
+    return df
+
+
+def expected_bars(df, rule, hours):
+    agg = df.resample(rule, origin="epoch").agg({
+        "open": "first", "high": "max", "low": "min", "close": "last",
+        "volume": "sum", "quote_volume": "sum", "buy_volume": "sum",
+    })
+    # 只有由完整的连续 1h K线合成的周期才输出
+    agg = agg[df["open"].resample(rule, origin="epoch").count() == hours]
+    return [
+        [int(ts.timestamp() * 1000), r.open, r.high, r.low, r.close, r.volume, r.quote_volume, r.buy_volume]
+        for ts, r in agg.iterrows()
+    ]
+
+
+def test_rolling_features_match_pandas():
+    rng = random.Random(32)
+    for _ in range(20):
+        rows = random_rows(rng)
+        df = frame(rows)
+        rolling = df.rolling("24h")
+        buy_mean = rolling["buy_volume"].mean()
+        max_high = rolling["high"].max()
+        vwap = rolling["quote_volume"].sum() / rolling["volume"].sum()
+
+        features = SymbolFeatures(window_hours=24)
+        for i, row in enumerate(rows):
+            features.on_candle_close(row)
+            assert np.isclose(features.buy_volume_mean(), buy_mean.iloc[i], rtol=1e-9)
+            assert features.max_high() == max_high.iloc[i]
+            assert np.isclose(features.vwap(), vwap.iloc[i], rtol=1e-9)
+
+
+def test_resampled_bars_match_pandas():
+    rng = random.Random(33)
+    for _ in range(20):
+        rows = random_rows(rng, hours=rng.randint(24, 400), gap_rate=rng.choice([0.0, 0.02, 0.1]))
+        df = frame(rows)
+        features = SymbolFeatures(window_hours=24, max_bars=1000)
+        for row in rows:
+            features.on_candle_close(row)
+        for timeframe, rule, hours in (("4h", "4h", 4), ("1d", "1D", 24)):
+            bars = [
+                [b.open_time, b.open, b.high, b.low, b.close, b.volume, b.quote_volume, b.buy_volume]
+                for b in features.bars(timeframe)
+            ]
+            expected = expected_bars(df, rule, hours)
+            assert len(bars) == len(expected)
+            assert np.allclose(np.array(bars).reshape(-1, 8), np.array(expected).reshape(-1, 8), rtol=1e-9)
+
+
+def test_bar_closed_by_gap_is_dropped():
+    # 第 3 小时缺失：0~3 点的 4h K线不完整，不能当作完整K线输出
+    rows = np.array([
+        [START_MS + h * HOUR_MS, 1, 1, 1, 1, 10, 0, 10, 0, 5, 0, 0] for h in (0, 1, 2, 4, 5, 6, 7)
+    ], dtype=float)
+    features = SymbolFeatures()
+    for row in rows:
+        features.on_candle_close(row)
+    bars = features.bars("4h")
+    assert [b.open_time for b in bars] == [START_MS + 4 * HOUR_MS]
+    assert bars[0].volume == 40
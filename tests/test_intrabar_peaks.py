@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from conftest import START
+from market_context import HOUR_MS, MINUTE_MS, fold_candle_highs
+from records import Position
+
+ENTRY = START + timedelta(seconds=40)  # 00:00:40 成交
+ENTRY_MS = int(ENTRY.timestamp() * 1000)
+FIRST_MINUTE = int(START.timestamp() * 1000)
+
+
+def _position():
+    return Position(
+        symbol="AAAUSDT", entry_time=ENTRY.isoformat(),
+        entry_price=1.0, quantity=10.0, virtual_entry_price=1.0,
+    )
+
+
+def _candle(open_ms, high):
+    return [open_ms, "1.0", str(high), "0.99", "1.0"]
+
+
+def test_spike_before_fill_is_not_a_peak():
+    pos = _position()
+    fold_candle_highs(pos, [_candle(FIRST_MINUTE, 1.04), _candle(FIRST_MINUTE + MINUTE_MS, 1.01)])
+    assert round(pos.max_up_12h, 6) == round(pos.max_up_24h, 6) == 0.01
+    assert pos.peak_until_ms == FIRST_MINUTE + MINUTE_MS
+
+
+def test_partial_candle_is_folded_again_when_complete():
+    pos = _position()
+    minute = FIRST_MINUTE + MINUTE_MS
+    fold_candle_highs(pos, [_candle(minute, 1.01)])
+    # 下一轮从 peak_until_ms 重新拉取，同一根K线收盘时的最高价覆盖之前的部分值
+    fold_candle_highs(pos, [_candle(minute, 1.03), _candle(minute + MINUTE_MS, 1.02)])
+    assert round(pos.max_up_12h, 6) == 0.03
+    assert pos.peak_until_ms == minute + MINUTE_MS
+
+
+def test_12h_and_24h_windows():
+    pos = _position()
+    last_12h = ENTRY_MS + 12 * HOUR_MS - (ENTRY_MS + 12 * HOUR_MS) % MINUTE_MS  # 开盘早于 entry+12h 的最后一根
+    last_24h = last_12h + 12 * HOUR_MS
+    fold_candle_highs(pos, [
+        _candle(last_12h, 1.02),
+        _candle(last_12h + MINUTE_MS, 1.04),
+        _candle(last_24h, 1.06),
+        _candle(last_24h + MINUTE_MS, 1.5),
+    ])
+    assert round(pos.max_up_12h, 6) == 0.02
+    assert round(pos.max_up_24h, 6) == 0.06
+    assert pos.peak_until_ms == last_24h + MINUTE_MS
+
+
+def test_update_intrabar_peaks_skips_entry_minute_and_current_minute(make_engine):
+    engine = make_engine()
+    engine.clock.advance(40)
+    pos = engine.positions["AAAUSDT"] = _position()
+    requests = []
+
+    def klines(symbol, interval, starttime=None, endtime=None, limit=None):
+        requests.append((starttime, limit))
+        return [_candle(t, 1.04 if t == FIRST_MINUTE else 1.01) for t in range(starttime, starttime + limit * MINUTE_MS, MINUTE_MS)]
+
+    engine.api.kline_candlestick_data = klines
+    # 开仓所在分钟内：还没有开仓后的K线，不请求
+    engine.update_intrabar_peaks(pos)
+    assert requests == [] and pos.peak_until_ms is None
+
+    engine.clock.advance(60)
+    engine.update_intrabar_peaks(pos)
+    assert requests == [(FIRST_MINUTE + MINUTE_MS, 1)]
+    assert round(pos.max_up_12h, 6) == 0.01
+
+    # 同一分钟内不重复请求，下一分钟从上次的 (未收盘) K线开始重新拉取
+    engine.update_intrabar_peaks(pos)
+    engine.clock.advance(60)
+    engine.update_intrabar_peaks(pos)
+    assert requests[1:] == [(FIRST_MINUTE + MINUTE_MS, 2)]
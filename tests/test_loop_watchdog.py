@@ -0,0 +1,58 @@
+from conftest import START
+
+from clock import SimulatedClock
+from loop_watchdog import LoopWatchdog
+
+
+def run_tick(watchdog, clock, stages):
+    """按 (阶段名, 秒数) 依次运行一轮，返回距下一轮的等待时间"""
+    watchdog.tick_started()
+    for name, seconds in stages:
+        with watchdog.stage(name):
+            clock.advance(seconds)
+    return watchdog.tick_finished()
+
+
+def test_scan_within_budget_is_not_lag():
+    clock = SimulatedClock(START)
+    watchdog = LoopWatchdog(clock=clock)
+    clock.advance(run_tick(watchdog, clock, [("monitor", 2)]))
+
+    watchdog.tick_started()
+    with watchdog.stage("scan"):
+        clock.advance(100)
+        watchdog.beat()  # 扫描中的进度心跳
+        clock.advance(100)
+        # 扫描进行中 (已超过一个周期，仍在预算内)
+        assert not watchdog.is_lagging()
+        assert watchdog.is_ready()
+        assert not watchdog.shed("scan_progress_log")
+    with watchdog.stage("monitor"):
+        clock.advance(5)
+    assert not watchdog.is_lagging()
+    clock.advance(watchdog.tick_finished())
+
+    # 下一轮按顺延后的计划开始，没有漂移
+    watchdog.tick_started()
+    assert watchdog.drift == 0.0
+    assert not watchdog.is_lagging()
+
+
+def test_scan_over_budget_and_slow_tick_are_lag():
+    clock = SimulatedClock(START)
+    watchdog = LoopWatchdog(clock=clock, budgets={"scan": 100})
+
+    watchdog.tick_started()
+    with watchdog.stage("scan"):
+        clock.advance(100 + watchdog.interval + watchdog.lag_tolerance + 1)
+        assert watchdog.is_lagging()
+    watchdog.tick_finished()
+    watchdog.tick_started()
+    assert watchdog.drift > watchdog.lag_tolerance
+
+    # 没有长阶段时，本轮超过一个周期即为落后
+    watchdog = LoopWatchdog(clock=clock)
+    watchdog.tick_started()
+    with watchdog.stage("monitor"):
+        clock.advance(watchdog.interval + 1)
+    assert watchdog.is_lagging()
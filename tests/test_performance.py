@@ -0,0 +1,77 @@
+import json
+import random
+from datetime import timedelta
+
+from performance import PerformanceStats, append_trade, load_trades
+from records import Position
+
+
+def _random_trades(n, seed=7):
+    rng = random.Random(seed)
+    reasons = ["take_profit_dynamic_33%", "stop_loss", "timeout_72h", "weak_trend_24h", "manual_exit"]
+    return [
+        {
+            "symbol": f"S{i % 17}USDT",
+            "reason": rng.choice(reasons),
+            "pnl_pct": rng.uniform(-0.2, 0.35),
+            "hold_hours": rng.uniform(0, 80),
+            "exit_time": f"2026-01-01T00:{i % 60:02d}:00+00:00",
+        }
+        for i in range(n)
+    ]
+
+
+def test_incremental_matches_recompute_from_trade_log(tmp_path):
+    log = tmp_path / "trades.jsonl"
+    stats = PerformanceStats()
+    for trade in _random_trades(700):
+        append_trade(log, trade)
+        stats.fold(trade)
+        # 每笔后按状态文件的方式持久化再读回
+        stats = PerformanceStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+    assert stats.to_dict() == PerformanceStats.from_trades(load_trades(log)).to_dict()
+    assert stats.total.trades == 700
+    assert sum(b.trades for b in stats.by_reason.values()) == 700
+    assert sum(b.trades for b in stats.by_hold.values()) == 700
+
+
+def _open(engine, symbol, price=1.0):
+    now = engine.clock.now()
+    engine.positions[symbol] = Position(
+        symbol=symbol, entry_time=(now - timedelta(hours=5)).isoformat(),
+        entry_price=price, quantity=10.0, virtual_entry_price=price,
+    )
+
+
+def test_engine_stats_survive_history_cap_and_restart(make_engine, tmp_path):
+    engine = make_engine()
+    rng = random.Random(3)
+    for i in range(130):
+        _open(engine, "AAAUSDT")
+        engine.close_position("AAAUSDT", rng.choice(["stop_loss", "timeout_72h"]), rng.uniform(0.8, 1.3))
+        engine.clock.advance(60)
+
+    assert len(engine.history) == 100
+    recomputed = PerformanceStats.from_trades(load_trades(engine.trade_log))
+    assert engine.performance.total.trades == 130
+    assert engine.performance.to_dict() == recomputed.to_dict()
+
+    restarted = make_engine()
+    assert restarted.performance.to_dict() == recomputed.to_dict()
+
+
+def test_failed_close_order_is_not_counted(make_engine):
+    engine = make_engine(dry_run=False)
+
+    def reject(**kwargs):
+        raise RuntimeError("order rejected")
+
+    engine.api.post_order = reject
+    _open(engine, "AAAUSDT")
+    for _ in range(3):
+        engine.close_position("AAAUSDT", "stop_loss", 0.8)
+
+    assert "AAAUSDT" in engine.positions
+    assert engine.history == []
+    assert engine.performance.total.trades == 0
+    assert load_trades(engine.trade_log) == []
@@ -0,0 +1,89 @@
+import copy
+import random
+from datetime import timedelta
+
+import numpy as np
+
+from conftest import START
+from market_context import BASE_TAKE_PROFIT, TAKE_PROFIT_TIERS, MarketContext, dynamic_take_profit
+from position_book import ACTION_CLOSE, ACTION_VIRTUAL_ADD, PositionBook, dynamic_take_profit_batch
+from records import Position
+
+PARAMS = dict(add_trigger_pct=-0.18, stop_loss_pct=-0.18, max_hold_hours=72, weak_24h_threshold=0.08)
+
+
+def loop_evaluate(positions, ctx, base_tp, add_trigger_pct, stop_loss_pct, max_hold_hours, weak_24h_threshold):
+    """批量判定之前的逐个持仓判定 (monitor_positions 原有的循环)"""
+    actions = []
+    for symbol, pos in positions.items():
+        try:
+            view = ctx.observe_position(pos, base_tp)
+        except KeyError:
+            continue
+        if view.pnl_pct >= view.take_profit_pct:
+            actions.append((symbol, ACTION_CLOSE, f"take_profit_dynamic_{view.take_profit_pct*100:.0f}%"))
+        elif not pos.is_virtual_added and view.pnl_pct <= add_trigger_pct:
+            actions.append((symbol, ACTION_VIRTUAL_ADD, "virtual_add"))
+        elif view.pnl_pct <= stop_loss_pct:
+            actions.append((symbol, ACTION_CLOSE, "stop_loss"))
+        elif view.hold_hours >= max_hold_hours:
+            actions.append((symbol, ACTION_CLOSE, "timeout_72h"))
+        elif weak_24h_threshold is not None and view.hold_hours >= 24 and pos.max_up_24h < weak_24h_threshold:
+            actions.append((symbol, ACTION_CLOSE, "weak_trend_24h"))
+    return actions
+
+
+def random_book(rng):
+    positions, prices = {}, {}
+    for i in range(rng.randint(0, 12)):
+        symbol = f"S{i}USDT"
+        entry = rng.uniform(0.01, 100)
+        virtual_entry = entry * rng.choice([1.0, rng.uniform(0.8, 1.0)])
+        # 持仓时长集中在档位边界附近
+        hours = rng.choice([rng.uniform(0, 80), rng.choice([12, 24, 72]) + rng.uniform(-0.01, 0.01)])
+        positions[symbol] = Position(
+            symbol=symbol,
+            entry_time=(START - timedelta(hours=hours)).isoformat(),
+            entry_price=entry,
+            quantity=1.0,
+            virtual_entry_price=virtual_entry,
+            is_virtual_added=virtual_entry != entry,
+            max_up_12h=rng.choice([0.0, rng.uniform(-0.05, 0.1), 0.025]),
+            max_up_24h=rng.choice([0.0, rng.uniform(-0.05, 0.15), 0.05, 0.08]),
+        )
+        if rng.random() > 0.05:  # 少数持仓本轮无价格
+            prices[symbol] = virtual_entry * (1 + rng.uniform(-0.3, 0.4))
+    return positions, prices
+
+
+def test_batch_matches_per_position_loop():
+    rng = random.Random(43)
+    book = PositionBook()
+    for _ in range(2000):
+        positions, prices = random_book(rng)
+        weak = PARAMS["weak_24h_threshold"] if rng.random() > 0.3 else None
+        params = dict(PARAMS, weak_24h_threshold=weak)
+
+        loop_positions = copy.deepcopy(positions)
+        loop_ctx = MarketContext(START, prices)
+        expected = loop_evaluate(loop_positions, loop_ctx, BASE_TAKE_PROFIT, **params)
+
+        batch_ctx = MarketContext(START, prices)
+        actions = book.evaluate(positions, batch_ctx, base_tp=BASE_TAKE_PROFIT, **params)
+
+        assert [(a.symbol, a.kind, a.reason) for a in actions] == expected
+        assert {s: p.to_dict() for s, p in positions.items()} == {s: p.to_dict() for s, p in loop_positions.items()}
+        assert batch_ctx.positions.keys() == loop_ctx.positions.keys()
+        for symbol, view in loop_ctx.positions.items():
+            assert batch_ctx.positions[symbol].to_dict() == view.to_dict()
+
+
+def test_take_profit_tiers_scalar_and_batch_agree():
+    rng = np.random.default_rng(7)
+    hours = rng.uniform(0, 48, 5000)
+    up_12h = rng.uniform(-0.02, 0.08, 5000)
+    up_24h = rng.uniform(-0.02, 0.1, 5000)
+    batch = dynamic_take_profit_batch(hours, up_12h, up_24h, BASE_TAKE_PROFIT)
+    scalar = [dynamic_take_profit(h, a, b, BASE_TAKE_PROFIT) for h, a, b in zip(hours, up_12h, up_24h)]
+    assert batch.tolist() == scalar
+    assert set(scalar) == {BASE_TAKE_PROFIT} | {tier[-1] for tier in TAKE_PROFIT_TIERS}
@@ -0,0 +1,74 @@
+from datetime import datetime, UTC
+
+from clock import SimulatedClock
+from rate_limit import PRIORITY_HIGH, PRIORITY_LOW, WeightGovernor
+
+START = datetime.fromtimestamp(1_000_000, UTC)  # 分钟内第 40 秒
+
+
+def test_latency_floor_follows_recent_window():
+    clock = SimulatedClock(START)
+    governor = WeightGovernor(latency_window=60, clock=clock)
+
+    # 一次很快的响应之后网络变慢：窗口内基线仍是快响应，判断为拥塞
+    governor.observe_latency(50)
+    for _ in range(10):
+        clock.advance(5)
+        governor.observe_latency(400)
+    assert governor.latency_floor_ms == 50
+    assert governor.pace() >= 0.3
+
+    # 快响应移出窗口后基线随之更新，节奏恢复
+    clock.advance(60)
+    governor.observe_latency(400)
+    assert governor.latency_floor_ms == 400
+    assert governor.pace() < 0.1
+
+
+def test_idle_resets_congestion_average():
+    clock = SimulatedClock(START)
+    governor = WeightGovernor(latency_window=60, clock=clock)
+    governor.observe_latency(100)
+    for _ in range(10):
+        clock.advance(1)
+        governor.observe_latency(1500)
+    assert governor.pace() >= 1.0
+
+    # 空闲超过一个窗口后，第一条正常响应不再被旧的拥塞均值拖慢
+    clock.advance(600)
+    governor.observe_latency(100)
+    assert governor.latency_ewma_ms == 100
+    assert governor.pace() < 0.1
+
+
+def test_budget_and_circuit_follow_injected_clock():
+    clock = SimulatedClock(START)
+    governor = WeightGovernor(max_weight=100, clock=clock)
+    governor.acquire(100, priority=PRIORITY_HIGH)
+    assert governor.total_used() == 100
+
+    # 预算用尽时在虚拟时间中等待到下一分钟，不阻塞真实时间
+    governor.acquire(10)
+    assert clock.time() == 1_000_020
+    assert governor.total_used() == 10
+
+    governor.trip(30, "429")
+    assert governor.is_open()
+    assert governor.pace() == 30
+    clock.advance(30)
+    assert not governor.is_open()
+
+
+def test_oversize_request_does_not_wait_forever():
+    clock = SimulatedClock(START)
+    governor = WeightGovernor(max_weight=100, clock=clock)
+
+    # 超过低优先级上限 (75) 的请求按最高优先级占用，不会每分钟重试永不满足
+    governor.acquire(80, priority=PRIORITY_LOW)
+    assert governor.total_used() == 80
+    assert clock.time() == 1_000_000
+
+    # 超过整分钟额度的请求在下一分钟占满额度后返回
+    governor.acquire(150)
+    assert clock.time() == 1_000_020
+    assert governor.total_used() == 100
@@ -0,0 +1,31 @@
+def test_interrupted_scan_resumes_after_restart(make_engine, tmp_path):
+    engine = make_engine(symbols=10)
+    fetched = []
+    fetch = engine.get_hourly_window
+
+    def stop_after_three(symbol):
+        fetched.append(symbol)
+        if len(fetched) == 3:
+            engine.stop_event.set()  # 模拟 PM2 平滑重启
+        return fetch(symbol)
+
+    engine.get_hourly_window = stop_after_three
+    engine.run_tick()
+    assert engine.last_scan_hour is None and engine.last_scan_at is None
+    assert (tmp_path / "scan_checkpoint.json").exists()
+
+    restarted = make_engine(symbols=10)
+    assert restarted.last_scan_hour is None
+    resumed = []
+    fetch_again = restarted.get_hourly_window
+
+    def record(symbol):
+        resumed.append(symbol)
+        return fetch_again(symbol)
+
+    restarted.get_hourly_window = record
+    restarted.run_tick()
+    # 已处理的交易对不再重复请求，剩余的全部扫描完成
+    assert resumed and not set(resumed) & set(fetched)
+    assert restarted.last_scan_hour == restarted.clock.now().hour
+    assert not (tmp_path / "scan_checkpoint.json").exists()
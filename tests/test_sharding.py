@@ -0,0 +1,25 @@
+from sharding import HashRing, shard_filter
+
+SYMBOLS = [f"S{i}USDT" for i in range(3000)]
+
+
+def test_assignment_is_stable_and_complete():
+    ring = HashRing(4)
+    parts = ring.partition(SYMBOLS)
+    # 独立构造的环 (另一个进程) 给出相同的分配，每个交易对恰好属于一个分片
+    assert HashRing(4).partition(SYMBOLS) == parts
+    assert sorted(s for part in parts.values() for s in part) == sorted(SYMBOLS)
+    assert all(shard_filter(i, 4)(SYMBOLS) == parts[i] for i in range(4))
+    assert min(len(part) for part in parts.values()) > len(SYMBOLS) / 4 * 0.7
+
+
+def test_adding_a_shard_moves_only_its_share():
+    before, after = HashRing(4), HashRing(5)
+    moved = [s for s in SYMBOLS if before.shard_of(s) != after.shard_of(s)]
+    # 只有划给新分片的交易对移动，约 1/5
+    assert all(after.shard_of(s) == 4 for s in moved)
+    assert 0.1 < len(moved) / len(SYMBOLS) < 0.3
+
+    # 减少分片时只有被移除分片上的交易对换分片
+    fewer = HashRing(3)
+    assert all(before.shard_of(s) == 3 for s in SYMBOLS if before.shard_of(s) != fewer.shard_of(s))
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from state_schema import STATE_VERSION, migrate
+
+# 两个时期的 v0 状态文件：信号 K线开盘于 UTC 07:00 (北京 15:00)，UTC 08:05 创建信号，UTC 10:00 建仓
+UTC_ERA = "2026-01-01T07:00:00"  # 早期代码按 UTC 写入
+BJ_ERA = "2026-01-01T15:00:00"   # 当前代码按北京时间写入
+EXPECTED = "2026-01-01T15:00:00+08:00"
+LATE_ENTRY = "2026-01-02T18:00:00"  # 信号K线后 35h 建仓：按北京时间解读超出最长等待时间
+
+
+def v0_state(signal_time, entry_time="2026-01-01T10:00:00"):
+    return {
+        "positions": {
+            "AAAUSDT": {
+                "symbol": "AAAUSDT", "entry_time": entry_time, "signal_time": signal_time,
+                "entry_price": 1.0, "quantity": 10.0, "virtual_entry_price": 1.0,
+            },
+        },
+        "pending_signals": [
+            {
+                "symbol": "BBBUSDT", "signal_time": signal_time, "signal_close": 2.0, "buy_surge_ratio": 2.5,
+                "target_entry_price": 1.8, "drop_pct": -0.1, "timeout_time": "2026-01-02T21:05:00",
+                "created_at": "2026-01-01T08:05:00",
+            },
+        ],
+        "history": [],
+    }
+
+
+@pytest.mark.parametrize("signal_time", [UTC_ERA, BJ_ERA], ids=["utc_era", "bj_era"])
+def test_v0_signal_times_migrate_to_beijing(signal_time):
+    data, applied = migrate(v0_state(signal_time, LATE_ENTRY if signal_time == UTC_ERA else "2026-01-01T10:00:00"))
+    assert applied == [0]
+    assert data["schema_version"] == STATE_VERSION
+    assert data["positions"]["AAAUSDT"]["signal_time"] == EXPECTED
+    assert data["pending_signals"][0]["signal_time"] == EXPECTED
+
+    # 已迁移的数据再次加载不变
+    again, applied = migrate(json.loads(json.dumps(data)))
+    assert applied == []
+    assert again == data
+
+
+@pytest.mark.parametrize("entry_time", [
+    "2026-01-01T10:00:00", "2026-01-01T17:00:00", "2026-01-02T13:00:00",
+], ids=["3h", "10h", "30h"])
+def test_bj_era_position_keeps_beijing_time_for_late_entries(entry_time):
+    data, _ = migrate(v0_state(BJ_ERA, entry_time))
+    assert data["positions"]["AAAUSDT"]["signal_time"] == EXPECTED
+
+
+def test_ambiguous_position_signal_time_defaults_to_beijing(caplog):
+    # UTC 时期的持仓在 3h 后建仓：两种解读都可能，按北京时间处理并记录
+    data, _ = migrate(v0_state(UTC_ERA))
+    assert data["positions"]["AAAUSDT"]["signal_time"] == "2026-01-01T07:00:00+08:00"
+    assert "AAAUSDT" in caplog.text
+
+
+@pytest.mark.parametrize("signal_time", [UTC_ERA, BJ_ERA], ids=["utc_era", "bj_era"])
+def test_engine_loads_v0_file_and_keeps_backup(make_engine, tmp_path, signal_time):
+    raw = json.dumps(v0_state(signal_time, LATE_ENTRY if signal_time == UTC_ERA else "2026-01-01T10:00:00"))
+    (tmp_path / "trading_state.json").write_text(raw)
+
+    engine = make_engine()
+    assert engine.positions["AAAUSDT"].signal_time == EXPECTED
+    assert engine.pending_signals.to_list()[0]["signal_time"] == EXPECTED
+    assert (tmp_path / "trading_state.v0.bak.json").read_text() == raw
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+import state_snapshot
+from conftest import START
+from records import PendingSignal, Position
+from state_snapshot import MAX_POSITIONS, SEQ, SEQ_OFFSET, SnapshotReader, SnapshotWriter
+
+NOW = START.timestamp()
+
+
+def _positions(n):
+    return [
+        Position(
+            symbol=f"S{i}USDT", entry_time=(START - timedelta(hours=i)).isoformat(),
+            signal_time="2026-01-01T07:00:00+08:00", entry_price=1.0 + i, quantity=10.0,
+            virtual_entry_price=1.0 + i, max_up_12h=0.01 * i,
+        )
+        for i in range(n)
+    ]
+
+
+def _signal():
+    return PendingSignal(
+        symbol="BBBUSDT", signal_time="2026-01-01T07:00:00+08:00", signal_close=2.0, buy_surge_ratio=2.5,
+        target_entry_price=1.8, drop_pct=-0.1, timeout_time="2026-01-02T13:00:00+00:00",
+        created_at="2026-01-01T00:05:00+00:00",
+    )
+
+
+def _publish(writer, positions):
+    writer.publish(balance=1000.0, is_dry_run=True, positions=positions, signals=[_signal()], now=NOW)
+
+
+def test_round_trip(tmp_path):
+    writer = SnapshotWriter(tmp_path / "state.shm")
+    positions = _positions(3)
+    _publish(writer, positions)
+
+    snap = SnapshotReader(tmp_path / "state.shm").read()
+    assert snap["updated_at"] == snap["last_heartbeat"] == START.isoformat()
+    assert snap["balance"] == 1000.0 and snap["is_dry_run"]
+    for pos in positions:
+        got = snap["positions"][pos.symbol]
+        assert got["entry_time"] == pos.entry_time
+        assert got["signal_time"] == pos.signal_time
+        assert (got["entry_price"], got["max_up_12h"]) == (pos.entry_price, pos.max_up_12h)
+    signal = snap["pending_signals"][0]
+    assert signal["symbol"] == "BBBUSDT" and signal["timeout_time"] == _signal().timeout_time
+    assert not snap["positions_truncated"]
+
+
+def test_truncated_sections_keep_true_counts(tmp_path):
+    writer = SnapshotWriter(tmp_path / "state.shm")
+    _publish(writer, _positions(MAX_POSITIONS + 1))
+    reader = SnapshotReader(tmp_path / "state.shm")
+
+    header = reader.header()
+    assert header["positions_count"] == MAX_POSITIONS + 1
+    assert header["positions_truncated"] and not header["signals_truncated"]
+    snap = reader.read()
+    assert len(snap["positions"]) == MAX_POSITIONS and snap["positions_truncated"]
+
+
+class _Buffer(bytearray):
+    """模拟写入端在读取端复制数据期间发布新快照"""
+
+    def __init__(self, data, on_copy):
+        super().__init__(data)
+        self.on_copy = on_copy
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(key, slice) and self.on_copy:
+            self.on_copy(self)
+            self.on_copy = None
+        return value
+
+
+def test_reader_retries_when_seq_changes_mid_read(tmp_path):
+    writer = SnapshotWriter(tmp_path / "state.shm")
+    _publish(writer, _positions(2))
+    reader = SnapshotReader(tmp_path / "state.shm")
+    assert reader._open()
+    seq = SEQ.unpack_from(reader._mm, SEQ_OFFSET)[0]
+
+    def republish(buf):
+        SEQ.pack_into(buf, SEQ_OFFSET, seq + 2)
+
+    reader._mm = _Buffer(reader._mm[:], republish)
+    snap = reader.read()
+    # 第一次复制期间序号变化被丢弃，重试读到的是新序号下的一致数据
+    assert snap is not None and snap["seq"] == seq + 2
+
+
+def test_reader_waits_while_write_in_progress(tmp_path, monkeypatch):
+    writer = SnapshotWriter(tmp_path / "state.shm")
+    _publish(writer, _positions(2))
+    reader = SnapshotReader(tmp_path / "state.shm")
+    assert reader._open()
+    seq = SEQ.unpack_from(reader._mm, SEQ_OFFSET)[0]
+    buf = reader._mm = _Buffer(reader._mm[:], None)
+    SEQ.pack_into(buf, SEQ_OFFSET, seq + 1)  # 写入中 (奇数)
+    assert reader.read(retries=3) is None
+
+    waits = []
+
+    def finish_write(seconds):
+        waits.append(seconds)
+        SEQ.pack_into(buf, SEQ_OFFSET, seq + 2)
+
+    monkeypatch.setattr(state_snapshot.time, "sleep", finish_write)
+    snap = reader.read()
+    assert waits and snap["seq"] == seq + 2
@@ -0,0 +1,29 @@
+from tracing import SPANS
+
+
+def test_dry_run_trace_has_all_order_spans(make_engine):
+    engine = make_engine()
+    symbol = engine.api.market.symbols[0]
+    engine.open_position(symbol, 1.0, {"buy_surge_ratio": 0})
+    assert symbol in engine.positions
+
+    engine.close_position(symbol, "manual_exit", 1.1)
+    latency = engine.history[0]["latency_ms"]
+    # 模拟模式同样记录下单/平仓的发送与确认，除信号阶段外各区间都存在
+    assert {"open_to_order", "order_rtt", "exit_to_close", "close_rtt"} <= set(latency)
+    assert set(latency) <= set(SPANS)
+
+
+def test_simulated_signal_has_no_exchange_time_mark(make_engine):
+    engine = make_engine(hours=24, symbols=20, seed=7)
+    signals = []
+    for _ in range(24 * 60):
+        engine.run_tick()
+        engine.clock.advance(60)
+        signals = list(engine.pending_signals)
+        if signals:
+            break
+    marks = signals[0].trace["marks"]
+    # 虚拟时间的K线收盘时刻与进程时钟不可比，模拟时不记录，candle_to_signal 不会出现错位的数值
+    assert "scan_detected" in marks and "signal_recorded" in marks
+    assert "candle_close" not in marks
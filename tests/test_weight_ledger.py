@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import weight_ledger
+from clock import SimulatedClock
+from conftest import START
+from rate_limit import WeightGovernor
+from weight_ledger import WeightLedger
+
+pytestmark = pytest.mark.skipif(weight_ledger.fcntl is None, reason="需要 fcntl 文件锁")
+
+NOW = 1_000_000.0  # 分钟内第 40 秒
+
+
+@pytest.fixture
+def ledgers(tmp_path, monkeypatch):
+    """同一账本文件上的两个进程 (第二个用父进程的 pid 登记)"""
+    monkeypatch.setattr(weight_ledger.time, "time", lambda: NOW)
+    a = WeightLedger(tmp_path / "weight.ledger")
+    b = WeightLedger(tmp_path / "weight.ledger")
+    b.pid = os.getppid()
+    with b._locked():
+        b._slot = b._claim_slot(NOW)
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_budget_and_fair_share(ledgers):
+    a, b = ledgers
+    assert a.try_acquire(50, limit=90, max_weight=100, fair=True)[0]
+    # 合计用量达到争用阈值：两个活跃进程各自只能使用 90 / 2
+    ok, wait, reason = a.try_acquire(1, limit=90, max_weight=100, fair=True)
+    assert (ok, reason) == (False, "fair_share") and wait == 20
+    assert b.try_acquire(40, limit=90, max_weight=100, fair=True)[0]
+    assert b.try_acquire(1, limit=90, max_weight=100, fair=True)[2] == "budget"
+    # 最高优先级不受公平份额限制，可以用到全部额度
+    assert a.try_acquire(10, limit=100, max_weight=100, fair=False)[0]
+
+    state = b.state()
+    assert (state["used"], state["own_used"], state["processes"]) == (100, 40, 2)
+
+
+def test_trip_reaches_every_process(ledgers):
+    a, b = ledgers
+    assert a.trip(NOW + 30)
+    assert not b.trip(NOW + 10)  # 更早的截止时间不缩短熔断
+    assert b.state()["open_until"] == NOW + 30
+    ok, wait, reason = b.try_acquire(1, limit=100, max_weight=100, fair=False)
+    assert (ok, reason, wait) == (False, "circuit", 30)
+
+
+def test_slot_of_exited_process_is_reused(ledgers):
+    a, b = ledgers
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    c = WeightLedger(a.path)
+    c.pid = child.pid
+    with c._locked():
+        c._slot = c._claim_slot(NOW)
+    dead_slot = c._slot
+
+    d = WeightLedger(a.path)
+    d.pid = 1
+    with d._locked():
+        d._slot = d._claim_slot(NOW)
+    assert d._slot == dead_slot
+    c.close()
+    d.close()
+
+
+def test_simulated_clock_does_not_use_shared_ledger(ledgers):
+    a, _ = ledgers
+    governor = WeightGovernor(ledger=a, clock=SimulatedClock(START))
+    assert governor.ledger is None